@@ -3,8 +3,8 @@ import sqlite3
 from pathlib import Path
 from contextlib import contextmanager
 
-# Create database directory if it doesn't exist
-DB_DIR = Path("data/db")
+# Create database directory if it doesn't exist; absolute, so render workers started elsewhere share it
+DB_DIR = Path(__file__).resolve().parents[2] / "data" / "db"
 DB_DIR.mkdir(parents=True, exist_ok=True)
 
 # Database file path
@@ -15,6 +15,9 @@ def init_db():
     with get_db_connection() as conn:
         cursor = conn.cursor()
         
+        # Readers (status polls) no longer wait for writers (render workers); the setting persists in the file
+        cursor.execute("PRAGMA journal_mode=WAL")
+        
         # Create users table
         cursor.execute('''
         CREATE TABLE IF NOT EXISTS users (
@@ -25,6 +28,88 @@ def init_db():
         )
         ''')
         
+        # Create render jobs table; one row per content hash so identical requests share a job
+        cursor.execute('''
+        CREATE TABLE IF NOT EXISTS render_jobs (
+            content_hash TEXT PRIMARY KEY,
+            text TEXT NOT NULL,
+            processed_text TEXT NOT NULL,
+            priority INTEGER NOT NULL DEFAULT 0,
+            status TEXT NOT NULL DEFAULT 'queued',
+            attempts INTEGER NOT NULL DEFAULT 0,
+            worker TEXT,
+            error TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            started_at TIMESTAMP,
+            finished_at TIMESTAMP,
+            progress REAL
+        )
+        ''')
+        # Job tables created before render progress was reported lack this column
+        columns = {row["name"] for row in cursor.execute("PRAGMA table_info(render_jobs)")}
+        if "progress" not in columns:
+            cursor.execute("ALTER TABLE render_jobs ADD COLUMN progress REAL")
+        cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_render_jobs_queue
+        ON render_jobs (status, priority DESC, created_at)
+        ''')
+        
+        # Create segment cache tables; hit counters and phrase counts shared by all render workers
+        cursor.execute('''
+        CREATE TABLE IF NOT EXISTS segment_counters (
+            name TEXT PRIMARY KEY,
+            value REAL NOT NULL DEFAULT 0
+        )
+        ''')
+        cursor.execute('''
+        CREATE TABLE IF NOT EXISTS segment_ngrams (
+            ngram TEXT PRIMARY KEY,
+            count INTEGER NOT NULL DEFAULT 0
+        )
+        ''')
+        cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_segment_ngrams_count ON segment_ngrams (count)
+        ''')
+        
+        # Create videos table; the catalog of generated videos
+        cursor.execute('''
+        CREATE TABLE IF NOT EXISTS videos (
+            content_hash TEXT PRIMARY KEY,
+            filename TEXT NOT NULL,
+            original_text TEXT NOT NULL,
+            processed_text TEXT NOT NULL,
+            created_at TEXT NOT NULL,
+            renderer TEXT,
+            render_seconds REAL,
+            size_bytes INTEGER,
+            last_accessed_at TEXT
+        )
+        ''')
+        # Catalogs created before videos were evicted by size and last access lack these columns
+        columns = {row["name"] for row in cursor.execute("PRAGMA table_info(videos)")}
+        for column, column_type in (("size_bytes", "INTEGER"), ("last_accessed_at", "TEXT")):
+            if column not in columns:
+                cursor.execute(f"ALTER TABLE videos ADD COLUMN {column} {column_type}")
+        cursor.execute("UPDATE videos SET last_accessed_at = created_at WHERE last_accessed_at IS NULL")
+        cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_videos_created_at ON videos (created_at)
+        ''')
+        cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_videos_last_accessed_at ON videos (last_accessed_at)
+        ''')
+        cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_videos_filename ON videos (filename)
+        ''')
+        
+        # Create leases table; lets one of several API processes run a periodic task such as eviction
+        cursor.execute('''
+        CREATE TABLE IF NOT EXISTS leases (
+            name TEXT PRIMARY KEY,
+            holder TEXT NOT NULL,
+            expires_at TIMESTAMP NOT NULL
+        )
+        ''')
+        
         # Add more tables as needed
         
         conn.commit()
@@ -32,7 +117,8 @@ def init_db():
 @contextmanager
 def get_db_connection():
     """Get a database connection with context management."""
-    conn = sqlite3.connect(str(DB_PATH))
+    # Render workers write from other processes; wait for their locks instead of failing
+    conn = sqlite3.connect(str(DB_PATH), timeout=30)
     conn.row_factory = sqlite3.Row  # Return rows as dictionaries
     try:
         yield conn
@@ -70,4 +156,336 @@ def get_all_users():
     with get_db_connection() as conn:
         cursor = conn.cursor()
         cursor.execute("SELECT id, email, created_at FROM users")
-        return [dict(row) for row in cursor.fetchall()]
\ No newline at end of file
+        return [dict(row) for row in cursor.fetchall()]
+
+# Generated video operations
+VIDEO_COLUMNS = (
+    "content_hash", "filename", "original_text", "processed_text", "created_at", "renderer", "render_seconds",
+    "size_bytes", "last_accessed_at"
+)
+
+def _video_row(video):
+    # A new video counts as accessed when it was created
+    video = {"last_accessed_at": video.get("created_at"), **video}
+    return tuple(video.get(column) for column in VIDEO_COLUMNS)
+
+def save_video(video):
+    """Add a generated video, replacing an older one with the same content hash."""
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(
+            f"INSERT OR REPLACE INTO videos ({', '.join(VIDEO_COLUMNS)}) VALUES ({', '.join('?' * len(VIDEO_COLUMNS))})",
+            _video_row(video)
+        )
+        conn.commit()
+
+def import_videos(videos):
+    """Add videos that are not in the catalog yet; returns how many were added."""
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        before = conn.total_changes
+        cursor.executemany(
+            f"INSERT OR IGNORE INTO videos ({', '.join(VIDEO_COLUMNS)}) VALUES ({', '.join('?' * len(VIDEO_COLUMNS))})",
+            [_video_row(video) for video in videos]
+        )
+        conn.commit()
+        return conn.total_changes - before
+
+def get_video(content_hash):
+    """Find a generated video by content hash."""
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT * FROM videos WHERE content_hash = ?", (content_hash,))
+        video = cursor.fetchone()
+        if video:
+            return dict(video)
+        return None
+
+def get_videos(content_hashes):
+    """Generated videos for several content hashes, by hash."""
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(
+            f"SELECT * FROM videos WHERE content_hash IN ({', '.join('?' * len(content_hashes))})",
+            tuple(content_hashes)
+        )
+        return {row["content_hash"]: dict(row) for row in cursor.fetchall()}
+
+def list_videos(limit, offset):
+    """Generated videos, newest first, and the total count."""
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(
+            "SELECT * FROM videos ORDER BY created_at DESC LIMIT ? OFFSET ?",
+            (limit, offset)
+        )
+        videos = [dict(row) for row in cursor.fetchall()]
+        cursor.execute("SELECT COUNT(*) FROM videos")
+        return videos, cursor.fetchone()[0]
+
+def get_videos_created_before(created_at, limit):
+    """Up to limit generated videos older than the given ISO timestamp, oldest first."""
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(
+            "SELECT * FROM videos WHERE created_at < ? ORDER BY created_at LIMIT ?",
+            (created_at, limit)
+        )
+        return [dict(row) for row in cursor.fetchall()]
+
+def get_least_recently_used_videos(limit):
+    """Up to limit generated videos, least recently accessed first."""
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT * FROM videos ORDER BY last_accessed_at LIMIT ?", (limit,))
+        return [dict(row) for row in cursor.fetchall()]
+
+def get_videos_without_size(limit):
+    """Up to limit generated videos whose file size has not been recorded yet."""
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT * FROM videos WHERE size_bytes IS NULL LIMIT ?", (limit,))
+        return [dict(row) for row in cursor.fetchall()]
+
+def set_video_size(content_hash, size_bytes):
+    """Record the file size of a generated video."""
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("UPDATE videos SET size_bytes = ? WHERE content_hash = ?", (size_bytes, content_hash))
+        conn.commit()
+
+def touch_videos(accesses):
+    """Record when video files were last served, given as {filename: ISO timestamp}."""
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.executemany(
+            "UPDATE videos SET last_accessed_at = ? WHERE filename = ? AND last_accessed_at < ?",
+            [(accessed_at, filename, accessed_at) for filename, accessed_at in accesses.items()]
+        )
+        conn.commit()
+
+def get_video_storage():
+    """Number of catalogued videos and their total size in bytes."""
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT COUNT(*), COALESCE(SUM(size_bytes), 0) FROM videos")
+        count, size_bytes = cursor.fetchone()
+        return count, size_bytes
+
+def delete_video(content_hash):
+    """Remove a video from the catalog; returns False if it was not there."""
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("DELETE FROM videos WHERE content_hash = ?", (content_hash,))
+        conn.commit()
+        return cursor.rowcount > 0
+
+# Lease operations
+def acquire_lease(name, holder, seconds):
+    """Take or renew the named lease for seconds; returns True if holder has it.
+    
+    A lease held by someone else is only taken over once it has expired, e.g.
+    because the process holding it died.
+    """
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(
+            """INSERT INTO leases (name, holder, expires_at) VALUES (?, ?, datetime('now', ?))
+            ON CONFLICT (name) DO UPDATE SET holder = excluded.holder, expires_at = excluded.expires_at
+            WHERE leases.holder = excluded.holder OR leases.expires_at < datetime('now')""",
+            (name, holder, f"+{int(seconds)} seconds")
+        )
+        conn.commit()
+        cursor.execute("SELECT holder FROM leases WHERE name = ?", (name,))
+        return cursor.fetchone()["holder"] == holder
+
+# Render job queue operations
+def begin_render_job(content_hash, text, priority=0, prepare_timeout_seconds=120):
+    """Become the one request that prepares and queues the video for this content.
+    
+    Returns the job and whether the caller is that request (the leader). While a
+    job is being prepared, queued or rendered, everyone else gets the existing job
+    back, with its priority raised to theirs. A job stuck in preparation longer
+    than prepare_timeout_seconds (its leader died) is taken over.
+    """
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        # Take the write lock first so two processes cannot both become the leader
+        cursor.execute("BEGIN IMMEDIATE")
+        cursor.execute(
+            """SELECT *, status = 'preparing' AND started_at < datetime('now', ?) AS abandoned
+            FROM render_jobs WHERE content_hash = ?""",
+            (f"-{int(prepare_timeout_seconds)} seconds", content_hash)
+        )
+        job = cursor.fetchone()
+        if job and job["status"] in ("preparing", "queued", "running") and not job["abandoned"]:
+            if priority > job["priority"]:
+                cursor.execute(
+                    "UPDATE render_jobs SET priority = ? WHERE content_hash = ?",
+                    (priority, content_hash)
+                )
+            conn.commit()
+            cursor.execute("SELECT * FROM render_jobs WHERE content_hash = ?", (content_hash,))
+            return dict(cursor.fetchone()), False
+        
+        # New content, or a finished job whose video has to be made again
+        cursor.execute(
+            """INSERT OR REPLACE INTO render_jobs (content_hash, text, processed_text, priority, status, started_at)
+            VALUES (?, ?, '', ?, 'preparing', CURRENT_TIMESTAMP)""",
+            (content_hash, text, priority)
+        )
+        conn.commit()
+        cursor.execute("SELECT * FROM render_jobs WHERE content_hash = ?", (content_hash,))
+        return dict(cursor.fetchone()), True
+
+def queue_render_job(content_hash, processed_text):
+    """Hand a prepared job to the render workers."""
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(
+            """UPDATE render_jobs SET status = 'queued', processed_text = ?, started_at = NULL
+            WHERE content_hash = ? AND status = 'preparing'""",
+            (processed_text, content_hash)
+        )
+        conn.commit()
+        cursor.execute("SELECT * FROM render_jobs WHERE content_hash = ?", (content_hash,))
+        return dict(cursor.fetchone())
+
+def claim_render_job(worker):
+    """Mark the most urgent queued job as running by this worker and return it."""
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("BEGIN IMMEDIATE")
+        cursor.execute(
+            """SELECT * FROM render_jobs WHERE status = 'queued'
+            ORDER BY priority DESC, created_at LIMIT 1"""
+        )
+        job = cursor.fetchone()
+        if job is None:
+            conn.commit()
+            return None
+        cursor.execute(
+            """UPDATE render_jobs SET status = 'running', worker = ?, attempts = attempts + 1,
+            started_at = CURRENT_TIMESTAMP, error = NULL, progress = 0 WHERE content_hash = ?""",
+            (worker, job["content_hash"])
+        )
+        conn.commit()
+        job = dict(job)
+        job.update(status="running", worker=worker, attempts=job["attempts"] + 1, progress=0)
+        return job
+
+def finish_render_job(content_hash, status, error=None):
+    """Record the outcome of a job: 'completed', 'failed', or 'queued' to run it again."""
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(
+            """UPDATE render_jobs SET status = ?, error = ?,
+            finished_at = CASE WHEN ? = 'queued' THEN NULL ELSE CURRENT_TIMESTAMP END
+            WHERE content_hash = ?""",
+            (status, error, status, content_hash)
+        )
+        conn.commit()
+
+def set_render_progress(content_hash, progress):
+    """Record how far the render of a running job has got, from 0 to 1."""
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(
+            "UPDATE render_jobs SET progress = ? WHERE content_hash = ? AND status = 'running'",
+            (progress, content_hash)
+        )
+        conn.commit()
+
+def requeue_stale_render_jobs(timeout_seconds, max_attempts):
+    """Recover running jobs whose worker has not finished them in time (e.g. it was killed).
+    
+    Jobs that already used max_attempts are marked failed so a clip that crashes
+    the renderer cannot take the workers down forever.
+    """
+    cutoff = f"-{int(timeout_seconds)} seconds"
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(
+            """UPDATE render_jobs SET status = 'failed', error = 'Render timed out',
+            finished_at = CURRENT_TIMESTAMP
+            WHERE status = 'running' AND started_at < datetime('now', ?) AND attempts >= ?""",
+            (cutoff, max_attempts)
+        )
+        cursor.execute(
+            """UPDATE render_jobs SET status = 'queued', worker = NULL
+            WHERE status = 'running' AND started_at < datetime('now', ?)""",
+            (cutoff,)
+        )
+        conn.commit()
+        return cursor.rowcount
+
+def get_render_job(content_hash):
+    """Find a render job by content hash."""
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT * FROM render_jobs WHERE content_hash = ?", (content_hash,))
+        job = cursor.fetchone()
+        if job:
+            return dict(job)
+        return None
+
+def get_render_jobs(content_hashes):
+    """Render jobs for several content hashes, by hash."""
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(
+            f"SELECT * FROM render_jobs WHERE content_hash IN ({', '.join('?' * len(content_hashes))})",
+            tuple(content_hashes)
+        )
+        return {row["content_hash"]: dict(row) for row in cursor.fetchall()}
+
+def count_render_jobs():
+    """Number of render jobs in each status."""
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT status, COUNT(*) AS count FROM render_jobs GROUP BY status")
+        return {row["status"]: row["count"] for row in cursor.fetchall()}
+
+# Segment cache statistics operations
+def add_segment_counters(amounts):
+    """Add to the segment cache counters, given as {name: amount}."""
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.executemany(
+            """INSERT INTO segment_counters (name, value) VALUES (?, ?)
+            ON CONFLICT (name) DO UPDATE SET value = value + excluded.value""",
+            list(amounts.items())
+        )
+        conn.commit()
+
+def get_segment_counters():
+    """The segment cache counters, by name."""
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT name, value FROM segment_counters")
+        return {row["name"]: row["value"] for row in cursor.fetchall()}
+
+def count_segment_ngrams(ngrams):
+    """Record renders of phrases, given as {ngram: times}; returns how often each has been rendered."""
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("BEGIN IMMEDIATE")
+        cursor.executemany(
+            """INSERT INTO segment_ngrams (ngram, count) VALUES (?, ?)
+            ON CONFLICT (ngram) DO UPDATE SET count = count + excluded.count""",
+            list(ngrams.items())
+        )
+        cursor.execute(
+            f"SELECT ngram, count FROM segment_ngrams WHERE ngram IN ({', '.join('?' * len(ngrams))})",
+            tuple(ngrams)
+        )
+        counts = {row["ngram"]: row["count"] for row in cursor.fetchall()}
+        conn.commit()
+        return counts
+
+def get_top_segment_ngrams(limit):
+    """The limit most often rendered phrases and their counts, most frequent first."""
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT ngram, count FROM segment_ngrams ORDER BY count DESC LIMIT ?", (limit,))
+        return [(row["ngram"], row["count"]) for row in cursor.fetchall()]
@@ -1,21 +1,30 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.staticfiles import StaticFiles
 from contextlib import asynccontextmanager
+import asyncio
 import os
+import subprocess
+import sys
 from pathlib import Path
 
 # Import database initialization
 from database.db import init_db
+from routes.model_registry import registry, ENABLED_FEATURES, WARMUP_MODELS
+from routes.media import MediaFiles, VIDEO_CACHE_SECONDS
 
 # Define project root and asset directories
 PROJECT_ROOT = Path(os.path.abspath(os.path.dirname(__file__))).parent
 ASSETS_DIR = PROJECT_ROOT / "assets"
 GENERATED_DIR = ASSETS_DIR / "generated"
+CLIPS_DIR = ASSETS_DIR / "clips"
+
+# Render worker processes started with the API; set to 0 when running src/render_worker.py separately
+VIDEO_RENDER_WORKERS = int(os.getenv("VIDEO_RENDER_WORKERS", "2"))
 
 # Ensure directories exist
 ASSETS_DIR.mkdir(parents=True, exist_ok=True)
 GENERATED_DIR.mkdir(parents=True, exist_ok=True)
+CLIPS_DIR.mkdir(parents=True, exist_ok=True)
 
 # Define lifespan context manager
 @asynccontextmanager
@@ -23,9 +32,35 @@ async def lifespan(app: FastAPI):
     # Startup: Initialize the database
     init_db()
     print("Database initialized")
+    # Load the configured models now; everything else loads on first use
+    if WARMUP_MODELS:
+        await asyncio.to_thread(registry.warm_up, WARMUP_MODELS)
+    workers = []
+    if "video" in ENABLED_FEATURES:
+        from routes.video_gen import migrate_metadata, video_evictor, clip_index
+        migrate_metadata()
+        # Index the clip library before serving, off the event loop; the first scan probes every clip
+        await asyncio.to_thread(clip_index.start)
+        # Videos are rendered in separate processes so encoding never blocks requests
+        for _ in range(VIDEO_RENDER_WORKERS):
+            workers.append(subprocess.Popen(
+                [sys.executable, str(PROJECT_ROOT / "src" / "render_worker.py")], cwd=str(PROJECT_ROOT)
+            ))
+        print(f"Started {len(workers)} render workers")
+        # Old and least recently watched videos are removed in small batches on a schedule, by one API process
+        eviction = asyncio.create_task(video_evictor.run())
     yield
     # Shutdown: Clean up resources if needed
     print("Shutting down application")
+    if "video" in ENABLED_FEATURES:
+        eviction.cancel()
+    for worker in workers:
+        worker.terminate()
+    for worker in workers:
+        try:
+            worker.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            worker.kill()
 
 # Create FastAPI app with lifespan
 app = FastAPI(lifespan=lifespan)
@@ -37,24 +72,41 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],  # Allows all HTTP methods
     allow_headers=["*"],  # Allows all headers
+    expose_headers=["X-Natural-Text"],  # Lets browsers read the text returned with sign-to-speech audio
 )
 
-# Mount static directories for serving video files
-app.mount("/assets/generated", StaticFiles(directory=str(GENERATED_DIR)), name="generated_videos")
-
-# Import routes
-from routes.transcription import router as transcription_router
-from routes.video_gen import router as video_gen_router
-from routes.auth import router as auth_router
-from routes.tts import router as speech_router
-from routes.gesture_recognition import router as gesture_router
-
-# Include routers
-app.include_router(transcription_router, prefix="/transcribe")
-app.include_router(auth_router, prefix="/auth")
-app.include_router(video_gen_router, prefix="/video")
-app.include_router(speech_router, prefix="/tts")
-app.include_router(gesture_router, prefix="/gesture")
+# Mount static directories for serving video files and clips, with range requests and cache validators
+if "video" in ENABLED_FEATURES:
+    from routes.video_gen import video_evictor
+    # Served videos count as accessed for eviction
+    on_video_access = video_evictor.touch
+else:
+    on_video_access = None
+app.mount("/assets/generated", MediaFiles(directory=str(GENERATED_DIR), max_age=VIDEO_CACHE_SECONDS,
+                                             on_access=on_video_access),
+          name="generated_videos")
+app.mount("/assets/clips", MediaFiles(directory=str(CLIPS_DIR)), name="clips")
+
+# Import and include only the routers of enabled subsystems, so disabled ones cost nothing
+print(f"Enabled features: {', '.join(ENABLED_FEATURES)}")
+if "transcription" in ENABLED_FEATURES:
+    from routes.transcription import router as transcription_router
+    app.include_router(transcription_router, prefix="/transcribe")
+if "auth" in ENABLED_FEATURES:
+    from routes.auth import router as auth_router
+    app.include_router(auth_router, prefix="/auth")
+if "video" in ENABLED_FEATURES:
+    from routes.video_gen import router as video_gen_router
+    app.include_router(video_gen_router, prefix="/video")
+if "tts" in ENABLED_FEATURES:
+    from routes.tts import router as speech_router
+    app.include_router(speech_router, prefix="/tts")
+if "gesture" in ENABLED_FEATURES:
+    from routes.gesture_recognition import router as gesture_router
+    app.include_router(gesture_router, prefix="/gesture")
+
+from routes.models import router as models_router
+app.include_router(models_router, prefix="/models")
 
 if __name__ == "__main__":
     import uvicorn  # type: ignore
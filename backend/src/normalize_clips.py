@@ -0,0 +1,116 @@
+"""Normalize every sign clip to one codec, resolution and frame rate so videos can be joined without re-encoding.
+
+Run from the backend directory after adding or replacing clips:
+
+    python src/normalize_clips.py
+    python src/normalize_clips.py --size 1280x720 --workers 4
+
+Only clips that are new or changed since the last run are encoded. Without
+--size the most common resolution of the clips is used. Clips that were not
+normalized here are encoded by the server the first time a sentence needs them.
+"""
+import argparse
+import json
+import os
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+
+from routes.clip_index import probe_clip
+from routes.video_render import (
+    ASSETS_DIR, MANIFEST_FILE, NORMALIZED_CLIP_DIR, NORMALIZE_FPS, NORMALIZE_CRF, manifest_lock, normalize_clip,
+    temp_path
+)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clips", default=str(ASSETS_DIR / "clips"), help="Directory of <word>.mp4 clips")
+    parser.add_argument("--size", help="Target resolution as WIDTHxHEIGHT")
+    parser.add_argument("--workers", type=int, default=max(1, (os.cpu_count() or 2) // 2))
+    parser.add_argument("--force", action="store_true", help="Re-encode every clip")
+    args = parser.parse_args()
+
+    sources = sorted(Path(args.clips).glob("*.mp4"))
+    if not sources:
+        raise SystemExit(f"No clips found in {args.clips}")
+
+    if args.size:
+        width, height = (int(value) for value in args.size.lower().split("x"))
+    else:
+        sizes = Counter()
+        for source in sources:
+            _, _, w, h = probe_clip(source)
+            if w and h:
+                sizes[(w, h)] += 1
+        width, height = sizes.most_common(1)[0][0] if sizes else (1280, 720)
+    # libx264 with yuv420p needs even dimensions
+    width, height = width - width % 2, height - height % 2
+    settings = {"width": width, "height": height, "fps": NORMALIZE_FPS, "codec": "h264", "crf": NORMALIZE_CRF}
+
+    manifest = {"settings": {}, "clips": {}, "ngrams": {}}
+    if MANIFEST_FILE.exists():
+        manifest = json.loads(MANIFEST_FILE.read_text(encoding="utf-8"))
+    if manifest.get("settings") != settings:
+        # Segments made with other settings cannot be concatenated with new ones
+        manifest = {"settings": settings, "clips": {}, "ngrams": {}}
+
+    pending = []
+    for source in sources:
+        stat = source.stat()
+        entry = manifest["clips"].get(source.stem)
+        if (args.force or entry is None or entry["source_size"] != stat.st_size
+                or entry["source_mtime"] != stat.st_mtime or not (NORMALIZED_CLIP_DIR / entry["file"]).exists()):
+            pending.append((source, stat))
+    print(f"{len(sources)} clips, {len(pending)} to normalize to {width}x{height} at {NORMALIZE_FPS} fps")
+
+    started = time.perf_counter()
+    failed = 0
+
+    def encode(source: Path) -> float:
+        clip_started = time.perf_counter()
+        normalize_clip(source, NORMALIZED_CLIP_DIR / source.name, width, height)
+        return round(time.perf_counter() - clip_started, 3)
+
+    with ThreadPoolExecutor(max_workers=args.workers) as executor:
+        futures = {executor.submit(encode, source): (source, stat) for source, stat in pending}
+        for done, future in enumerate(as_completed(futures), start=1):
+            source, stat = futures[future]
+            try:
+                encode_seconds = future.result()
+            except Exception as e:
+                failed += 1
+                manifest["clips"].pop(source.stem, None)
+                print(f"Failed to normalize {source.name}: {(getattr(e, 'stderr', None) or b'').decode(errors='replace') or e}")
+                continue
+            manifest["clips"][source.stem] = {
+                "file": source.name, "source_size": stat.st_size, "source_mtime": stat.st_mtime,
+                "encode_seconds": encode_seconds
+            }
+            print(f"[{done}/{len(pending)}] {source.name}")
+
+    # Forget clips whose source was removed
+    words = {source.stem for source in sources}
+    for word in [word for word in manifest["clips"] if word not in words]:
+        del manifest["clips"][word]
+
+    NORMALIZED_CLIP_DIR.mkdir(parents=True, exist_ok=True)
+    with manifest_lock():
+        # Render workers may have added segments while we were encoding; keep them if they are compatible
+        if MANIFEST_FILE.exists():
+            current = json.loads(MANIFEST_FILE.read_text(encoding="utf-8"))
+            if current.get("settings") == settings:
+                for word, entry in current.get("clips", {}).items():
+                    if word in words and word not in manifest["clips"]:
+                        manifest["clips"][word] = entry
+                for key, entry in current.get("ngrams", {}).items():
+                    manifest["ngrams"].setdefault(key, entry)
+        tmp_manifest = temp_path(MANIFEST_FILE)
+        tmp_manifest.write_text(json.dumps(manifest, indent=2), encoding="utf-8")
+        os.replace(tmp_manifest, MANIFEST_FILE)
+    print(f"Done in {time.perf_counter() - started:.1f}s, {len(manifest['clips'])} clips ready, {failed} failed")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""Render worker: takes video jobs from the SQLite queue and renders them outside the API process.
+
+The API starts VIDEO_RENDER_WORKERS of these on startup. To run them yourself
+instead (e.g. with several API processes), set VIDEO_RENDER_WORKERS=0 and start
+as many as you like from the backend directory:
+
+    python src/render_worker.py
+
+Jobs are taken in priority order, oldest first. A worker that is stopped puts
+its current job back in the queue; one that is killed leaves it running until
+RENDER_JOB_TIMEOUT_SECONDS pass, after which another worker picks it up.
+"""
+import os
+import signal
+import socket
+import time
+
+from database.db import (
+    init_db, claim_render_job, finish_render_job, requeue_stale_render_jobs, set_render_progress
+)
+from routes.video_gen import background_video_generation
+
+# How long an idle worker waits before checking the queue again
+RENDER_POLL_SECONDS = float(os.getenv("RENDER_POLL_SECONDS", "0.5"))
+# A running job older than this is assumed lost with its worker and queued again
+RENDER_JOB_TIMEOUT_SECONDS = int(os.getenv("RENDER_JOB_TIMEOUT_SECONDS", "600"))
+# Renders of one video that may time out before it is marked failed
+RENDER_MAX_ATTEMPTS = int(os.getenv("RENDER_MAX_ATTEMPTS", "3"))
+# Smallest change in render progress written to the database, so progress never slows the render
+RENDER_PROGRESS_STEP = 0.05
+
+
+def stop(signum, frame):
+    raise SystemExit(0)
+
+
+def progress_reporter(content_hash: str):
+    """A callback that records render progress for /video/events, at most every RENDER_PROGRESS_STEP"""
+    reported = [0.0]
+
+    def report(progress: float) -> None:
+        if progress - reported[0] >= RENDER_PROGRESS_STEP:
+            reported[0] = progress
+            set_render_progress(content_hash, round(progress, 3))
+
+    return report
+
+
+def main() -> None:
+    signal.signal(signal.SIGTERM, stop)
+    init_db()
+    worker = f"{socket.gethostname()}:{os.getpid()}"
+    print(f"Render worker {worker} started")
+
+    last_recovery = 0.0
+    while True:
+        if time.monotonic() - last_recovery > RENDER_JOB_TIMEOUT_SECONDS / 10:
+            recovered = requeue_stale_render_jobs(RENDER_JOB_TIMEOUT_SECONDS, RENDER_MAX_ATTEMPTS)
+            if recovered:
+                print(f"Requeued {recovered} stale render jobs")
+            last_recovery = time.monotonic()
+
+        job = None
+        try:
+            job = claim_render_job(worker)
+            if job is None:
+                time.sleep(RENDER_POLL_SECONDS)
+                continue
+            background_video_generation(job["text"], job["content_hash"], job["processed_text"],
+                                        progress_reporter(job["content_hash"]))
+            finish_render_job(job["content_hash"], "completed")
+        except (KeyboardInterrupt, SystemExit):
+            if job is not None:
+                finish_render_job(job["content_hash"], "queued")
+            print(f"Render worker {worker} stopped")
+            return
+        except Exception as e:
+            print(f"Render job {job['content_hash'] if job else '-'} failed: {e}")
+            if job is not None:
+                finish_render_job(job["content_hash"], "failed", str(e))
+            else:
+                time.sleep(RENDER_POLL_SECONDS)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+"""In-memory index of the sign clip library, kept fresh by polling file modification times"""
+import os
+import threading
+import time
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+# How often the clip directory is rescanned for added, changed or removed clips
+CLIP_INDEX_POLL_SECONDS = float(os.getenv("CLIP_INDEX_POLL_SECONDS", "5"))
+
+
+@dataclass
+class ClipInfo:
+    word: str
+    path: str
+    size: int
+    mtime: float
+    duration: Optional[float] = None
+    fps: Optional[float] = None
+    width: Optional[int] = None
+    height: Optional[int] = None
+
+
+def probe_clip(path: Path) -> Tuple[Optional[float], Optional[float], Optional[int], Optional[int]]:
+    """Read duration, frame rate and resolution from the container without decoding frames"""
+    try:
+        import cv2
+    except ImportError:
+        return None, None, None, None
+    cap = cv2.VideoCapture(str(path))
+    try:
+        if not cap.isOpened():
+            return None, None, None, None
+        fps = cap.get(cv2.CAP_PROP_FPS) or None
+        frames = cap.get(cv2.CAP_PROP_FRAME_COUNT)
+        duration = round(frames / fps, 3) if fps and frames > 0 else None
+        width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)) or None
+        height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)) or None
+        return duration, fps, width, height
+    finally:
+        cap.release()
+
+
+class ClipIndex:
+    """word -> clip metadata for every ``<word>.mp4`` in the clip directory.
+
+    ``start`` (or else the first access) scans the directory; after that a
+    daemon thread rescans it every ``poll_seconds`` and only probes files whose
+    size or mtime changed.
+    Lookups read an immutable snapshot, so they cost one dict access and never
+    touch the filesystem.
+    """
+
+    def __init__(self, clip_dir: Path, poll_seconds: float = CLIP_INDEX_POLL_SECONDS):
+        self.clip_dir = Path(clip_dir)
+        self.poll_seconds = poll_seconds
+        self.version = 0
+        self.last_scan: Optional[float] = None
+        self.scan_ms: Optional[float] = None
+        self._clips: Dict[str, ClipInfo] = {}
+        self._words: List[str] = []
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        """Scan now and start polling; call off the event loop, since the first scan probes every clip"""
+        self._ensure_started()
+
+    def _ensure_started(self) -> None:
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is not None:
+                return
+            self.refresh()
+            self._thread = threading.Thread(target=self._poll, name="clip-index", daemon=True)
+            self._thread.start()
+
+    def _poll(self) -> None:
+        while True:
+            time.sleep(self.poll_seconds)
+            try:
+                self.refresh()
+            except Exception as e:
+                print(f"Error refreshing clip index: {e}")
+
+    def refresh(self) -> bool:
+        """Rescan the clip directory now; returns True if anything changed"""
+        started = time.perf_counter()
+        current = self._clips
+        clips: Dict[str, ClipInfo] = {}
+        if self.clip_dir.exists():
+            with os.scandir(self.clip_dir) as entries:
+                for entry in entries:
+                    if not entry.name.endswith(".mp4") or not entry.is_file():
+                        continue
+                    stat = entry.stat()
+                    word = entry.name[:-len(".mp4")]
+                    known = current.get(word)
+                    if known is not None and known.size == stat.st_size and known.mtime == stat.st_mtime:
+                        clips[word] = known
+                        continue
+                    duration, fps, width, height = probe_clip(Path(entry.path))
+                    clips[word] = ClipInfo(word, entry.path, stat.st_size, stat.st_mtime, duration, fps, width, height)
+
+        changed = clips.keys() != current.keys() or any(clips[word] is not current[word] for word in clips)
+        if changed:
+            # Swap in new objects so readers never see a half-built index
+            self._words = sorted(clips)
+            self._clips = clips
+            self.version += 1
+        self.last_scan = time.time()
+        self.scan_ms = round((time.perf_counter() - started) * 1000, 2)
+        return changed
+
+    def words(self) -> List[str]:
+        """Sorted clip words; the same list object until the index changes"""
+        self._ensure_started()
+        return self._words
+
+    def get(self, word: str) -> Optional[ClipInfo]:
+        self._ensure_started()
+        return self._clips.get(word)
+
+    def __contains__(self, word: str) -> bool:
+        return self.get(word) is not None
+
+    def __len__(self) -> int:
+        self._ensure_started()
+        return len(self._clips)
+
+    def snapshot(self) -> Dict:
+        self._ensure_started()
+        clips = self._clips
+        return {
+            "count": len(clips),
+            "version": self.version,
+            "last_scan": self.last_scan,
+            "scan_ms": self.scan_ms,
+            "poll_seconds": self.poll_seconds,
+            "clips": [asdict(clips[word]) for word in sorted(clips)],
+        }
@@ -0,0 +1,188 @@
+"""Micro-batching inference scheduler for the gesture classifier"""
+import asyncio
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+# Upper bound on landmark vectors per classifier call
+MAX_BATCH_SIZE = int(os.getenv("GESTURE_MAX_BATCH_SIZE", "32"))
+# How long the scheduler waits for more requests before running a partial batch
+MAX_WAIT_MS = float(os.getenv("GESTURE_MAX_WAIT_MS", "5"))
+
+
+class TFLiteBackend:
+    """Runs batched predictions on a TFLite interpreter"""
+
+    def __init__(self, interpreter, max_batch_size: int = MAX_BATCH_SIZE):
+        self.interpreter = interpreter
+        self.max_batch_size = max_batch_size
+
+        input_details = interpreter.get_input_details()[0]
+        self.input_index = input_details['index']
+        self.output_index = interpreter.get_output_details()[0]['index']
+        self.input_size = int(input_details['shape'][-1])
+
+        # Resize once to the largest batch; smaller batches are zero-padded so
+        # the interpreter never has to reallocate its tensors at runtime
+        interpreter.resize_tensor_input(self.input_index, [max_batch_size, self.input_size])
+        interpreter.allocate_tensors()
+        self._input = np.zeros((max_batch_size, self.input_size), dtype=np.float32)
+
+    def predict(self, batch: np.ndarray) -> np.ndarray:
+        """Return class probabilities for a (N, input_size) batch, N <= max_batch_size"""
+        count = len(batch)
+        self._input[:count] = batch
+        self._input[count:] = 0.0
+        self.interpreter.set_tensor(self.input_index, self._input)
+        self.interpreter.invoke()
+        return self.interpreter.get_tensor(self.output_index)[:count].copy()
+
+
+class NumpyBackend:
+    """Runs the Dense gesture MLP as vectorized NumPy matmuls, without TensorFlow"""
+
+    ACTIVATIONS = {
+        "linear": lambda x: x,
+        "relu": lambda x: np.maximum(x, 0.0, out=x),
+    }
+
+    def __init__(self, layers: List[Tuple[np.ndarray, np.ndarray]], activations: List[str]):
+        for activation in activations:
+            if activation not in self.ACTIVATIONS and activation != "softmax":
+                raise ValueError(f"Unsupported activation '{activation}' in gesture model")
+        self.layers = [(np.ascontiguousarray(kernel, dtype=np.float32), bias.astype(np.float32))
+                       for kernel, bias in layers]
+        self.activations = activations
+        self.input_size = self.layers[0][0].shape[0]
+
+    def predict(self, batch: np.ndarray) -> np.ndarray:
+        """Return class probabilities for a (N, input_size) batch of any size"""
+        x = np.asarray(batch, dtype=np.float32)
+        for (kernel, bias), activation in zip(self.layers, self.activations):
+            x = x @ kernel
+            x += bias
+            if activation == "softmax":
+                x -= x.max(axis=1, keepdims=True)
+                np.exp(x, out=x)
+                x /= x.sum(axis=1, keepdims=True)
+            else:
+                x = self.ACTIVATIONS[activation](x)
+        return x
+
+
+class BatchedClassifier:
+    """Collects landmark vectors from all live sessions into batched classifier calls.
+
+    Every caller awaits a future for its own row. A single worker task drains the
+    queue, waiting at most ``max_wait_ms`` to fill a batch of ``max_batch_size``,
+    and runs the backend on a dedicated thread so the event loop never blocks.
+    """
+
+    def __init__(self, backend, max_batch_size: int = MAX_BATCH_SIZE, max_wait_ms: float = MAX_WAIT_MS):
+        self.backend = backend
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+
+        # The interpreter is not thread-safe, so all calls go through one thread
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="gesture-infer")
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+
+        # Metrics
+        self.batches = 0
+        self.items = 0
+        self.batch_sizes: Dict[int, int] = {}
+        self.queue_wait_total = 0.0
+        self.queue_wait_max = 0.0
+        self.inference_total = 0.0
+
+    async def predict(self, landmarks: np.ndarray) -> np.ndarray:
+        """Classify one landmark vector and return its class probabilities"""
+        return (await self.predict_many(np.reshape(landmarks, (1, -1))))[0]
+
+    async def predict_many(self, landmarks: np.ndarray) -> np.ndarray:
+        """Classify a (N, 42) array of landmark vectors, sharing batches with other sessions"""
+        self._ensure_worker()
+        loop = asyncio.get_running_loop()
+        enqueued_at = time.perf_counter()
+        futures = []
+        for row in np.asarray(landmarks, dtype=np.float32):
+            future = loop.create_future()
+            self._queue.put_nowait((row, future, enqueued_at))
+            futures.append(future)
+        return np.stack(await asyncio.gather(*futures))
+
+    def metrics(self) -> Dict:
+        """Batch-size and queue-wait statistics since startup"""
+        return {
+            "batches": self.batches,
+            "items": self.items,
+            "avg_batch_size": round(self.items / self.batches, 2) if self.batches else 0.0,
+            "batch_size_histogram": dict(sorted(self.batch_sizes.items())),
+            "avg_queue_wait_ms": round(self.queue_wait_total / self.items * 1000, 3) if self.items else 0.0,
+            "max_queue_wait_ms": round(self.queue_wait_max * 1000, 3),
+            "avg_inference_ms": round(self.inference_total / self.batches * 1000, 3) if self.batches else 0.0,
+            "queue_depth": self._queue.qsize() if self._queue is not None else 0,
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000,
+        }
+
+    def _ensure_worker(self) -> None:
+        if self._worker is None or self._worker.done():
+            self._queue = asyncio.Queue()
+            self._worker = asyncio.get_running_loop().create_task(self._run())
+
+    async def _collect(self) -> List[Tuple[np.ndarray, asyncio.Future, float]]:
+        """Wait for the first request, then gather more until the batch is full or max_wait passes"""
+        loop = asyncio.get_running_loop()
+        items = [await self._queue.get()]
+        deadline = loop.time() + self.max_wait
+
+        while len(items) < self.max_batch_size:
+            try:
+                items.append(self._queue.get_nowait())
+                continue
+            except asyncio.QueueEmpty:
+                pass
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+            try:
+                items.append(await asyncio.wait_for(self._queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+        return items
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            items = await self._collect()
+            # Skip rows whose caller has gone away (e.g. a closed WebSocket)
+            items = [item for item in items if not item[1].done()]
+            if not items:
+                continue
+
+            started = time.perf_counter()
+            batch = np.stack([row for row, _, _ in items])
+            try:
+                predictions = await loop.run_in_executor(self._executor, self.backend.predict, batch)
+            except Exception as e:
+                for _, future, _ in items:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            finished = time.perf_counter()
+
+            self.batches += 1
+            self.items += len(items)
+            self.batch_sizes[len(items)] = self.batch_sizes.get(len(items), 0) + 1
+            self.inference_total += finished - started
+            for (_, future, enqueued_at), prediction in zip(items, predictions):
+                wait = started - enqueued_at
+                self.queue_wait_total += wait
+                self.queue_wait_max = max(self.queue_wait_max, wait)
+                if not future.done():
+                    future.set_result(prediction)
@@ -0,0 +1,172 @@
+"""Loading and on-disk caching of the gesture classifier model"""
+import hashlib
+import io
+import os
+import time
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from .gesture_inference import NumpyBackend, TFLiteBackend
+
+# Inference backend for the gesture classifier: "tflite" or "numpy"
+GESTURE_BACKEND = os.getenv("GESTURE_BACKEND", "tflite")
+
+# Get the absolute path to the backend directory
+backend_dir = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Define paths relative to backend directory
+MODEL_DIR = os.path.join(backend_dir, "model")
+KERAS_MODEL_PATH = os.path.join(MODEL_DIR, "gesture_model.h5")
+
+
+def file_hash(path: str) -> str:
+    """Return the SHA-256 hex digest of a file"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def cache_path(keras_path: str, source_hash: str, suffix: str) -> str:
+    """Path of a derived artifact stored next to the Keras model and keyed by its hash"""
+    source = Path(keras_path)
+    return str(source.with_name(f"{source.stem}.{source_hash[:16]}{suffix}"))
+
+
+def write_atomic(path: str, data: bytes) -> None:
+    """Write a file so concurrent readers never see a partial artifact"""
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+def remove_stale(keras_path: str, keep: str, suffix: str) -> None:
+    """Delete artifacts derived from older versions of the Keras model"""
+    source = Path(keras_path)
+    for path in source.parent.glob(f"{source.stem}.*{suffix}"):
+        if str(path) != keep:
+            try:
+                path.unlink()
+            except OSError as e:
+                print(f"Warning: could not remove stale model artifact {path}: {e}")
+
+
+def _import_tensorflow():
+    import tensorflow as tf
+
+    # Configure TensorFlow to use less GPU memory
+    gpus = tf.config.experimental.list_physical_devices('GPU')
+    if gpus:
+        try:
+            # Limit TensorFlow to only use a fraction of GPU memory
+            for gpu in gpus:
+                tf.config.experimental.set_memory_growth(gpu, True)
+            print("GPU memory growth enabled")
+        except RuntimeError as e:
+            print(f"GPU configuration error: {e}")
+    return tf
+
+
+def convert_to_tflite(keras_model) -> bytes:
+    """Convert a Keras model to a TFLite flatbuffer for better performance and lower memory usage"""
+    tf = _import_tensorflow()
+    converter = tf.lite.TFLiteConverter.from_keras_model(keras_model)
+    converter.optimizations = [tf.lite.Optimize.DEFAULT]
+    return converter.convert()
+
+
+def export_tflite(keras_model, keras_path: str = KERAS_MODEL_PATH, source_hash: Optional[str] = None) -> str:
+    """Convert a trained Keras model and store it as the cached .tflite for ``keras_path``"""
+    source_hash = source_hash or file_hash(keras_path)
+    path = cache_path(keras_path, source_hash, ".tflite")
+    write_atomic(path, convert_to_tflite(keras_model))
+    remove_stale(keras_path, path, ".tflite")
+    return path
+
+
+def load_tflite_model(keras_path: str = KERAS_MODEL_PATH) -> bytes:
+    """Return the TFLite flatbuffer for the Keras model, converting it only when the cache is stale"""
+    started = time.perf_counter()
+    path = cache_path(keras_path, file_hash(keras_path), ".tflite")
+
+    if os.path.exists(path):
+        with open(path, "rb") as f:
+            model_content = f.read()
+        print(f"Loaded cached TFLite model from {path} in {time.perf_counter() - started:.2f}s")
+        return model_content
+
+    print(f"No TFLite cache for {keras_path}, converting Keras model")
+    tf = _import_tensorflow()
+    keras_model = tf.keras.models.load_model(keras_path)
+    path = export_tflite(keras_model, keras_path)
+    with open(path, "rb") as f:
+        model_content = f.read()
+    print(f"Converted and cached TFLite model at {path} in {time.perf_counter() - started:.2f}s")
+    return model_content
+
+
+def export_npz(keras_model, keras_path: str = KERAS_MODEL_PATH, source_hash: Optional[str] = None) -> str:
+    """Store the Dense layer weights of a Keras model as the cached .npz for ``keras_path``"""
+    source_hash = source_hash or file_hash(keras_path)
+    path = cache_path(keras_path, source_hash, ".npz")
+
+    arrays = {}
+    activations = []
+    for layer in keras_model.layers:
+        weights = layer.get_weights()
+        if not weights:
+            # Dropout and other weightless layers are no-ops at inference time
+            continue
+        kernel, bias = weights
+        arrays[f"kernel_{len(activations)}"] = kernel.astype(np.float32)
+        arrays[f"bias_{len(activations)}"] = bias.astype(np.float32)
+        activations.append(layer.get_config().get("activation", "linear"))
+    arrays["activations"] = np.array(activations)
+
+    buffer = io.BytesIO()
+    np.savez(buffer, **arrays)
+    write_atomic(path, buffer.getvalue())
+    remove_stale(keras_path, path, ".npz")
+    return path
+
+
+def load_npz_weights(keras_path: str = KERAS_MODEL_PATH) -> Tuple[List[Tuple[np.ndarray, np.ndarray]], List[str]]:
+    """Return (kernel, bias) pairs and activation names, exporting them from Keras only when the cache is stale"""
+    started = time.perf_counter()
+    path = cache_path(keras_path, file_hash(keras_path), ".npz")
+
+    if not os.path.exists(path):
+        print(f"No NumPy weights cache for {keras_path}, exporting from Keras model")
+        keras_model = _import_tensorflow().keras.models.load_model(keras_path)
+        path = export_npz(keras_model, keras_path)
+
+    with np.load(path) as data:
+        activations = [str(name) for name in data["activations"]]
+        layers = [(data[f"kernel_{i}"], data[f"bias_{i}"]) for i in range(len(activations))]
+    print(f"Loaded NumPy gesture weights from {path} in {time.perf_counter() - started:.2f}s")
+    return layers, activations
+
+
+def create_interpreter(model_content: bytes):
+    """Create a TFLite interpreter, preferring the lightweight tflite_runtime package when installed"""
+    try:
+        from tflite_runtime.interpreter import Interpreter
+    except ImportError:
+        Interpreter = _import_tensorflow().lite.Interpreter
+    interpreter = Interpreter(model_content=model_content)
+    interpreter.allocate_tensors()
+    return interpreter
+
+
+def create_backend(name: str = GESTURE_BACKEND, keras_path: str = KERAS_MODEL_PATH):
+    """Build the configured classifier backend from the cached model artifacts"""
+    if name == "numpy":
+        layers, activations = load_npz_weights(keras_path)
+        return NumpyBackend(layers, activations)
+    if name == "tflite":
+        return TFLiteBackend(create_interpreter(load_tflite_model(keras_path)))
+    raise ValueError(f"Unknown gesture backend '{name}'. Use 'tflite' or 'numpy'.")
@@ -1,57 +1,41 @@
 from fastapi import FastAPI, WebSocket, WebSocketDisconnect, UploadFile, File, HTTPException
+import asyncio
 import cv2
-import mediapipe as mp
 import numpy as np
-import tensorflow as tf
 import base64
 import json
 import os
 import time
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Tuple
 
-# Configure TensorFlow to use less GPU memory
-gpus = tf.config.experimental.list_physical_devices('GPU')
-if gpus:
-    try:
-        # Limit TensorFlow to only use a fraction of GPU memory
-        for gpu in gpus:
-            tf.config.experimental.set_memory_growth(gpu, True)
-        print("GPU memory growth enabled")
-    except RuntimeError as e:
-        print(f"GPU configuration error: {e}")
+from .gesture_inference import BatchedClassifier
+from .hand_detection import HandDetectorPool
+from .gesture_model import MODEL_DIR, KERAS_MODEL_PATH, GESTURE_BACKEND, create_backend
+from .model_registry import registry
 
 # Create router instead of app
 from fastapi import APIRouter
 
 router = APIRouter()
 
-# Load trained model with path relative to the routes directory
-# Get the absolute path to the backend directory
-backend_dir = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-
-# Define paths relative to backend directory
-model_path = os.path.join(backend_dir, "model", "gesture_model.h5")
-label_map_path = os.path.join(backend_dir, "model", "gesture_label_map.npy")
-labels_path = os.path.join(backend_dir, "model", "gesture_labels.npy")
-
-# Load the model and convert to TFLite
-print(f"Loading model from {model_path}")
-keras_model = tf.keras.models.load_model(model_path)
+# Define paths relative to the model directory
+model_path = KERAS_MODEL_PATH
+label_map_path = os.path.join(MODEL_DIR, "gesture_label_map.npy")
+labels_path = os.path.join(MODEL_DIR, "gesture_labels.npy")
 
-# Convert model to TensorFlow Lite for better performance and lower memory usage
-converter = tf.lite.TFLiteConverter.from_keras_model(keras_model)
-converter.optimizations = [tf.lite.Optimize.DEFAULT]
-tflite_model = converter.convert()
+def load_gesture_classifier() -> BatchedClassifier:
+    """Load the classifier backend from the model artifacts cached next to the Keras model"""
+    print(f"Loading model from {model_path} (backend: {GESTURE_BACKEND})")
+    # Share the backend between all connections through a micro-batching scheduler
+    return BatchedClassifier(create_backend(GESTURE_BACKEND, model_path))
 
-# Load the TFLite model
-interpreter = tf.lite.Interpreter(model_content=tflite_model)
-interpreter.allocate_tensors()
+def load_hand_detector() -> HandDetectorPool:
+    """Create the pool of MediaPipe Hands detectors so detection never runs on the event loop"""
+    return HandDetectorPool(max_num_hands=1, min_detection_confidence=0.5)
 
-# Get input and output tensors
-input_details = interpreter.get_input_details()
-output_details = interpreter.get_output_details()
-
-print(f"Model loaded and converted to TFLite. Input shape: {input_details[0]['shape']}, Output shape: {output_details[0]['shape']}")
+# Models are loaded on first use or at warm-up
+registry.register("gesture_classifier", load_gesture_classifier, feature="gesture")
+registry.register("hand_detector", load_hand_detector, feature="gesture")
 
 # Load label map
 if os.path.exists(label_map_path):
@@ -74,16 +58,30 @@ else:
         print(f"Warning: Labels file not found at {labels_path}!")
         label_map = {}  # Empty fallback
 
-# Initialize MediaPipe Hands
-mp_hands = mp.solutions.hands
-hands = mp_hands.Hands(max_num_hands=1, min_detection_confidence=0.5)
-
 # Constants
 GESTURE_HOLD_TIME = 1.0  # Time in seconds to hold a gesture before adding to sequence
+# "latest" processes only the newest frame of each connection, "ordered" processes every frame
+GESTURE_INGEST_MODE = os.getenv("GESTURE_INGEST_MODE", "latest")
+
+# Binary formats accepted by the landmark-only WebSocket
+LANDMARK_DTYPES = {"float32": np.dtype("<f4"), "float16": np.dtype("<f2")}
+LANDMARK_VALUES = 42  # 21 landmarks * (x, y)
+
+# Frame counters across all WebSocket connections
+ingest_stats = {"processed": 0, "dropped": 0}
 
 @router.get("/")
 def read_root():
-    return {"message": "Gesture Recognition API is running. Connect to /ws with WebSocket."}
+    return {"message": "Gesture Recognition API is running. Connect to /ws with WebSocket, or /ws/landmarks to send pre-extracted landmarks."}
+
+@router.get("/metrics")
+def get_metrics():
+    """Classifier, detector and frame ingest statistics for the gesture pipeline"""
+    return {
+        "classifier": registry.get("gesture_classifier").metrics() if registry.is_ready("gesture_classifier") else None,
+        "detector": registry.get("hand_detector").metrics() if registry.is_ready("hand_detector") else None,
+        "ingest": ingest_stats
+    }
 
 @router.post("/process-video")
 async def process_video(video: UploadFile = File(...)):
@@ -97,6 +95,9 @@ async def process_video(video: UploadFile = File(...)):
         buffer.write(await video.read())
     
     try:
+        classifier = await registry.aget("gesture_classifier")
+        detector_pool = await registry.aget("hand_detector")
+        
         # Process the video
         cap = cv2.VideoCapture(temp_file)
         
@@ -110,8 +111,9 @@ async def process_video(video: UploadFile = File(...)):
         
         # Process frames
         frame_count = 0
+        detector_key = detector_pool.new_key()
         while cap.isOpened():
-            ret, frame = cap.read()
+            ret, frame = await asyncio.to_thread(cap.read)
             if not ret:
                 break
                 
@@ -121,29 +123,15 @@ async def process_video(video: UploadFile = File(...)):
                 continue
                 
             # Process the frame
-            frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-            results = hands.process(frame_rgb)
+            hand_landmarks = await detector_pool.detect_bgr(frame, key=detector_key)
             
-            if results.multi_hand_landmarks:
-                for hand_landmarks in results.multi_hand_landmarks:
-                    # Extract landmarks
-                    landmarks = []
-                    for lm in hand_landmarks.landmark:
-                        landmarks.extend([lm.x, lm.y])  # Store x, y
-                    
-                    # Ensure we have the correct number of landmarks
-                    if len(landmarks) != 42:
-                        continue
-                        
-                    landmarks = np.array(landmarks).reshape(1, -1).astype(np.float32)
-
-                    # Get predictions using TFLite
-                    interpreter.set_tensor(input_details[0]['index'], landmarks)
-                    interpreter.invoke()
-                    prediction = interpreter.get_tensor(output_details[0]['index'])
+            if len(hand_landmarks):
+                for landmarks in hand_landmarks:
+                    # Get predictions from the batched classifier
+                    prediction = await classifier.predict(landmarks)
                     
                     gesture_id = int(np.argmax(prediction))
-                    confidence = float(prediction[0][gesture_id])
+                    confidence = float(prediction[gesture_id])
                     
                     # Get gesture name from the label map
                     gesture_name = label_map.get(gesture_id, "Unknown")
@@ -177,135 +165,184 @@ async def process_video(video: UploadFile = File(...)):
             os.remove(temp_file)
         raise HTTPException(status_code=500, detail=f"Error processing video: {str(e)}")
 
+class GestureSequenceTracker:
+    """Turns per-frame predictions into a gesture sequence using hold-time rules"""
+
+    def __init__(self):
+        self.gesture_sequence: List[str] = []
+        self.last_gesture: Optional[str] = None
+        self.current_gesture_start_time: Optional[float] = None
+        self.no_gesture_start_time: Optional[float] = None
+        self.last_gesture_time: float = time.time()
+        self.sequence_complete: bool = False
+
+    def _response(self, gesture: str, confidence: float, **extra) -> Dict:
+        return {
+            "gesture": gesture,
+            "confidence": confidence,
+            "sequence": self.gesture_sequence,
+            "text": " ".join(self.gesture_sequence) if self.gesture_sequence else "",
+            **extra
+        }
+
+    def update(self, predictions: List[np.ndarray], current_time: float) -> Dict:
+        """Apply the class probabilities of every hand in one frame and return the client response"""
+        gesture_detected = False
+        response = self._response("Waiting...", 0.0)
+
+        for prediction in predictions:
+            gesture_id = int(np.argmax(prediction))
+            confidence = float(prediction[gesture_id])
+            
+            # Get gesture name from the label map
+            gesture_name = label_map.get(gesture_id, "Unknown")
+            
+            print(f"Predicted: {gesture_name} (ID: {gesture_id}) with confidence: {confidence:.2f}")
+            
+            # Modified logic for classification
+            if confidence > 0.6:
+                gesture_detected = True
+                
+                # If we had a sequence complete, start a new one when a new gesture is detected
+                if self.sequence_complete and gesture_name != self.last_gesture:
+                    self.gesture_sequence = []
+                    self.sequence_complete = False
+                
+                response = self._response(gesture_name, round(confidence, 2))
+                
+                # Handle the gesture timing
+                if gesture_name != self.last_gesture:
+                    # New gesture detected
+                    self.current_gesture_start_time = current_time
+                    self.last_gesture = gesture_name
+                elif self.current_gesture_start_time is not None:
+                    # Same gesture continued
+                    if (current_time - self.current_gesture_start_time >= GESTURE_HOLD_TIME and 
+                        gesture_name != "Unknown" and
+                        (not self.gesture_sequence or self.gesture_sequence[-1] != gesture_name)):
+                        # Gesture held long enough, add to sequence if not already the last one
+                        print(f"Adding {gesture_name} to sequence (held for {current_time - self.current_gesture_start_time:.2f}s)")
+                        self.gesture_sequence.append(gesture_name)
+                        # Reset the timer for this gesture
+                        self.current_gesture_start_time = None
+                
+                # Reset no-gesture timer
+                self.no_gesture_start_time = None
+                self.last_gesture_time = current_time
+            else:
+                response = self._response("Unknown", round(confidence, 2))
+
+        # If no gesture is detected for 3 seconds and we have gestures in the sequence, mark sequence as complete
+        if not gesture_detected:
+            self.current_gesture_start_time = None  # Reset the current gesture timer
+            
+            if self.no_gesture_start_time is None:
+                self.no_gesture_start_time = current_time
+            elif (current_time - self.no_gesture_start_time >= 3.0 and len(self.gesture_sequence) > 0
+                  and not self.sequence_complete):
+                print(f"Sequence complete: {self.gesture_sequence}")
+                self.sequence_complete = True
+                response = self._response("Waiting...", 0.0, sequence_complete=True)
+                
+            # Reset last_gesture if it's been more than 2 seconds since the last gesture
+            if current_time - self.last_gesture_time > 2.0:
+                self.last_gesture = None
+
+        return response
+
+class LatestFrameSlot:
+    """Holds only the newest unprocessed frame of a connection (latest-frame-wins)"""
+
+    def __init__(self):
+        self.frame: Optional[bytes] = None
+        self.received_at: float = 0.0
+        self.received = 0
+        self.dropped = 0
+        self.closed = False
+        self._ready = asyncio.Event()
+
+    def put(self, frame: bytes) -> None:
+        if self.frame is not None:
+            # The previous frame was never picked up; replace it
+            self.dropped += 1
+            ingest_stats["dropped"] += 1
+        self.frame = frame
+        self.received_at = time.perf_counter()
+        self.received += 1
+        self._ready.set()
+
+    def close(self) -> None:
+        self.closed = True
+        self._ready.set()
+
+    async def get(self) -> Optional[Tuple[bytes, float]]:
+        """Wait for a frame and return it with its arrival time, or None once the client is gone"""
+        while self.frame is None:
+            if self.closed:
+                return None
+            self._ready.clear()
+            await self._ready.wait()
+        frame, self.frame = self.frame, None
+        return frame, self.received_at
+
+async def _read_latest_frames(websocket: WebSocket, slot: LatestFrameSlot) -> None:
+    """Reader task: keep receiving so the socket never backs up, retaining only the newest frame"""
+    try:
+        while True:
+            slot.put(await websocket.receive_bytes())
+    finally:
+        slot.close()
+
 @router.websocket("/ws")
-async def websocket_endpoint(websocket: WebSocket):
+async def websocket_endpoint(websocket: WebSocket, ingest: Optional[str] = None):
     await websocket.accept()
-    print("WebSocket connection accepted")
+    ingest = ingest or GESTURE_INGEST_MODE
+    print(f"WebSocket connection accepted (ingest mode: {ingest})")
     
-    # Variables for tracking gesture sequence
-    gesture_sequence: List[str] = []
-    last_gesture: Optional[str] = None
-    current_gesture_start_time: Optional[float] = None
-    no_gesture_start_time: Optional[float] = None
-    last_gesture_time: float = time.time()
-    sequence_complete: bool = False
+    classifier = await registry.aget("gesture_classifier")
+    detector_pool = await registry.aget("hand_detector")
+    tracker = GestureSequenceTracker()
+    detector_key = detector_pool.new_key()
+    processed = 0
+    slot: Optional[LatestFrameSlot] = None
+    reader: Optional[asyncio.Task] = None
+    if ingest == "latest":
+        slot = LatestFrameSlot()
+        reader = asyncio.create_task(_read_latest_frames(websocket, slot))
     
     try:
         while True:
             # Receive frame from client
-            data = await websocket.receive_bytes()
+            if slot is not None:
+                item = await slot.get()
+                if item is None:
+                    # Surface the reader's WebSocketDisconnect (or error)
+                    await reader
+                    break
+                data, received_at = item
+            else:
+                data = await websocket.receive_bytes()
+                received_at = time.perf_counter()
             
-            # Convert bytes to numpy array
-            nparr = np.frombuffer(data, np.uint8)
-            frame = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
+            # Decode the frame and detect hands on the detector pool
+            hand_landmarks = await detector_pool.detect_encoded(data, key=detector_key)
             
-            if frame is None:
+            if hand_landmarks is None:
                 continue
-                
-            # Process the frame
-            frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-            results = hands.process(frame_rgb)
             
-            current_time = time.time()
-            gesture_detected = False
+            # Get predictions from the batched classifier
+            predictions = await classifier.predict_many(hand_landmarks) if len(hand_landmarks) else []
+            response = tracker.update(predictions, time.time())
             
-            response = {
-                "gesture": "Waiting...",
-                "confidence": 0.0,
-                "sequence": gesture_sequence,
-                "text": " ".join(gesture_sequence) if gesture_sequence else ""
+            processed += 1
+            ingest_stats["processed"] += 1
+            response["frames"] = {
+                "received": slot.received if slot is not None else processed,
+                "processed": processed,
+                "dropped": slot.dropped if slot is not None else 0,
+                "latency_ms": round((time.perf_counter() - received_at) * 1000, 1)
             }
             
-            if results.multi_hand_landmarks:
-                for hand_landmarks in results.multi_hand_landmarks:
-                    # Extract landmarks
-                    landmarks = []
-                    for lm in hand_landmarks.landmark:
-                        landmarks.extend([lm.x, lm.y])  # Store x, y
-                    
-                    # Ensure we have the correct number of landmarks
-                    if len(landmarks) != 42:
-                        continue
-                        
-                    landmarks = np.array(landmarks).reshape(1, -1).astype(np.float32)
-
-                    # Get predictions using TFLite
-                    interpreter.set_tensor(input_details[0]['index'], landmarks)
-                    interpreter.invoke()
-                    prediction = interpreter.get_tensor(output_details[0]['index'])
-                    
-                    gesture_id = int(np.argmax(prediction))
-                    confidence = float(prediction[0][gesture_id])
-                    
-                    # Get gesture name from the label map
-                    gesture_name = label_map.get(gesture_id, "Unknown")
-                    
-                    print(f"Predicted: {gesture_name} (ID: {gesture_id}) with confidence: {confidence:.2f}")
-                    
-                    # Modified logic for classification
-                    if confidence > 0.6:
-                        gesture_detected = True
-                        
-                        # If we had a sequence complete, start a new one when a new gesture is detected
-                        if sequence_complete and gesture_name != last_gesture:
-                            gesture_sequence = []
-                            sequence_complete = False
-                        
-                        response = {
-                            "gesture": gesture_name,
-                            "confidence": round(confidence, 2),
-                            "sequence": gesture_sequence,
-                            "text": " ".join(gesture_sequence) if gesture_sequence else ""
-                        }
-                        
-                        # Handle the gesture timing
-                        if gesture_name != last_gesture:
-                            # New gesture detected
-                            current_gesture_start_time = current_time
-                            last_gesture = gesture_name
-                        elif current_gesture_start_time is not None:
-                            # Same gesture continued
-                            if (current_time - current_gesture_start_time >= GESTURE_HOLD_TIME and 
-                                gesture_name != "Unknown" and
-                                (not gesture_sequence or gesture_sequence[-1] != gesture_name)):
-                                # Gesture held long enough, add to sequence if not already the last one
-                                print(f"Adding {gesture_name} to sequence (held for {current_time - current_gesture_start_time:.2f}s)")
-                                gesture_sequence.append(gesture_name)
-                                # Reset the timer for this gesture
-                                current_gesture_start_time = None
-                        
-                        # Reset no-gesture timer
-                        no_gesture_start_time = None
-                        last_gesture_time = current_time
-                    else:
-                        response = {
-                            "gesture": "Unknown",
-                            "confidence": round(confidence, 2),
-                            "sequence": gesture_sequence,
-                            "text": " ".join(gesture_sequence) if gesture_sequence else ""
-                        }
-
-            # If no gesture is detected for 3 seconds and we have gestures in the sequence, mark sequence as complete
-            if not gesture_detected:
-                current_gesture_start_time = None  # Reset the current gesture timer
-                
-                if no_gesture_start_time is None:
-                    no_gesture_start_time = current_time
-                elif current_time - no_gesture_start_time >= 3.0 and len(gesture_sequence) > 0 and not sequence_complete:
-                    print(f"Sequence complete: {gesture_sequence}")
-                    sequence_complete = True
-                    response = {
-                        "gesture": "Waiting...",
-                        "confidence": 0.0,
-                        "sequence": gesture_sequence,
-                        "text": " ".join(gesture_sequence) if gesture_sequence else "",
-                        "sequence_complete": True
-                    }
-                    
-                # Reset last_gesture if it's been more than 2 seconds since the last gesture
-                if current_time - last_gesture_time > 2.0:
-                    last_gesture = None
-            
             await websocket.send_text(json.dumps(response))
 
     except WebSocketDisconnect:
@@ -315,5 +352,89 @@ async def websocket_endpoint(websocket: WebSocket):
         import traceback
         traceback.print_exc()
     finally:
+        if reader is not None and not reader.done():
+            reader.cancel()
         print("WebSocket Connection Closed")
-        # Don't try to close the connection here, it's already closed
\ No newline at end of file
+        # Don't try to close the connection here, it's already closed
+
+def decode_landmark_frames(data: bytes, dtype: np.dtype) -> np.ndarray:
+    """Unpack a message of packed 21x2 landmark frames into a (frames, 42) float32 array"""
+    frame_size = LANDMARK_VALUES * dtype.itemsize
+    if len(data) % frame_size != 0:
+        raise ValueError(f"Message length {len(data)} is not a multiple of the {frame_size}-byte frame size")
+    return np.frombuffer(data, dtype=dtype).astype(np.float32).reshape(-1, LANDMARK_VALUES)
+
+@router.websocket("/ws/landmarks")
+async def landmarks_websocket_endpoint(websocket: WebSocket, dtype: str = "float32"):
+    """Classify pre-extracted hand landmarks, skipping JPEG decoding and hand detection.
+
+    Each binary message holds one or more frames of 42 little-endian values
+    (x0, y0, ..., x20, y20) in the dtype given by the ``dtype`` query parameter
+    (``float32`` or ``float16``). A frame filled with NaN means no hand was seen.
+    """
+    await websocket.accept()
+    if dtype not in LANDMARK_DTYPES:
+        await websocket.send_text(json.dumps({"error": f"Unsupported dtype '{dtype}'. Use one of: {', '.join(LANDMARK_DTYPES)}"}))
+        await websocket.close(code=1003)
+        return
+    frame_dtype = LANDMARK_DTYPES[dtype]
+    classifier = await registry.aget("gesture_classifier")
+    print(f"Landmark WebSocket connection accepted (dtype: {dtype})")
+    
+    tracker = GestureSequenceTracker()
+    processed = 0
+    last_message_time = time.time()
+    
+    try:
+        while True:
+            data = await websocket.receive_bytes()
+            received_at = time.perf_counter()
+            message_time = time.time()
+            
+            try:
+                frames = decode_landmark_frames(data, frame_dtype)
+            except ValueError as e:
+                await websocket.send_text(json.dumps({"error": str(e)}))
+                continue
+            
+            if not len(frames):
+                continue
+            
+            # Classify every frame with a hand in one call, then replay them through the tracker in order
+            has_hand = ~np.isnan(frames).any(axis=1)
+            predictions = await classifier.predict_many(frames[has_hand]) if has_hand.any() else []
+            # Frames of one message were captured since the previous message; spread their timestamps
+            # over that interval (at most a second) so hold times advance per frame, not per message
+            interval = min(message_time - last_message_time, 1.0)
+            last_message_time = message_time
+            prediction_rows = iter(predictions)
+            completed = None
+            for i, hand in enumerate(has_hand):
+                frame_time = message_time - interval * (len(frames) - 1 - i) / len(frames)
+                response = tracker.update([next(prediction_rows)] if hand else [], frame_time)
+                if response.get("sequence_complete"):
+                    completed = response
+            
+            processed += len(frames)
+            ingest_stats["processed"] += len(frames)
+            frame_stats = {
+                "in_message": len(frames),
+                "processed": processed,
+                "latency_ms": round((time.perf_counter() - received_at) * 1000, 1)
+            }
+            
+            # A sentence completed by an earlier frame must reach the client even if later frames moved on
+            if completed is not None and completed is not response:
+                completed["frames"] = frame_stats
+                await websocket.send_text(json.dumps(completed))
+            response["frames"] = frame_stats
+            await websocket.send_text(json.dumps(response))
+
+    except WebSocketDisconnect:
+        print("Client disconnected")
+    except Exception as e:
+        print(f"Error: {e}")
+        import traceback
+        traceback.print_exc()
+    finally:
+        print("Landmark WebSocket Connection Closed")
@@ -0,0 +1,171 @@
+"""Rule-based mapping of English text onto the sign clip vocabulary, used before asking the LLM"""
+import os
+import re
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# Share of content words that must map to clips for the result to be used without the LLM
+GLOSS_MIN_COVERAGE = float(os.getenv("GLOSS_MIN_COVERAGE", "0.75"))
+
+# Words signs usually leave out; they neither count against coverage nor produce clips
+STOPWORDS = {
+    "a", "an", "the", "is", "am", "are", "was", "were", "be", "been", "being",
+    "do", "does", "did", "to", "of", "at", "in", "on", "for", "with", "by",
+    "and", "or", "but", "so", "that", "this", "these", "those", "it", "its",
+    "will", "would", "shall", "should", "can", "could", "may", "might", "must",
+    "has", "have", "had", "just", "very", "really", "please", "um", "uh",
+    "some", "any", "as", "than", "then", "there", "here", "about",
+}
+
+CONTRACTIONS = {
+    "can't": ["can", "not"], "won't": ["will", "not"], "n't": ["not"], "i'm": ["i", "am"],
+    "'re": ["are"], "'ve": ["have"], "'ll": ["will"], "'d": ["would"], "'s": [],
+}
+
+# Common words mapped to the word a clip is more likely to be named after
+SYNONYMS = {
+    "hi": "hello", "hey": "hello", "greetings": "hello",
+    "thanks": "thank_you", "thx": "thank_you",
+    "bye": "goodbye", "goodbye": "bye",
+    "yes": "yeah", "yeah": "yes", "ok": "okay", "okay": "ok",
+    "me": "i", "my": "i", "mine": "i", "myself": "i",
+    "your": "you", "yours": "you", "yourself": "you",
+    "we": "us", "our": "us",
+    "dad": "father", "father": "dad", "mom": "mother", "mum": "mother", "mother": "mom",
+    "kid": "child", "kids": "child", "children": "child",
+    "home": "house", "house": "home",
+    "glad": "happy", "joyful": "happy", "unhappy": "sad",
+    "large": "big", "huge": "big", "little": "small", "tiny": "small",
+    "quick": "fast", "rapid": "fast", "slowly": "slow",
+    "purchase": "buy", "acquire": "get", "receive": "get",
+    "assist": "help", "aid": "help",
+    "automobile": "car", "vehicle": "car",
+    "physician": "doctor", "medic": "doctor",
+    "restroom": "toilet", "bathroom": "toilet",
+    "beverage": "drink", "meal": "food", "eat": "food",
+    "no": "not", "nope": "no", "never": "not",
+    "went": "go", "gone": "go", "going": "go",
+    "ate": "eat", "eaten": "eat", "saw": "see", "seen": "see",
+    "came": "come", "made": "make", "took": "take", "gave": "give",
+    "said": "say", "told": "tell", "knew": "know", "thought": "think",
+    "felt": "feel", "left": "leave", "bought": "buy", "brought": "bring",
+}
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+(?:'[a-z]+)?")
+_PHRASE_SPLIT_RE = re.compile(r"[_\-\s]+")
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase words with contractions expanded"""
+    tokens = []
+    for token in _TOKEN_RE.findall(text.lower().replace("’", "'")):
+        if token in CONTRACTIONS:
+            tokens.extend(CONTRACTIONS[token])
+            continue
+        head, apostrophe, tail = token.partition("'")
+        if apostrophe:
+            suffix = "n't" if head.endswith("n") and tail == "t" else f"'{tail}"
+            if suffix == "n't":
+                head = head[:-1]
+            tokens.append(head)
+            tokens.extend(CONTRACTIONS.get(suffix, []))
+        else:
+            tokens.append(token)
+    return tokens
+
+
+def stem(word: str) -> str:
+    """Light suffix stripping; only needs to agree between the text and the vocabulary"""
+    if len(word) <= 3:
+        return word
+    for suffix, replacement in (("ies", "y"), ("ied", "y"), ("ing", ""), ("ed", ""), ("es", ""), ("ly", ""), ("s", "")):
+        if word.endswith(suffix) and len(word) - len(suffix) >= 3:
+            word = word[:-len(suffix)] + replacement
+            break
+    # "running" -> "runn" -> "run"
+    if len(word) > 3 and word[-1] == word[-2] and word[-1] not in "aeiouls":
+        word = word[:-1]
+    return word
+
+
+@dataclass
+class GlossResult:
+    words: List[str]
+    coverage: float
+    unmatched: List[str] = field(default_factory=list)
+
+
+class GlossEngine:
+    """Index of the clip vocabulary by exact word, stem, synonym and multi-word phrase.
+
+    Clip names containing ``_``, ``-`` or spaces (e.g. ``thank_you``) are matched
+    as phrases, longest first. Building the index is linear in the vocabulary
+    and translating is linear in the length of the text.
+    """
+
+    def __init__(self, vocabulary: Iterable[str]):
+        self.vocabulary = set(vocabulary)
+        self.exact: Dict[str, str] = {}
+        self.stems: Dict[str, str] = {}
+        self.phrases: Dict[Tuple[str, ...], str] = {}
+        for clip_word in sorted(self.vocabulary):
+            parts = tuple(part for part in _PHRASE_SPLIT_RE.split(clip_word.lower()) if part)
+            if not parts:
+                continue
+            if len(parts) == 1:
+                self.exact.setdefault(parts[0], clip_word)
+                self.stems.setdefault(stem(parts[0]), clip_word)
+            else:
+                self.phrases.setdefault(parts, clip_word)
+                self.phrases.setdefault(tuple(stem(part) for part in parts), clip_word)
+        self.max_phrase = max((len(parts) for parts in self.phrases), default=1)
+
+    def lookup(self, token: str) -> Optional[str]:
+        """Clip word for a single token, or None"""
+        clip_word = self.exact.get(token)
+        if clip_word is not None:
+            return clip_word
+        synonym = SYNONYMS.get(token)
+        if synonym is not None:
+            clip_word = self.exact.get(synonym) or self.stems.get(stem(synonym))
+            if clip_word is None and synonym in self.vocabulary:
+                # Synonyms may name a phrase clip directly, e.g. "thanks" -> "thank_you"
+                clip_word = synonym
+            if clip_word is not None:
+                return clip_word
+        return self.stems.get(stem(token))
+
+    def translate(self, text: str) -> GlossResult:
+        tokens = tokenize(text)
+        words: List[str] = []
+        unmatched: List[str] = []
+        content = matched = 0
+        i = 0
+        while i < len(tokens):
+            # Longest phrase starting here
+            phrase = None
+            for n in range(min(self.max_phrase, len(tokens) - i), 1, -1):
+                window = tokens[i:i + n]
+                phrase = self.phrases.get(tuple(window)) or self.phrases.get(tuple(stem(t) for t in window))
+                if phrase is not None:
+                    words.append(phrase)
+                    content += n
+                    matched += n
+                    i += n
+                    break
+            if phrase is not None:
+                continue
+
+            token = tokens[i]
+            i += 1
+            clip_word = self.lookup(token)
+            if clip_word is not None:
+                words.append(clip_word)
+                content += 1
+                matched += 1
+            elif token not in STOPWORDS:
+                content += 1
+                unmatched.append(token)
+
+        coverage = matched / content if content else 0.0
+        return GlossResult(words=words, coverage=coverage, unmatched=unmatched)
@@ -0,0 +1,147 @@
+"""Pool of MediaPipe hand detectors that async handlers can await"""
+import asyncio
+import itertools
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Hashable, Optional
+
+import numpy as np
+
+# Number of detector threads, each with its own mp_hands.Hands instance
+DETECTOR_WORKERS = int(os.getenv("GESTURE_DETECTOR_WORKERS", str(os.cpu_count() or 1)))
+# Frames allowed to wait per worker before callers are made to wait (backpressure)
+DETECTOR_QUEUE_SIZE = int(os.getenv("GESTURE_DETECTOR_QUEUE_SIZE", "2"))
+
+
+def extract_landmarks(results) -> np.ndarray:
+    """Flatten MediaPipe results into a (hands, 42) float32 array of x, y coordinates"""
+    rows = []
+    if results.multi_hand_landmarks:
+        for hand_landmarks in results.multi_hand_landmarks:
+            landmarks = []
+            for lm in hand_landmarks.landmark:
+                landmarks.extend([lm.x, lm.y])  # Store x, y
+            # Ensure we have the correct number of landmarks
+            if len(landmarks) == 42:
+                rows.append(landmarks)
+    return np.array(rows, dtype=np.float32).reshape(-1, 42)
+
+
+class _DetectorWorker:
+    """One thread owning one mp_hands.Hands instance"""
+
+    def __init__(self, index: int, hands_kwargs: Dict):
+        # Imported here rather than at module level, so importing the gesture router does not
+        # load MediaPipe until the registry actually builds the detector
+        import cv2
+        import mediapipe as mp
+        self.cv2 = cv2
+        self.mp_hands = mp.solutions.hands
+        self.hands_kwargs = hands_kwargs
+        self.hands = None
+        self.pending = 0
+        self.executor = ThreadPoolExecutor(
+            max_workers=1,
+            thread_name_prefix=f"hand-detector-{index}",
+            initializer=self._create_hands,
+        )
+
+    def _create_hands(self) -> None:
+        # Hands graphs keep per-instance tracking state, so each thread gets its own
+        self.hands = self.mp_hands.Hands(**self.hands_kwargs)
+
+    def detect(self, frame_rgb: np.ndarray) -> np.ndarray:
+        return extract_landmarks(self.hands.process(frame_rgb))
+
+    def detect_bgr(self, frame_bgr: np.ndarray) -> np.ndarray:
+        return self.detect(self.cv2.cvtColor(frame_bgr, self.cv2.COLOR_BGR2RGB))
+
+    def detect_encoded(self, data: bytes) -> Optional[np.ndarray]:
+        frame = self.cv2.imdecode(np.frombuffer(data, np.uint8), self.cv2.IMREAD_COLOR)
+        if frame is None:
+            return None
+        return self.detect_bgr(frame)
+
+
+class HandDetectorPool:
+    """Runs hand detection on a pool of worker threads with bounded queues.
+
+    Calls made with the same ``key`` (e.g. one WebSocket connection or one
+    uploaded video) always go to the same worker so MediaPipe can track the
+    hand across consecutive frames. Calls without a key go to the least busy
+    worker. Once a worker has ``queue_size`` frames waiting, further callers
+    wait for a free slot instead of piling up more work.
+    """
+
+    def __init__(self, workers: int = DETECTOR_WORKERS, queue_size: int = DETECTOR_QUEUE_SIZE, **hands_kwargs):
+        hands_kwargs.setdefault("max_num_hands", 1)
+        hands_kwargs.setdefault("min_detection_confidence", 0.5)
+        self.workers = [_DetectorWorker(i, hands_kwargs) for i in range(max(1, workers))]
+        self.queue_size = queue_size
+        self._slots: Dict[int, asyncio.Semaphore] = {}
+        self._lock = threading.Lock()
+        self._keys = itertools.count()
+
+        # Metrics
+        self.frames = 0
+        self.detect_total = 0.0
+        self.wait_total = 0.0
+
+    def new_key(self) -> int:
+        """Return a fresh key that pins a stream of frames to one worker"""
+        return next(self._keys)
+
+    async def detect_rgb(self, frame_rgb: np.ndarray, key: Optional[Hashable] = None) -> np.ndarray:
+        """Detect hands in an RGB frame, returning a (hands, 42) landmark array"""
+        return await self._submit("detect", frame_rgb, key)
+
+    async def detect_bgr(self, frame_bgr: np.ndarray, key: Optional[Hashable] = None) -> np.ndarray:
+        """Detect hands in a BGR frame as returned by OpenCV"""
+        return await self._submit("detect_bgr", frame_bgr, key)
+
+    async def detect_encoded(self, data: bytes, key: Optional[Hashable] = None) -> Optional[np.ndarray]:
+        """Decode a JPEG/PNG frame and detect hands, or return None if it cannot be decoded"""
+        return await self._submit("detect_encoded", data, key)
+
+    def metrics(self) -> Dict:
+        """Throughput and queueing statistics since startup"""
+        return {
+            "workers": len(self.workers),
+            "queue_size": self.queue_size,
+            "frames": self.frames,
+            "pending": [worker.pending for worker in self.workers],
+            "avg_detect_ms": round(self.detect_total / self.frames * 1000, 3) if self.frames else 0.0,
+            "avg_slot_wait_ms": round(self.wait_total / self.frames * 1000, 3) if self.frames else 0.0,
+        }
+
+    def _pick(self, key: Optional[Hashable]) -> int:
+        if key is not None:
+            return hash(key) % len(self.workers)
+        return min(range(len(self.workers)), key=lambda i: self.workers[i].pending)
+
+    def _slot(self, index: int) -> asyncio.Semaphore:
+        with self._lock:
+            if index not in self._slots:
+                # One frame running plus queue_size frames waiting
+                self._slots[index] = asyncio.Semaphore(1 + self.queue_size)
+            return self._slots[index]
+
+    async def _submit(self, method: str, frame, key: Optional[Hashable]):
+        index = self._pick(key)
+        worker = self.workers[index]
+        loop = asyncio.get_running_loop()
+
+        enqueued_at = time.perf_counter()
+        async with self._slot(index):
+            worker.pending += 1
+            started = time.perf_counter()
+            try:
+                return await loop.run_in_executor(worker.executor, getattr(worker, method), frame)
+            finally:
+                worker.pending -= 1
+                finished = time.perf_counter()
+                self.frames += 1
+                self.detect_total += finished - started
+                self.wait_total += started - enqueued_at
@@ -0,0 +1,218 @@
+"""Shared async client for the Ollama LLM with a concurrency limit, timeouts, retries and a response cache"""
+import asyncio
+import os
+import time
+from collections import OrderedDict, deque
+from typing import AsyncIterator, Dict, Optional, Tuple
+
+import ollama
+
+LLM_MODEL = os.getenv("LLM_MODEL", "llama3.2")
+# Requests sent to Ollama at the same time by this process; the rest wait their turn
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "4"))
+LLM_TIMEOUT_SECONDS = float(os.getenv("LLM_TIMEOUT_SECONDS", "60"))
+# Extra attempts after a timeout, connection error or server error
+LLM_RETRIES = int(os.getenv("LLM_RETRIES", "2"))
+LLM_CACHE_SIZE = int(os.getenv("LLM_CACHE_SIZE", "1024"))
+LLM_CACHE_TTL_SECONDS = float(os.getenv("LLM_CACHE_TTL_SECONDS", "3600"))
+
+
+def _retryable(error: Exception) -> bool:
+    """Client errors (e.g. an unknown model) will not go away by asking again"""
+    if isinstance(error, ollama.ResponseError):
+        return error.status_code >= 500
+    return True
+
+
+class _Abandoned(Exception):
+    """Handed to requests waiting on an identical prompt whose request was cancelled"""
+
+
+class LLMClient:
+    """One pooled Ollama connection per process, shared by every route that rewrites text.
+
+    Replies are cached by (model, prompt) with a TTL and LRU eviction, and
+    identical prompts that arrive while the first is still running wait for
+    its reply instead of asking the model again.
+    """
+
+    def __init__(self, host: Optional[str] = None, max_concurrency: int = LLM_MAX_CONCURRENCY,
+                 timeout: float = LLM_TIMEOUT_SECONDS, retries: int = LLM_RETRIES,
+                 cache_size: int = LLM_CACHE_SIZE, cache_ttl: float = LLM_CACHE_TTL_SECONDS):
+        self.host = host
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+        self.retries = retries
+        self.cache_size = cache_size
+        self.cache_ttl = cache_ttl
+        # Created on first use so they belong to the running event loop
+        self._client: Optional[ollama.AsyncClient] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._cache: "OrderedDict[Tuple[str, str], Tuple[float, str]]" = OrderedDict()
+        self._inflight: Dict[Tuple[str, str], asyncio.Future] = {}
+
+        # Metrics
+        self.counters = {
+            "requests": 0, "cache_hits": 0, "cache_misses": 0, "coalesced": 0,
+            "retries": 0, "timeouts": 0, "errors": 0, "cache_evictions": 0,
+        }
+        self.latencies = deque(maxlen=1000)
+
+    @property
+    def client(self) -> ollama.AsyncClient:
+        if self._client is None:
+            # OLLAMA_HOST is used when no host is given
+            self._client = ollama.AsyncClient(host=self.host, timeout=self.timeout)
+        return self._client
+
+    @property
+    def semaphore(self) -> asyncio.Semaphore:
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self._semaphore
+
+    async def chat(self, prompt: str, model: str = LLM_MODEL, use_cache: bool = True) -> str:
+        """Return the model's reply to a single user prompt"""
+        if not use_cache:
+            return await self._chat_with_retries(model, prompt)
+
+        key = (model, prompt)
+        while True:
+            cached = self._cache_get(key)
+            if cached is not None:
+                return cached
+            if key not in self._inflight:
+                break
+            self.counters["coalesced"] += 1
+            try:
+                return await asyncio.shield(self._inflight[key])
+            except _Abandoned:
+                # The request we joined was cancelled (e.g. its client went away), not this one; ask again
+                continue
+        self.counters["cache_misses"] += 1
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            text = await self._chat_with_retries(model, prompt)
+        except asyncio.CancelledError:
+            # Cancelling the future would cancel every request waiting on it
+            future.set_exception(_Abandoned())
+            future.exception()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # Nobody else may be waiting; avoid "exception was never retrieved" warnings
+            future.exception()
+            raise
+        finally:
+            self._inflight.pop(key, None)
+        self._cache_put(key, text)
+        future.set_result(text)
+        return text
+
+    async def stream_chat(self, prompt: str, model: str = LLM_MODEL) -> AsyncIterator[str]:
+        """Yield the reply as it is generated; a cached reply is yielded in one piece"""
+        key = (model, prompt)
+        cached = self._cache_get(key)
+        if cached is not None:
+            yield cached
+            return
+        self.counters["cache_misses"] += 1
+
+        async with self.semaphore:
+            for attempt in range(self.retries + 1):
+                self.counters["requests"] += 1
+                started = time.perf_counter()
+                parts = []
+                try:
+                    stream = await asyncio.wait_for(
+                        self.client.chat(model=model, messages=[{"role": "user", "content": prompt}], stream=True),
+                        self.timeout
+                    )
+                    iterator = stream.__aiter__()
+                    while True:
+                        try:
+                            part = await asyncio.wait_for(iterator.__anext__(), self.timeout)
+                        except StopAsyncIteration:
+                            break
+                        parts.append(part["message"]["content"])
+                        yield parts[-1]
+                except Exception as e:
+                    # Once text has been handed out a retry would repeat it
+                    if parts or attempt == self.retries or not _retryable(e):
+                        self._record_error(e)
+                        raise
+                    self._record_error(e)
+                    self.counters["retries"] += 1
+                    await asyncio.sleep(0.5 * 2 ** attempt)
+                    continue
+                self.latencies.append(time.perf_counter() - started)
+                self._cache_put(key, "".join(parts))
+                return
+
+    def metrics(self) -> Dict:
+        latencies = sorted(self.latencies)
+        # Prompts that joined an identical request in flight also skipped the model
+        saved = self.counters["cache_hits"] + self.counters["coalesced"]
+        lookups = saved + self.counters["cache_misses"]
+        return {
+            **self.counters,
+            "model": LLM_MODEL,
+            "max_concurrency": self.max_concurrency,
+            "in_flight": len(self._inflight),
+            "cache_entries": len(self._cache),
+            "cache_hit_rate": round(saved / lookups, 3) if lookups else 0.0,
+            "latency_p50_ms": round(latencies[len(latencies) // 2] * 1000, 1) if latencies else None,
+            "latency_p95_ms": round(latencies[int(len(latencies) * 0.95)] * 1000, 1) if latencies else None,
+        }
+
+    async def _chat_with_retries(self, model: str, prompt: str) -> str:
+        async with self.semaphore:
+            for attempt in range(self.retries + 1):
+                self.counters["requests"] += 1
+                started = time.perf_counter()
+                try:
+                    response = await asyncio.wait_for(
+                        self.client.chat(model=model, messages=[{"role": "user", "content": prompt}]),
+                        self.timeout
+                    )
+                except Exception as e:
+                    self._record_error(e)
+                    if attempt == self.retries or not _retryable(e):
+                        raise
+                    self.counters["retries"] += 1
+                    await asyncio.sleep(0.5 * 2 ** attempt)
+                    continue
+                self.latencies.append(time.perf_counter() - started)
+                return response["message"]["content"]
+
+    def _record_error(self, error: Exception) -> None:
+        if isinstance(error, asyncio.TimeoutError):
+            self.counters["timeouts"] += 1
+        else:
+            self.counters["errors"] += 1
+
+    def _cache_get(self, key: Tuple[str, str]) -> Optional[str]:
+        entry = self._cache.get(key)
+        if entry is None:
+            return None
+        expires, text = entry
+        if expires < time.monotonic():
+            del self._cache[key]
+            return None
+        self._cache.move_to_end(key)
+        self.counters["cache_hits"] += 1
+        return text
+
+    def _cache_put(self, key: Tuple[str, str], text: str) -> None:
+        if self.cache_size <= 0:
+            return
+        self._cache[key] = (time.monotonic() + self.cache_ttl, text)
+        self._cache.move_to_end(key)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+            self.counters["cache_evictions"] += 1
+
+
+llm = LLMClient()
@@ -0,0 +1,49 @@
+"""Static serving of videos and clips with cache validators that let browsers and proxies skip downloads"""
+import os
+from typing import Callable, Optional
+
+from fastapi.staticfiles import StaticFiles
+from starlette.datastructures import Headers
+from starlette.responses import FileResponse, Response
+from starlette.staticfiles import NotModifiedResponse
+
+# How long browsers may reuse a file without asking again. Names do not address content (a video is
+# re-rendered under the same name after eviction or deletion, clips can be replaced), so not forever
+CLIP_CACHE_SECONDS = int(os.getenv("CLIP_CACHE_SECONDS", "3600"))
+VIDEO_CACHE_SECONDS = int(os.getenv("VIDEO_CACHE_SECONDS", "3600"))
+
+
+def file_etag(stat_result: os.stat_result) -> str:
+    """Strong ETag from the file's identity; a rewritten file gets a new one, so ranges never mix two files"""
+    return f'"{stat_result.st_ino:x}-{stat_result.st_size:x}-{stat_result.st_mtime_ns:x}"'
+
+
+class MediaFiles(StaticFiles):
+    """StaticFiles with explicit caching headers and access reporting.
+
+    Range requests (206), ``If-Range`` and ``HEAD`` are handled by Starlette's
+    ``FileResponse``, which reads the file in chunks or hands it to the server
+    with zero-copy ``pathsend`` where the server supports it. Every file gets a
+    strong ETag from its inode, size and mtime and is cached for ``max_age``
+    seconds; ``If-None-Match`` is answered with 304.
+    """
+
+    def __init__(self, *args, max_age: int = CLIP_CACHE_SECONDS,
+                 on_access: Optional[Callable[[str], None]] = None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.max_age = max_age
+        self.on_access = on_access
+
+    def file_response(self, full_path, stat_result: os.stat_result, scope, status_code: int = 200) -> Response:
+        response = FileResponse(full_path, status_code=status_code, stat_result=stat_result)
+        response.headers["etag"] = file_etag(stat_result)
+        response.headers["cache-control"] = f"public, max-age={self.max_age}"
+        if self.is_not_modified(response.headers, Headers(scope=scope)):
+            return NotModifiedResponse(response.headers)
+        return response
+
+    async def get_response(self, path: str, scope) -> Response:
+        response = await super().get_response(path, scope)
+        if self.on_access is not None and response.status_code < 400:
+            self.on_access(os.path.basename(path))
+        return response
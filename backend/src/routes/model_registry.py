@@ -0,0 +1,113 @@
+"""Registry of heavy models that are loaded on first use or at warm-up"""
+import asyncio
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+# Subsystems served by this worker; routers of the others are never imported
+ALL_FEATURES = ["auth", "transcription", "video", "tts", "gesture"]
+ENABLED_FEATURES = [
+    feature.strip() for feature in os.getenv("ENABLED_FEATURES", ",".join(ALL_FEATURES)).split(",")
+    if feature.strip()
+]
+# Models loaded in the lifespan hook instead of on first request ("all" for every registered model)
+WARMUP_MODELS = [name.strip() for name in os.getenv("WARMUP_MODELS", "").split(",") if name.strip()]
+
+
+class _Entry:
+    def __init__(self, name: str, loader: Callable[[], Any], feature: Optional[str]):
+        self.name = name
+        self.loader = loader
+        self.feature = feature
+        self.model: Any = None
+        self.state = "not_loaded"
+        self.error: Optional[str] = None
+        self.load_seconds: Optional[float] = None
+        self.lock = threading.Lock()
+
+
+class ModelRegistry:
+    """Keeps one lazily loaded instance of each registered model"""
+
+    def __init__(self):
+        self._entries: Dict[str, _Entry] = {}
+
+    def register(self, name: str, loader: Callable[[], Any], feature: Optional[str] = None) -> None:
+        """Register a loader; nothing is loaded until the model is first requested"""
+        if name not in self._entries:
+            self._entries[name] = _Entry(name, loader, feature)
+
+    def names(self) -> List[str]:
+        return list(self._entries)
+
+    def get(self, name: str) -> Any:
+        """Return the model, loading it on this thread if needed"""
+        entry = self._entries.get(name)
+        if entry is None:
+            raise KeyError(f"Model '{name}' is not registered")
+        if entry.state == "ready":
+            return entry.model
+
+        with entry.lock:
+            # Another thread may have finished loading while we waited for the lock
+            if entry.state == "ready":
+                return entry.model
+            entry.state = "loading"
+            entry.error = None
+            print(f"Loading model '{name}'...")
+            started = time.perf_counter()
+            try:
+                entry.model = entry.loader()
+            except Exception as e:
+                entry.state = "failed"
+                entry.error = str(e)
+                print(f"Failed to load model '{name}': {e}")
+                raise
+            entry.load_seconds = round(time.perf_counter() - started, 3)
+            entry.state = "ready"
+            print(f"Model '{name}' loaded in {entry.load_seconds:.2f}s")
+            return entry.model
+
+    async def aget(self, name: str) -> Any:
+        """Return the model from async code, loading it on a worker thread so the event loop keeps running"""
+        entry = self._entries.get(name)
+        if entry is not None and entry.state == "ready":
+            return entry.model
+        return await asyncio.to_thread(self.get, name)
+
+    def is_ready(self, name: str) -> bool:
+        entry = self._entries.get(name)
+        return entry is not None and entry.state == "ready"
+
+    def warm_up(self, names: List[str]) -> None:
+        """Load the given models now; failures are reported and left for the next request to retry"""
+        if "all" in names:
+            names = self.names()
+        for name in names:
+            if name not in self._entries:
+                print(f"Warning: cannot warm up unknown model '{name}'")
+                continue
+            try:
+                self.get(name)
+            except Exception:
+                pass
+
+    def status(self, name: str) -> Dict:
+        entry = self._entries.get(name)
+        if entry is None:
+            raise KeyError(f"Model '{name}' is not registered")
+        return {
+            "name": entry.name,
+            "feature": entry.feature,
+            "state": entry.state,
+            "ready": entry.state == "ready",
+            "load_seconds": entry.load_seconds,
+            "error": entry.error,
+        }
+
+    def statuses(self) -> List[Dict]:
+        return [self.status(name) for name in self._entries]
+
+
+registry = ModelRegistry()
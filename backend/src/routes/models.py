@@ -0,0 +1,38 @@
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import JSONResponse
+
+from .model_registry import registry, ENABLED_FEATURES
+from .llm import llm
+
+# Create a router instance
+router = APIRouter()
+
+@router.get("")
+async def list_models():
+    """List every registered model with its loading state"""
+    return {"features": ENABLED_FEATURES, "models": registry.statuses()}
+
+@router.get("/llm")
+async def llm_metrics():
+    """Latency, cache and retry counters of the shared LLM client"""
+    return llm.metrics()
+
+@router.get("/{name}/ready")
+async def model_ready(name: str):
+    """Readiness probe for one model: 200 once loaded, 503 until then"""
+    try:
+        status = registry.status(name)
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"Model '{name}' is not registered")
+    return JSONResponse(status_code=200 if status["ready"] else 503, content=status)
+
+@router.post("/{name}/load")
+async def load_model(name: str):
+    """Load a model now instead of waiting for its first request"""
+    try:
+        await registry.aget(name)
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"Model '{name}' is not registered")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error loading model: {str(e)}")
+    return registry.status(name)
@@ -1,29 +1,145 @@
-from fastapi import APIRouter, HTTPException, UploadFile, File
-import whisper
+from fastapi import APIRouter, HTTPException, UploadFile, File, WebSocket, WebSocketDisconnect
+import asyncio
+import json
 import os
+import tempfile
+from pathlib import Path
+from typing import List
+
+from .model_registry import registry
+from .transcription_stream import StreamingTranscriber, PCM_DTYPES, pcm_to_float, whisper_lock
+from .transcription_jobs import TranscriptionJobQueue
 
 # Create a router instance
 router = APIRouter()
 
-# Load the Whisper model once when the application starts
-model = whisper.load_model("tiny")
+def load_whisper_model():
+    """Load the Whisper model; importing whisper pulls in torch, so it is deferred too"""
+    import whisper
+    return whisper.load_model("tiny")
+
+# The Whisper model is loaded once, on first use or at warm-up
+registry.register("whisper", load_whisper_model, feature="transcription")
+
+# Batched background transcription for many clips at once
+job_queue = TranscriptionJobQueue(lambda: registry.get("whisper"))
+
+def transcribe_file(model, file_location: str) -> dict:
+    """Run Whisper on a file; blocking, so call it from a worker thread"""
+    with whisper_lock:
+        return model.transcribe(file_location)
 
 @router.post("")
 async def transcribe_audio(file: UploadFile = File(...)):
+    file_location = None
     try:
-        # Save the uploaded audio file temporarily
-        file_location = f"temp_{file.filename}"
-        with open(file_location, "wb") as f:
-            f.write(await file.read())
+        model = await registry.aget("whisper")
 
-        # Use Whisper model to transcribe the audio file
-        result = model.transcribe(file_location)
+        # Save the uploaded audio file to a private temporary file
+        with tempfile.NamedTemporaryFile(delete=False, suffix=Path(file.filename or "").suffix) as f:
+            file_location = f.name
+            f.write(await file.read())
 
-        # Clean up temporary file
-        os.remove(file_location)
+        # Use Whisper model to transcribe the audio file without blocking the event loop
+        result = await asyncio.to_thread(transcribe_file, model, file_location)
 
         # Return the transcription result
         return {"transcription": result["text"]}
 
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error processing file: {str(e)}")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"Error processing file: {str(e)}")
+    finally:
+        # Clean up temporary file
+        if file_location and os.path.exists(file_location):
+            os.remove(file_location)
+
+@router.post("/jobs")
+async def submit_transcription_job(files: List[UploadFile] = File(...)):
+    """Queue one or more audio files for batched transcription and return a job id immediately"""
+    saved = []
+    try:
+        for file in files:
+            with tempfile.NamedTemporaryFile(delete=False, suffix=Path(file.filename or "").suffix) as f:
+                # Track the file before writing, so a failed write does not leave it behind
+                saved.append((file.filename, f.name))
+                f.write(await file.read())
+    except Exception as e:
+        for _, path in saved:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+        raise HTTPException(status_code=500, detail=f"Error saving files: {str(e)}")
+
+    job_id = job_queue.submit(saved)
+    return {"job_id": job_id, "status": "queued", "clips": len(saved)}
+
+@router.get("/jobs/metrics")
+async def transcription_job_metrics():
+    """Batching and throughput statistics for the transcription job queue"""
+    return job_queue.metrics()
+
+@router.get("/jobs/{job_id}")
+async def get_transcription_job(job_id: str):
+    """Status of a transcription job, with per-clip results once they are ready"""
+    job = job_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+@router.websocket("/ws")
+async def transcribe_stream(websocket: WebSocket, sample_rate: int = 16000, dtype: str = "int16"):
+    """Stream audio in and receive partial and final transcript segments as they become ready.
+
+    Binary messages carry raw mono PCM (``dtype`` int16 or float32, little-endian,
+    at ``sample_rate`` Hz). Send the text message ``end`` once the recording is
+    over; the server then flushes the remaining audio and replies with ``done``.
+    """
+    await websocket.accept()
+    if dtype not in PCM_DTYPES:
+        await websocket.send_text(json.dumps({"type": "error", "error": f"Unsupported dtype '{dtype}'. Use one of: {', '.join(PCM_DTYPES)}"}))
+        await websocket.close(code=1003)
+        return
+
+    model = await registry.aget("whisper")
+    transcriber = StreamingTranscriber(model)
+    decode_task = None
+
+    async def decode_and_send(final: bool = False):
+        # Whisper runs on a worker thread; audio keeps arriving meanwhile
+        events = await asyncio.to_thread(transcriber.decode, final)
+        for event in events:
+            await websocket.send_text(json.dumps(event))
+
+    try:
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                raise WebSocketDisconnect(message.get("code", 1000))
+
+            if message.get("bytes"):
+                transcriber.append(pcm_to_float(message["bytes"], dtype, sample_rate))
+            elif (message.get("text") or "").strip().lower() == "end":
+                break
+
+            # Only one decode per connection at a time; the next one picks up everything new
+            if transcriber.ready and (decode_task is None or decode_task.done()):
+                if decode_task is not None:
+                    decode_task.result()  # Surface errors from the previous decode
+                decode_task = asyncio.create_task(decode_and_send())
+
+        if decode_task is not None:
+            await decode_task
+        await decode_and_send(final=True)
+        await websocket.send_text(json.dumps({"type": "done", "text": " ".join(transcriber.final_text)}))
+        await websocket.close()
+
+    except WebSocketDisconnect:
+        print("Transcription client disconnected")
+    except Exception as e:
+        print(f"Error in streaming transcription: {e}")
+        await websocket.send_text(json.dumps({"type": "error", "error": str(e)}))
+        await websocket.close(code=1011)
+    finally:
+        if decode_task is not None and not decode_task.done():
+            decode_task.cancel()
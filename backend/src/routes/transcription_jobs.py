@@ -0,0 +1,182 @@
+"""Job queue that transcribes uploaded clips in batches on background worker threads"""
+import os
+import queue
+import threading
+import time
+import uuid
+from typing import Callable, Dict, List, Optional, Tuple
+
+from .transcription_stream import SAMPLE_RATE, STREAM_MAX_WINDOW_SECONDS, whisper_lock
+
+# Clips decoded together in one Whisper forward pass
+TRANSCRIBE_BATCH_SIZE = int(os.getenv("TRANSCRIBE_BATCH_SIZE", "8"))
+# Worker threads pulling batches off the queue. Decodes share whisper_lock, so more than one worker
+# only overlaps audio loading and mel spectrograms with another worker's decode, not decodes themselves
+TRANSCRIBE_WORKERS = int(os.getenv("TRANSCRIBE_WORKERS", "1"))
+# How long a worker waits for more clips before decoding a partial batch
+TRANSCRIBE_BATCH_WAIT_MS = float(os.getenv("TRANSCRIBE_BATCH_WAIT_MS", "50"))
+# Finished jobs are forgotten after this many seconds
+TRANSCRIBE_JOB_TTL_SECONDS = float(os.getenv("TRANSCRIBE_JOB_TTL_SECONDS", "3600"))
+
+
+def transcribe_batch(model, paths: List[str]) -> List[str]:
+    """Transcribe several audio files, batching every clip that fits in one 30 second window"""
+    import torch
+    import whisper
+
+    audios = [whisper.load_audio(path) for path in paths]
+    texts: List[Optional[str]] = [None] * len(paths)
+
+    short = [i for i, audio in enumerate(audios) if len(audio) <= STREAM_MAX_WINDOW_SECONDS * SAMPLE_RATE]
+    if short:
+        mels = torch.stack([
+            whisper.log_mel_spectrogram(whisper.pad_or_trim(audios[i]), model.dims.n_mels)
+            for i in short
+        ]).to(model.device)
+        options = whisper.DecodingOptions(fp16=model.device.type == "cuda", without_timestamps=True)
+        with whisper_lock:
+            results = whisper.decode(model, mels, options)
+        for i, result in zip(short, results):
+            texts[i] = result.text.strip()
+
+    # Longer clips need Whisper's sliding window, which only works one clip at a time
+    for i, audio in enumerate(audios):
+        if texts[i] is None:
+            with whisper_lock:
+                texts[i] = model.transcribe(audio, fp16=model.device.type == "cuda")["text"].strip()
+    return texts
+
+
+class TranscriptionJobQueue:
+    """Accepts jobs of one or more clips and decodes clips from all jobs in shared batches"""
+
+    def __init__(self, get_model: Callable, batch_size: int = TRANSCRIBE_BATCH_SIZE,
+                 workers: int = TRANSCRIBE_WORKERS, batch_wait_ms: float = TRANSCRIBE_BATCH_WAIT_MS):
+        self.get_model = get_model
+        self.batch_size = batch_size
+        self.workers = workers
+        self.batch_wait = batch_wait_ms / 1000.0
+        self.jobs: Dict[str, Dict] = {}
+        self._clips: "queue.Queue[Tuple[str, int]]" = queue.Queue()
+        self._lock = threading.Lock()
+        self._threads: List[threading.Thread] = []
+
+        # Metrics
+        self.batches = 0
+        self.clips = 0
+        self.decode_total = 0.0
+
+    def submit(self, files: List[Tuple[str, str]]) -> str:
+        """Queue (filename, temp path) pairs as one job and return its id right away"""
+        self._start()
+        self._forget_expired()
+        job_id = uuid.uuid4().hex
+        with self._lock:
+            self.jobs[job_id] = {
+                "job_id": job_id,
+                "status": "queued",
+                "created_at": time.time(),
+                "finished_at": None,
+                "clips": [
+                    {"filename": filename, "path": path, "status": "queued", "transcription": None, "error": None}
+                    for filename, path in files
+                ],
+            }
+        for index in range(len(files)):
+            self._clips.put((job_id, index))
+        return job_id
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        """Return the public view of a job, or None if it is unknown or expired"""
+        with self._lock:
+            job = self.jobs.get(job_id)
+            if job is None:
+                return None
+            return {
+                **{key: value for key, value in job.items() if key != "clips"},
+                "clips": [{key: value for key, value in clip.items() if key != "path"} for clip in job["clips"]],
+            }
+
+    def metrics(self) -> Dict:
+        return {
+            "workers": self.workers,
+            "batch_size": self.batch_size,
+            "queued_clips": self._clips.qsize(),
+            "batches": self.batches,
+            "clips": self.clips,
+            "avg_batch_size": round(self.clips / self.batches, 2) if self.batches else 0.0,
+            "clips_per_second": round(self.clips / self.decode_total, 2) if self.decode_total else 0.0,
+        }
+
+    def _start(self) -> None:
+        with self._lock:
+            if self._threads:
+                return
+            for i in range(max(1, self.workers)):
+                thread = threading.Thread(target=self._run, name=f"transcribe-worker-{i}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def _forget_expired(self) -> None:
+        cutoff = time.time() - TRANSCRIBE_JOB_TTL_SECONDS
+        with self._lock:
+            for job_id in [job_id for job_id, job in self.jobs.items()
+                           if job["finished_at"] is not None and job["finished_at"] < cutoff]:
+                del self.jobs[job_id]
+
+    def _next_batch(self) -> List[Tuple[str, int]]:
+        batch = [self._clips.get()]
+        deadline = time.monotonic() + self.batch_wait
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                if remaining > 0:
+                    batch.append(self._clips.get(timeout=remaining))
+                else:
+                    batch.append(self._clips.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _set_clip(self, job_id: str, index: int, **fields) -> None:
+        with self._lock:
+            job = self.jobs[job_id]
+            job["clips"][index].update(fields)
+            states = {clip["status"] for clip in job["clips"]}
+            if states <= {"completed", "failed"}:
+                job["status"] = "failed" if states == {"failed"} else "completed"
+                job["finished_at"] = time.time()
+            else:
+                job["status"] = "running"
+
+    def _transcribe_one(self, path: str) -> Dict:
+        """Transcribe a single clip so one bad file does not fail the rest of its batch"""
+        try:
+            return dict(status="completed", transcription=transcribe_batch(self.get_model(), [path])[0])
+        except Exception as e:
+            return dict(status="failed", error=str(e))
+
+    def _run(self) -> None:
+        while True:
+            batch = self._next_batch()
+            with self._lock:
+                paths = [self.jobs[job_id]["clips"][index]["path"] for job_id, index in batch]
+            for job_id, index in batch:
+                self._set_clip(job_id, index, status="running")
+
+            started = time.perf_counter()
+            try:
+                model = self.get_model()
+                texts = transcribe_batch(model, paths)
+                results = [dict(status="completed", transcription=text) for text in texts]
+            except Exception as e:
+                print(f"Error transcribing batch, retrying clips one by one: {e}")
+                results = [self._transcribe_one(path) for path in paths]
+            self.decode_total += time.perf_counter() - started
+            self.batches += 1
+            self.clips += len(batch)
+
+            for (job_id, index), result, path in zip(batch, results, paths):
+                self._set_clip(job_id, index, **result)
+                if os.path.exists(path):
+                    os.remove(path)
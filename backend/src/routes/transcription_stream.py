@@ -0,0 +1,113 @@
+"""Incremental Whisper transcription over overlapping windows of streamed audio"""
+import os
+import threading
+from typing import Dict, List
+
+import numpy as np
+
+SAMPLE_RATE = 16000  # Whisper works on 16 kHz mono audio
+# Run a new decode once this much unseen audio has arrived
+STREAM_STEP_SECONDS = float(os.getenv("TRANSCRIBE_STREAM_STEP_SECONDS", "2"))
+# Segments ending closer than this to the end of the buffer may still change and stay partial
+STREAM_HOLDBACK_SECONDS = float(os.getenv("TRANSCRIBE_STREAM_HOLDBACK_SECONDS", "2"))
+# Longest window decoded at once; Whisper's receptive field is 30 seconds
+STREAM_MAX_WINDOW_SECONDS = 30.0
+
+# Whisper models are not safe to run from several threads at once
+whisper_lock = threading.Lock()
+
+PCM_DTYPES = {"int16": np.dtype("<i2"), "float32": np.dtype("<f4")}
+
+
+def pcm_to_float(data: bytes, dtype: str, sample_rate: int) -> np.ndarray:
+    """Convert little-endian mono PCM bytes to 16 kHz float32 samples in [-1, 1]"""
+    samples = np.frombuffer(data, dtype=PCM_DTYPES[dtype]).astype(np.float32)
+    if dtype == "int16":
+        samples /= 32768.0
+    if sample_rate != SAMPLE_RATE and len(samples):
+        # Linear resampling is plenty for speech recognition
+        duration = len(samples) / sample_rate
+        target = np.arange(0, duration, 1 / SAMPLE_RATE)
+        samples = np.interp(target, np.arange(len(samples)) / sample_rate, samples).astype(np.float32)
+    return samples
+
+
+class StreamingTranscriber:
+    """Keeps the not-yet-final tail of a stream and turns Whisper output into partial and final segments.
+
+    Each decode covers the audio after the last final segment. Segments that end
+    well before the end of that window are final and the buffer is trimmed past
+    them; the rest are reported as partial and decoded again with more context
+    on the next pass.
+    """
+
+    def __init__(self, model):
+        self.model = model
+        self.buffer = np.zeros(0, dtype=np.float32)
+        self.offset = 0.0  # Stream time of buffer[0] in seconds
+        self.unseen = 0  # Samples appended since the last decode started
+        self.final_text: List[str] = []
+        # decode() runs on a worker thread while append() keeps running on the event loop
+        self._lock = threading.Lock()
+
+    def append(self, samples: np.ndarray) -> None:
+        with self._lock:
+            self.buffer = np.concatenate([self.buffer, samples])
+            self.unseen += len(samples)
+
+    @property
+    def ready(self) -> bool:
+        """True once enough new audio has arrived to be worth another decode"""
+        return self.unseen >= STREAM_STEP_SECONDS * SAMPLE_RATE
+
+    def decode(self, final: bool = False) -> List[Dict]:
+        """Transcribe the current buffer (blocking) and return segment events"""
+        with self._lock:
+            self.unseen = 0
+            audio = self.buffer
+        if not len(audio):
+            return []
+        window_seconds = len(audio) / SAMPLE_RATE
+
+        with whisper_lock:
+            result = self.model.transcribe(
+                audio,
+                fp16=self.model.device.type == "cuda",
+                condition_on_previous_text=False,
+                initial_prompt=" ".join(self.final_text[-3:]) or None,
+            )
+        segments = [segment for segment in result["segments"] if segment["text"].strip()]
+
+        # Decide which segments can no longer change
+        if final:
+            stable = len(segments)
+        else:
+            stable = sum(1 for segment in segments if segment["end"] <= window_seconds - STREAM_HOLDBACK_SECONDS)
+            if stable == 0 and window_seconds >= STREAM_MAX_WINDOW_SECONDS - STREAM_STEP_SECONDS and segments:
+                # The window is about to outgrow Whisper's context; commit what we have
+                stable = max(1, len(segments) - 1)
+
+        events = []
+        for i, segment in enumerate(segments):
+            events.append({
+                "type": "final" if i < stable else "partial",
+                "start": round(self.offset + segment["start"], 2),
+                "end": round(self.offset + segment["end"], 2),
+                "text": segment["text"].strip(),
+            })
+
+        if final:
+            cut = len(audio)
+        elif stable:
+            cut = min(len(audio), int(segments[stable - 1]["end"] * SAMPLE_RATE))
+        elif window_seconds > STREAM_MAX_WINDOW_SECONDS:
+            # Nothing recognisable (e.g. silence); drop the oldest audio
+            cut = len(audio) - int(STREAM_MAX_WINDOW_SECONDS * SAMPLE_RATE)
+        else:
+            cut = 0
+        self.final_text.extend(event["text"] for event in events if event["type"] == "final")
+        with self._lock:
+            # Audio appended during the decode stays at the end of the buffer
+            self.buffer = self.buffer[cut:]
+            self.offset += cut / SAMPLE_RATE
+        return events
@@ -1,13 +1,23 @@
-from fastapi import APIRouter, Query
-from fastapi.responses import JSONResponse
+from fastapi import APIRouter, Query, WebSocket, WebSocketDisconnect
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from starlette.concurrency import iterate_in_threadpool
+import asyncio
+import io
+import json
+import struct
+import threading
+import time
+import numpy as np
 import uvicorn
 import torch
-import os
 import torchaudio
-from .utils import build_model, generate_speech
+from urllib.parse import quote
+from .utils import build_model, generate_speech, iter_speech, list_available_voices, voice_registry, SentenceSplitter, SENTENCE_SPLIT_PATTERN
+from .model_registry import registry
+from .tts_cache import TTSCache, cache_key
+from .llm import llm
 import base64
 import scipy.io.wavfile as wavfile
-import ollama
 import logging
 
 # Configure logging
@@ -17,56 +27,228 @@ logger = logging.getLogger(__name__)
 # Create a router instance
 router = APIRouter()
 
-# Create output directory if it doesn't exist
-OUTPUT_DIR = "outputs"
-os.makedirs(OUTPUT_DIR, exist_ok=True)
-
 # Use GPU if available, otherwise fallback to CPU
 DEVICE = "cuda" if torch.cuda.is_available() else "cpu"
 
-# Initialize Kokoro TTS model
-model = build_model(None, DEVICE)
+SAMPLE_RATE = 24000  # Kokoro output sample rate
+
+# The shared Kokoro pipeline's G2P (misaki/espeak) is not thread-safe; synthesize one segment at a time
+kokoro_lock = threading.Lock()
+
+def locked_generate_speech(*args):
+    """generate_speech under kokoro_lock, for use from worker threads"""
+    with kokoro_lock:
+        return generate_speech(*args)
+
+def locked_segments(segments):
+    """Advance a speech generator under kokoro_lock, one segment at a time so concurrent streams interleave"""
+    while True:
+        with kokoro_lock:
+            try:
+                segment = next(segments)
+            except StopIteration:
+                return
+        yield segment
+
+def pcm16_samples(audio_tensor: torch.Tensor) -> np.ndarray:
+    """Convert a float audio tensor to little-endian 16-bit PCM samples"""
+    audio = np.clip(audio_tensor.cpu().numpy(), -1.0, 1.0)
+    return (audio * 32767).astype("<i2")
+
+def encode_wav(audio_tensor: torch.Tensor) -> bytes:
+    """Encode an audio tensor as 16-bit PCM WAV bytes in memory, the same samples the streaming endpoints send"""
+    buffer = io.BytesIO()
+    wavfile.write(buffer, SAMPLE_RATE, pcm16_samples(audio_tensor))
+    return buffer.getvalue()
+
+def audio_response(wav_bytes: bytes, response_format: str, text: str = None):
+    """Return audio as a binary audio/wav response, or as a Base64 data URI in JSON for older clients"""
+    if response_format == "json":
+        content = {"audio": f"data:audio/wav;base64,{base64.b64encode(wav_bytes).decode('utf-8')}"}
+        if text is not None:
+            content = {"text": text, **content}
+        return JSONResponse(content=content)
+    headers = {"X-Natural-Text": quote(text)} if text is not None else None
+    return Response(content=wav_bytes, media_type="audio/wav", headers=headers)
+
+def pcm16(audio_tensor: torch.Tensor) -> bytes:
+    """Convert a float audio tensor to little-endian 16-bit PCM bytes"""
+    return pcm16_samples(audio_tensor).tobytes()
+
+def wav_stream_header() -> bytes:
+    """WAV header for 16-bit mono PCM of unknown length, so audio can be streamed as it is generated"""
+    unknown = 0xFFFFFFFF
+    return (
+        b"RIFF" + struct.pack("<I", unknown) + b"WAVE"
+        + b"fmt " + struct.pack("<IHHIIHH", 16, 1, 1, SAMPLE_RATE, SAMPLE_RATE * 2, 2, 16)
+        + b"data" + struct.pack("<I", unknown)
+    )
+
+# The Kokoro TTS model is built on first use or at warm-up
+registry.register("kokoro", lambda: build_model(None, DEVICE), feature="tts")
+
+# Synthesized audio is cached by text, voice, language, speed and model version
+tts_cache = TTSCache()
+
+async def synthesize_wav(text: str, voice: str, lang: str, speed: float):
+    """Return WAV bytes for the text, from the cache when possible; None if generation failed"""
+    key = cache_key(text, voice, lang, speed)
+    wav_bytes = await asyncio.to_thread(tts_cache.get, key)
+    if wav_bytes is not None:
+        return wav_bytes
+
+    model = await registry.aget("kokoro")
+    # Generate speech off the event loop
+    audio_tensor, _ = await asyncio.to_thread(locked_generate_speech, model, text, voice, lang, DEVICE, speed)
+    if audio_tensor is None:
+        return None
+
+    # Encode the audio as WAV in memory, no temporary file needed
+    wav_bytes = encode_wav(audio_tensor)
+    await asyncio.to_thread(tts_cache.put, key, wav_bytes)
+    return wav_bytes
+
+def sign_language_prompt(word_sequence: str) -> str:
+    """Prompt asking the LLM to turn a sequence of signed words into a natural sentence"""
+    return f"""You are a sign language interpreter. Convert the following sequence of sign language words into natural, 
+        fluent English. Maintain the meaning while making it grammatically correct and natural sounding.
+        
+        Sign language word sequence: {word_sequence}
+        
+        Your response should only contain the converted sentence. No extra texts or formatting required"""
+
+def clean_llm_text(text: str) -> str:
+    """Clean up the response (remove quotes if present)"""
+    return text.replace('"', '').replace("'", "").strip()
+
+@router.get("/cache/stats")
+async def cache_stats():
+    """Hit, miss and eviction counters of the TTS audio cache"""
+    return tts_cache.stats()
+
+@router.get("/voices")
+async def voices():
+    """Voices on disk, and memory use and load time of the voices loaded so far"""
+    return {"available": list_available_voices(), **voice_registry.report()}
 
 @router.post("/convert")
 async def tts(
     text: str = Query(..., description="Text to convert to speech"),
     voice: str = Query("af_bella", description="Voice model to use (e.g., af_bella, am_adam)"),
     lang: str = Query("a", description="Language code: 'a' for American, 'b' for British"),
-    speed: float = Query(1.0, description="Speech speed (0.5-2.0)")
+    speed: float = Query(1.0, description="Speech speed (0.5-2.0)"),
+    format: str = Query("wav", description="Response format: 'wav' for binary audio, 'json' for a Base64 data URI")
 ):
-    """TTS endpoint: Converts text to speech and returns audio as Base64"""
+    """TTS endpoint: Converts text to speech and returns WAV audio"""
     try:
-        # Generate speech
-        audio_tensor, _ = generate_speech(model, text, voice, lang, DEVICE, speed)
+        wav_bytes = await synthesize_wav(text, voice, lang, speed)
 
-        if audio_tensor is None:
+        if wav_bytes is None:
             return JSONResponse(status_code=500, content={"error": "Failed to generate speech"})
 
-        # Convert the audio tensor to numpy array
-        audio_numpy = audio_tensor.cpu().numpy()
-        
-        # Save audio as WAV file using scipy instead of torchaudio
-        output_path = os.path.join(OUTPUT_DIR, "output.wav")
-        wavfile.write(output_path, 24000, audio_numpy)
-
-        # Convert the audio to Base64
-        with open(output_path, "rb") as audio_file:
-            audio_base64 = base64.b64encode(audio_file.read()).decode('utf-8')
-
-        # Return Base64-encoded audio
-        return JSONResponse(content={
-            "audio": f"data:audio/wav;base64,{audio_base64}"
-        })
+        return audio_response(wav_bytes, format)
 
     except Exception as e:
         return JSONResponse(status_code=500, content={"error": str(e)})
 
+@router.post("/stream")
+async def tts_stream(
+    text: str = Query(..., description="Text to convert to speech"),
+    voice: str = Query("af_bella", description="Voice model to use (e.g., af_bella, am_adam)"),
+    lang: str = Query("a", description="Language code: 'a' for American, 'b' for British"),
+    speed: float = Query(1.0, description="Speech speed (0.5-2.0)")
+):
+    """Streaming TTS endpoint: sends WAV audio with chunked transfer, one chunk per sentence as it is synthesized"""
+    # Check the voice up front; once streaming starts errors can no longer change the status code
+    if not voice_registry.exists(voice):
+        return JSONResponse(status_code=400, content={"error": f"Voice not found: {voice}"})
+
+    # Cached audio is already complete, so there is nothing to stream
+    key = cache_key(text, voice, lang, speed)
+    wav_bytes = await asyncio.to_thread(tts_cache.get, key)
+    if wav_bytes is not None:
+        return Response(content=wav_bytes, media_type="audio/wav")
+
+    model = await registry.aget("kokoro")
+    segments = iter_speech(model, text, voice, lang, DEVICE, speed, split_pattern=SENTENCE_SPLIT_PATTERN)
+
+    async def audio_chunks():
+        yield wav_stream_header()
+        generated = []
+        try:
+            # The pipeline runs on a worker thread one segment at a time
+            async for audio_tensor, _ in iterate_in_threadpool(locked_segments(segments)):
+                generated.append(audio_tensor)
+                yield pcm16(audio_tensor)
+        except Exception as e:
+            # Headers are already sent, so the stream just ends early
+            logger.error(f"Error while streaming speech: {e}")
+            return
+        # Only complete audio is cached, as the same 16-bit samples that were streamed
+        if generated:
+            await asyncio.to_thread(tts_cache.put, key, encode_wav(torch.cat(generated)))
+
+    return StreamingResponse(audio_chunks(), media_type="audio/wav")
+
+@router.websocket("/ws")
+async def tts_websocket(websocket: WebSocket):
+    """Streaming TTS over WebSocket.
+
+    Send JSON requests like ``{"text": "...", "voice": "af_bella", "speed": 1.0}``.
+    For each request the server sends a ``start`` message, one binary message of
+    16-bit mono PCM per synthesized segment, and a ``done`` message with timings.
+    """
+    await websocket.accept()
+    try:
+        model = await registry.aget("kokoro")
+        while True:
+            try:
+                request = json.loads(await websocket.receive_text())
+            except json.JSONDecodeError:
+                await websocket.send_text(json.dumps({"type": "error", "error": "Requests must be JSON"}))
+                continue
+            text = request.get("text", "")
+            if not text.strip():
+                await websocket.send_text(json.dumps({"type": "error", "error": "No text provided"}))
+                continue
+
+            await websocket.send_text(json.dumps({"type": "start", "sample_rate": SAMPLE_RATE, "format": "pcm_s16le"}))
+            started = time.perf_counter()
+            first_audio = None
+            count = 0
+            try:
+                segments = iter_speech(
+                    model, text, request.get("voice", "af_bella"), request.get("lang", "a"), DEVICE,
+                    float(request.get("speed", 1.0)), split_pattern=SENTENCE_SPLIT_PATTERN
+                )
+                async for audio_tensor, _ in iterate_in_threadpool(locked_segments(segments)):
+                    await websocket.send_bytes(pcm16(audio_tensor))
+                    count += 1
+                    if first_audio is None:
+                        first_audio = time.perf_counter() - started
+            except WebSocketDisconnect:
+                raise
+            except Exception as e:
+                logger.error(f"Error while streaming speech: {e}")
+                await websocket.send_text(json.dumps({"type": "error", "error": str(e)}))
+                continue
+
+            await websocket.send_text(json.dumps({
+                "type": "done",
+                "segments": count,
+                "time_to_first_audio_ms": round(first_audio * 1000, 1) if first_audio is not None else None,
+                "total_ms": round((time.perf_counter() - started) * 1000, 1)
+            }))
+    except WebSocketDisconnect:
+        logger.info("TTS WebSocket client disconnected")
+
 @router.post("/sign-to-speech")
 async def sign_to_speech(
     words: list = Query(..., description="List of sign language words to convert to natural language and then speech"),
     voice: str = Query("af_bella", description="Voice model to use (e.g., af_bella, am_adam)"),
     lang: str = Query("a", description="Language code: 'a' for American, 'b' for British"),
-    speed: float = Query(1.0, description="Speech speed (0.5-2.0)")
+    speed: float = Query(1.0, description="Speech speed (0.5-2.0)"),
+    format: str = Query("wav", description="Response format: 'wav' for binary audio with the text in the X-Natural-Text header, 'json' for text and a Base64 data URI")
 ):
     """Converts sign language words to natural language and then to speech"""
     try:
@@ -79,19 +261,8 @@ async def sign_to_speech(
         logger.info(f"Converting word sequence to natural language: {word_sequence}")
         
         # Use Ollama to convert word sequence to natural language
-        prompt = f"""You are a sign language interpreter. Convert the following sequence of sign language words into natural, 
-        fluent English. Maintain the meaning while making it grammatically correct and natural sounding.
-        
-        Sign language word sequence: {word_sequence}
-        
-        Your response should only contain the converted sentence. No extra texts or formatting required"""
-        
         try:
-            response = ollama.chat(model="llama3.2", messages=[{"role": "user", "content": prompt}])
-            natural_text = response["message"]["content"].strip()
-            
-            # Clean up the response (remove quotes if present)
-            natural_text = natural_text.replace('"', '').replace("'", "").strip()
+            natural_text = clean_llm_text(await llm.chat(sign_language_prompt(word_sequence)))
             logger.info(f"Generated natural language: {natural_text}")
             
         except Exception as e:
@@ -100,28 +271,104 @@ async def sign_to_speech(
             natural_text = word_sequence
             
         # Generate speech from the natural language text
-        audio_tensor, _ = generate_speech(model, natural_text, voice, lang, DEVICE, speed)
+        wav_bytes = await synthesize_wav(natural_text, voice, lang, speed)
 
-        if audio_tensor is None:
+        if wav_bytes is None:
             return JSONResponse(status_code=500, content={"error": "Failed to generate speech"})
 
-        # Convert the audio tensor to numpy array
-        audio_numpy = audio_tensor.cpu().numpy()
-        
-        # Save audio as WAV file
-        output_path = os.path.join(OUTPUT_DIR, "sign_speech_output.wav")
-        wavfile.write(output_path, 24000, audio_numpy)
-
-        # Convert the audio to Base64
-        with open(output_path, "rb") as audio_file:
-            audio_base64 = base64.b64encode(audio_file.read()).decode('utf-8')
-
-        # Return both the natural language text and the Base64-encoded audio
-        return JSONResponse(content={
-            "text": natural_text,
-            "audio": f"data:audio/wav;base64,{audio_base64}"
-        })
+        # Return both the natural language text and the audio
+        return audio_response(wav_bytes, format, natural_text)
 
     except Exception as e:
         logger.error(f"Error in sign-to-speech endpoint: {e}")
-        return JSONResponse(status_code=500, content={"error": str(e)})
\ No newline at end of file
+        return JSONResponse(status_code=500, content={"error": str(e)})
+
+@router.post("/sign-to-speech/stream")
+async def sign_to_speech_stream(
+    words: list = Query(..., description="List of sign language words to convert to natural language and then speech"),
+    voice: str = Query("af_bella", description="Voice model to use (e.g., af_bella, am_adam)"),
+    lang: str = Query("a", description="Language code: 'a' for American, 'b' for British"),
+    speed: float = Query(1.0, description="Speech speed (0.5-2.0)")
+):
+    """Pipelined sign-to-speech: synthesizes each sentence while the LLM is still writing the next one.
+
+    Returns newline-delimited JSON: a ``text`` event per finished sentence, an
+    ``audio`` event with its WAV as a Base64 data URI, and a final ``done`` event
+    with the latency of every stage.
+    """
+    if not words:
+        return JSONResponse(status_code=400, content={"error": "No words provided"})
+    if not voice_registry.exists(voice):
+        return JSONResponse(status_code=400, content={"error": f"Voice not found: {voice}"})
+
+    word_sequence = " ".join(words)
+    logger.info(f"Streaming word sequence to natural language: {word_sequence}")
+
+    async def events():
+        started = time.perf_counter()
+        elapsed_ms = lambda: round((time.perf_counter() - started) * 1000, 1)
+        timings = {"llm_first_token_ms": None, "llm_total_ms": None, "first_sentence_ms": None,
+                   "time_to_first_audio_ms": None, "tts_ms": 0.0}
+        sentences: asyncio.Queue = asyncio.Queue()
+
+        async def rewrite():
+            """Stream the LLM reply and queue every sentence as soon as it is complete"""
+            splitter = SentenceSplitter()
+            queued = 0
+            try:
+                async for token in llm.stream_chat(sign_language_prompt(word_sequence)):
+                    if timings["llm_first_token_ms"] is None:
+                        timings["llm_first_token_ms"] = elapsed_ms()
+                    for sentence in splitter.feed(token):
+                        if clean_llm_text(sentence):
+                            await sentences.put(clean_llm_text(sentence))
+                            queued += 1
+            except Exception as e:
+                logger.error(f"Error using Ollama for natural language generation: {e}")
+                if not queued:
+                    # Fallback to the original word sequence if Ollama fails
+                    splitter.buffer = word_sequence
+            rest = splitter.flush()
+            if rest and clean_llm_text(rest):
+                await sentences.put(clean_llm_text(rest))
+            timings["llm_total_ms"] = elapsed_ms()
+            await sentences.put(None)
+
+        producer = asyncio.create_task(rewrite())
+        natural_text = []
+        try:
+            while True:
+                sentence = await sentences.get()
+                if sentence is None:
+                    break
+                if timings["first_sentence_ms"] is None:
+                    timings["first_sentence_ms"] = elapsed_ms()
+                natural_text.append(sentence)
+                yield json.dumps({"type": "text", "index": len(natural_text) - 1, "text": sentence}) + "\n"
+
+                tts_started = time.perf_counter()
+                wav_bytes = await synthesize_wav(sentence, voice, lang, speed)
+                timings["tts_ms"] += (time.perf_counter() - tts_started) * 1000
+                if wav_bytes is None:
+                    yield json.dumps({"type": "error", "index": len(natural_text) - 1, "error": "Failed to generate speech"}) + "\n"
+                    continue
+                if timings["time_to_first_audio_ms"] is None:
+                    timings["time_to_first_audio_ms"] = elapsed_ms()
+                yield json.dumps({
+                    "type": "audio",
+                    "index": len(natural_text) - 1,
+                    "audio": f"data:audio/wav;base64,{base64.b64encode(wav_bytes).decode('utf-8')}"
+                }) + "\n"
+
+            timings["tts_ms"] = round(timings["tts_ms"], 1)
+            yield json.dumps({
+                "type": "done",
+                "text": " ".join(natural_text),
+                "sentences": len(natural_text),
+                "timings": {**timings, "total_ms": elapsed_ms()}
+            }) + "\n"
+        finally:
+            # The client may disconnect while the LLM is still generating
+            producer.cancel()
+
+    return StreamingResponse(events(), media_type="application/x-ndjson")
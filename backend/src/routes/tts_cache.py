@@ -0,0 +1,146 @@
+"""Content-addressed cache of synthesized speech with an in-memory and an on-disk LRU tier"""
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Optional
+
+# Size budgets for the two tiers
+TTS_CACHE_MEMORY_BYTES = int(os.getenv("TTS_CACHE_MEMORY_BYTES", str(64 * 1024 * 1024)))
+TTS_CACHE_DISK_BYTES = int(os.getenv("TTS_CACHE_DISK_BYTES", str(1024 * 1024 * 1024)))
+TTS_CACHE_DIR = os.getenv("TTS_CACHE_DIR", os.path.join("outputs", "tts_cache"))
+# Part of every key, so changing the model invalidates old audio
+TTS_MODEL_VERSION = os.getenv("TTS_MODEL_VERSION", "kokoro-v1_0")
+
+
+def cache_key(text: str, voice: str, lang: str, speed: float, model_version: str = TTS_MODEL_VERSION) -> str:
+    """Hash of everything that affects the generated audio"""
+    payload = json.dumps([text, voice.replace('.pt', ''), lang, round(float(speed), 3), model_version])
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class TTSCache:
+    """Two-tier LRU cache of WAV bytes keyed by :func:`cache_key`.
+
+    Hits in the disk tier are promoted to memory. Both tiers evict least
+    recently used entries once they exceed their byte budget; the disk tier
+    keeps recency in file modification times so it survives restarts.
+    """
+
+    def __init__(self, directory: str = TTS_CACHE_DIR, memory_bytes: int = TTS_CACHE_MEMORY_BYTES,
+                 disk_bytes: int = TTS_CACHE_DISK_BYTES):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.memory_limit = memory_bytes
+        self.disk_limit = disk_bytes
+        self._memory: "OrderedDict[str, bytes]" = OrderedDict()
+        self._memory_size = 0
+        self._disk: "OrderedDict[str, int]" = OrderedDict()
+        self._disk_size = 0
+        self._lock = threading.Lock()
+        self.counters = {
+            "memory_hits": 0, "disk_hits": 0, "misses": 0,
+            "memory_evictions": 0, "disk_evictions": 0, "stores": 0,
+        }
+
+        # Rebuild the disk index, oldest first
+        for path in sorted(self.directory.glob("*.wav"), key=lambda p: p.stat().st_mtime):
+            size = path.stat().st_size
+            self._disk[path.stem] = size
+            self._disk_size += size
+        self._evict_disk()
+
+    def _path(self, key: str) -> Path:
+        return self.directory / f"{key}.wav"
+
+    def get(self, key: str) -> Optional[bytes]:
+        """Return cached WAV bytes, or None on a miss"""
+        with self._lock:
+            data = self._memory.get(key)
+            if data is not None:
+                self._memory.move_to_end(key)
+                self.counters["memory_hits"] += 1
+                return data
+            on_disk = key in self._disk
+
+        if on_disk:
+            path = self._path(key)
+            try:
+                data = path.read_bytes()
+                os.utime(path)  # Record the access for LRU order across restarts
+            except OSError:
+                data = None
+            with self._lock:
+                if data is not None:
+                    if key in self._disk:
+                        self._disk.move_to_end(key)
+                    self.counters["disk_hits"] += 1
+                    self._store_memory(key, data)
+                    return data
+                # The file vanished underneath us
+                self._disk_size -= self._disk.pop(key, 0)
+
+        with self._lock:
+            self.counters["misses"] += 1
+        return None
+
+    def put(self, key: str, data: bytes) -> None:
+        """Store WAV bytes in both tiers"""
+        path = self._path(key)
+        tmp_path = path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+        try:
+            tmp_path.write_bytes(data)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"Warning: could not write TTS cache entry {path}: {e}")
+            path = None
+
+        with self._lock:
+            self.counters["stores"] += 1
+            self._store_memory(key, data)
+            if path is not None:
+                self._disk_size -= self._disk.pop(key, 0)
+                self._disk[key] = len(data)
+                self._disk_size += len(data)
+                self._evict_disk()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            lookups = self.counters["memory_hits"] + self.counters["disk_hits"] + self.counters["misses"]
+            hits = self.counters["memory_hits"] + self.counters["disk_hits"]
+            return {
+                **self.counters,
+                "hit_rate": round(hits / lookups, 3) if lookups else 0.0,
+                "memory_entries": len(self._memory),
+                "memory_bytes": self._memory_size,
+                "memory_limit_bytes": self.memory_limit,
+                "disk_entries": len(self._disk),
+                "disk_bytes": self._disk_size,
+                "disk_limit_bytes": self.disk_limit,
+                "model_version": TTS_MODEL_VERSION,
+            }
+
+    def _store_memory(self, key: str, data: bytes) -> None:
+        # Caller holds the lock
+        if len(data) > self.memory_limit:
+            return
+        self._memory_size -= len(self._memory.pop(key, b""))
+        self._memory[key] = data
+        self._memory_size += len(data)
+        while self._memory_size > self.memory_limit:
+            _, evicted = self._memory.popitem(last=False)
+            self._memory_size -= len(evicted)
+            self.counters["memory_evictions"] += 1
+
+    def _evict_disk(self) -> None:
+        # Caller holds the lock (or is the constructor)
+        while self._disk_size > self.disk_limit and self._disk:
+            key, size = self._disk.popitem(last=False)
+            self._disk_size -= size
+            self.counters["disk_evictions"] += 1
+            try:
+                self._path(key).unlink()
+            except OSError:
+                pass
@@ -1,13 +1,16 @@
 """Models module for Kokoro TTS Local"""
-from typing import Optional, Tuple, List
+from typing import Iterator, Optional, Tuple, List
 import torch
 from kokoro import KPipeline
 import os
 import json
 import codecs
+import re
 from pathlib import Path
 import numpy as np
 import shutil
+import threading
+import time
 
 # Set environment variables for proper encoding
 os.environ["PYTHONIOENCODING"] = "utf-8"
@@ -39,22 +42,23 @@ VOICE_FILES = [
     "zf_xiaobei.pt", "zf_xiaoni.pt", "zf_xiaoyi.pt"
 ]
 
+# Voices loaded into memory when the model is built ("all" for every voice in VOICE_FILES)
+TTS_PRELOAD_VOICES = os.getenv("TTS_PRELOAD_VOICES", "af_bella")
+
 # Patch KPipeline's load_voice method to use weights_only=False
 original_load_voice = KPipeline.load_voice
 
-def patched_load_voice(self, voice_path):
-    """Load voice model with weights_only=False for compatibility"""
-    if not os.path.exists(voice_path):
-        raise FileNotFoundError(f"Voice file not found: {voice_path}")
+def patched_load_voice(self, voice_path, delimiter=","):
+    """Load voice model with weights_only=False for compatibility, reusing the shared voice registry"""
+    # Tensors from the registry are passed straight through
+    if isinstance(voice_path, torch.Tensor):
+        return voice_path
     voice_name = Path(voice_path).stem
-    voice_model = torch.load(voice_path, weights_only=False)
-    if voice_model is None:
-        raise ValueError(f"Failed to load voice model from {voice_path}")
     # Ensure device is set
     if not hasattr(self, 'device'):
         self.device = 'cpu'
-    # Move model to device and store in voices dictionary
-    self.voices[voice_name] = voice_model.to(self.device)
+    # Store in voices dictionary
+    self.voices[voice_name] = voice_registry.get(voice_name, self.device)
     return self.voices[voice_name]
 
 KPipeline.load_voice = patched_load_voice
@@ -157,41 +161,38 @@ except ImportError as e:
 # Initialize pipeline globally
 _pipeline = None
 
+def download_voice_file(voice_file: str, voices_dir: Path = Path("voices")) -> bool:
+    """Download a single voice file from Hugging Face unless it already exists"""
+    voice_path = voices_dir / voice_file
+    if voice_path.exists():
+        return True
+    try:
+        from huggingface_hub import hf_hub_download
+        print(f"Downloading {voice_file}...")
+        # Download to a temporary location first
+        temp_path = hf_hub_download(
+            repo_id="hexgrad/Kokoro-82M",
+            filename=f"voices/{voice_file}",
+            local_dir="temp_voices",
+            force_download=True
+        )
+        
+        # Move the file to the correct location
+        os.makedirs(os.path.dirname(voice_path), exist_ok=True)
+        shutil.move(temp_path, voice_path)
+        print(f"Successfully downloaded {voice_file}")
+        return True
+    except Exception as e:
+        print(f"Warning: Failed to download {voice_file}: {e}")
+        return False
+
 def download_voice_files():
     """Download voice files from Hugging Face."""
     voices_dir = Path("voices")
     voices_dir.mkdir(exist_ok=True)
     
-    from huggingface_hub import hf_hub_download
-    downloaded_voices = []
-    
     print("\nDownloading voice files...")
-    for voice_file in VOICE_FILES:
-        try:
-            # Full path where the voice file should be
-            voice_path = voices_dir / voice_file
-            
-            if not voice_path.exists():
-                print(f"Downloading {voice_file}...")
-                # Download to a temporary location first
-                temp_path = hf_hub_download(
-                    repo_id="hexgrad/Kokoro-82M",
-                    filename=f"voices/{voice_file}",
-                    local_dir="temp_voices",
-                    force_download=True
-                )
-                
-                # Move the file to the correct location
-                os.makedirs(os.path.dirname(voice_path), exist_ok=True)
-                shutil.move(temp_path, voice_path)
-                downloaded_voices.append(voice_file)
-                print(f"Successfully downloaded {voice_file}")
-            else:
-                print(f"Voice file {voice_file} already exists")
-                downloaded_voices.append(voice_file)
-        except Exception as e:
-            print(f"Warning: Failed to download {voice_file}: {e}")
-            continue
+    downloaded_voices = [voice_file for voice_file in VOICE_FILES if download_voice_file(voice_file, voices_dir)]
     
     # Clean up temporary directory
     if os.path.exists("temp_voices"):
@@ -204,6 +205,94 @@ def download_voice_files():
     
     return downloaded_voices
 
+class VoiceRegistry:
+    """Voice embeddings shared by every request, each loaded from disk once.
+
+    Voice files are memory-mapped where torch supports it, so worker processes
+    on one machine share the pages through the OS cache. Load time and size
+    are recorded per voice for the /tts/voices report.
+    """
+
+    def __init__(self, voices_dir: str = "voices"):
+        self.voices_dir = Path(voices_dir)
+        self._voices = {}
+        self._stats = {}
+        self._lock = threading.Lock()
+
+    def path(self, voice_name: str) -> Path:
+        return self.voices_dir / f"{voice_name.replace('.pt', '')}.pt"
+
+    def exists(self, voice_name: str) -> bool:
+        """True if the voice is on disk or can be downloaded"""
+        voice_name = voice_name.replace('.pt', '')
+        return self.path(voice_name).exists() or f"{voice_name}.pt" in VOICE_FILES
+
+    def get(self, voice_name: str, device: str = 'cpu') -> torch.Tensor:
+        """Return the voice tensor on the device, loading it on first use"""
+        voice_name = voice_name.replace('.pt', '')
+        key = (voice_name, str(device))
+        voice = self._voices.get(key)
+        if voice is not None:
+            return voice
+        with self._lock:
+            if key not in self._voices:
+                self._voices[key] = self._load(voice_name, device)
+            return self._voices[key]
+
+    def preload(self, voice_names: List[str], device: str = 'cpu') -> None:
+        """Load voices ahead of the first request, logging instead of failing"""
+        for voice_name in voice_names:
+            try:
+                self.get(voice_name, device)
+                print(f"Successfully loaded voice: {voice_name}")
+            except Exception as e:
+                print(f"Warning: Failed to load voice {voice_name}: {e}")
+
+    def report(self) -> dict:
+        with self._lock:
+            voices = [dict(stats) for stats in self._stats.values()]
+        return {
+            "loaded": len(voices),
+            "total_bytes": sum(voice["bytes"] for voice in voices),
+            "voices": voices,
+        }
+
+    def _load(self, voice_name: str, device: str) -> torch.Tensor:
+        voice_path = self.path(voice_name)
+        if not voice_path.exists() and f"{voice_name}.pt" in VOICE_FILES:
+            self.voices_dir.mkdir(exist_ok=True)
+            download_voice_file(f"{voice_name}.pt", self.voices_dir)
+            if os.path.exists("temp_voices"):
+                shutil.rmtree("temp_voices", ignore_errors=True)
+        if not voice_path.exists():
+            raise ValueError(f"Voice file not found: {voice_path}")
+
+        started = time.perf_counter()
+        try:
+            voice = torch.load(voice_path, map_location="cpu", mmap=True, weights_only=False)
+            mmapped = True
+        except Exception:
+            # Files saved in the legacy format cannot be memory-mapped
+            voice = torch.load(voice_path, map_location="cpu", weights_only=False)
+            mmapped = False
+        if voice is None:
+            raise ValueError(f"Failed to load voice model from {voice_path}")
+        voice = voice.to(device)
+        load_ms = (time.perf_counter() - started) * 1000
+
+        self._stats[(voice_name, str(device))] = {
+            "voice": voice_name,
+            "device": str(device),
+            "bytes": voice.numel() * voice.element_size(),
+            "dtype": str(voice.dtype),
+            "shape": list(voice.shape),
+            "mmap": mmapped and str(device) == "cpu",
+            "load_ms": round(load_ms, 2),
+        }
+        return voice
+
+voice_registry = VoiceRegistry()
+
 def build_model(model_path: str, device: str) -> KPipeline:
     """Build and return the Kokoro pipeline with proper encoding configuration"""
     global _pipeline
@@ -239,13 +328,6 @@ def build_model(model_path: str, device: str) -> KPipeline:
                 )
                 print(f"Config downloaded to {config_path}")
             
-            # Download voice files
-            downloaded_voices = download_voice_files()
-            
-            if not downloaded_voices:
-                print("Error: No voice files available. Cannot proceed.")
-                raise ValueError("No voice files available")
-            
             # Initialize pipeline with American English by default
             _pipeline = KPipeline(lang_code='a')
             if _pipeline is None:
@@ -258,17 +340,12 @@ def build_model(model_path: str, device: str) -> KPipeline:
             if not hasattr(_pipeline, 'voices'):
                 _pipeline.voices = {}
             
-            # Try to load the first available voice
-            for voice_file in downloaded_voices:
-                voice_path = f"voices/{voice_file}"
-                if os.path.exists(voice_path):
-                    try:
-                        _pipeline.load_voice(voice_path)
-                        print(f"Successfully loaded voice: {voice_file}")
-                        break  # Successfully loaded a voice
-                    except Exception as e:
-                        print(f"Warning: Failed to load voice {voice_file}: {e}")
-                        continue
+            # Only the configured voices are downloaded and loaded now; others on first use
+            if TTS_PRELOAD_VOICES.strip().lower() == "all":
+                preload = [voice_file.replace('.pt', '') for voice_file in VOICE_FILES]
+            else:
+                preload = [name.strip() for name in TTS_PRELOAD_VOICES.split(",") if name.strip()]
+            voice_registry.preload(preload, device)
             
         except Exception as e:
             print(f"Error initializing pipeline: {e}")
@@ -310,13 +387,102 @@ def list_available_voices() -> List[str]:
 
 def load_voice(voice_name: str, device: str) -> torch.Tensor:
     """Load a voice model"""
-    pipeline = build_model(None, device)
-    # Format voice path correctly - strip .pt if it was included
-    voice_name = voice_name.replace('.pt', '')
-    voice_path = f"voices/{voice_name}.pt"
-    if not os.path.exists(voice_path):
-        raise ValueError(f"Voice file not found: {voice_path}")
-    return pipeline.load_voice(voice_path)
+    build_model(None, device)
+    return voice_registry.get(voice_name, device)
+
+# Split long text at sentence ends so streaming can start after the first sentence
+SENTENCE_SPLIT_PATTERN = r'(?<=[.!?])\s+|\n+'
+
+# Words whose period does not end a sentence ("Dr. Smith")
+ABBREVIATIONS = {"mr.", "mrs.", "ms.", "dr.", "prof.", "st.", "jr.", "sr.", "vs.", "e.g.", "i.e."}
+
+class SentenceSplitter:
+    """Collects streamed text and hands out complete sentences as soon as they end.
+
+    A sentence only counts as finished once whitespace follows its punctuation,
+    so "3.5" or a trailing "." that is still being generated does not split early.
+    Neither does the period of a title such as "Dr.", unless a line break follows.
+    """
+
+    def __init__(self, split_pattern: str = SENTENCE_SPLIT_PATTERN):
+        self.pattern = re.compile(split_pattern)
+        self.buffer = ""
+
+    def feed(self, text: str) -> List[str]:
+        """Add streamed text and return the sentences it completed"""
+        self.buffer += text
+        sentences = []
+        start = 0
+        for match in self.pattern.finditer(self.buffer):
+            sentence = self.buffer[start:match.start()].strip()
+            words = sentence.split()
+            if words and words[-1].lower() in ABBREVIATIONS and "\n" not in match.group():
+                continue
+            if sentence:
+                sentences.append(sentence)
+            start = match.end()
+        self.buffer = self.buffer[start:]
+        return sentences
+
+    def flush(self) -> Optional[str]:
+        """Return whatever is left once the stream has ended"""
+        rest, self.buffer = self.buffer.strip(), ""
+        return rest or None
+
+def iter_speech(
+    model: KPipeline,
+    text: str,
+    voice: str,
+    lang: str = 'a',
+    device: str = 'cpu',
+    speed: float = 1.0,
+    split_pattern: str = r'\n+'
+) -> Iterator[Tuple[torch.Tensor, str]]:
+    """Yield the audio of every segment as soon as the Kokoro pipeline produces it
+    
+    Args:
+        model: KPipeline instance
+        text: Text to synthesize
+        voice: Voice name (e.g. 'af_bella')
+        lang: Language code ('a' for American English, 'b' for British English)
+        device: Device to use ('cuda' or 'cpu')
+        speed: Speech speed multiplier (default: 1.0)
+        split_pattern: Regex the pipeline splits the text on before synthesis
+        
+    Yields:
+        Tuples of (audio tensor, phonemes string), one per segment
+    """
+    if model is None:
+        raise ValueError("Model is None - pipeline not properly initialized")
+        
+    # Initialize voices dictionary if it doesn't exist
+    if not hasattr(model, 'voices'):
+        model.voices = {}
+        
+    # Ensure device is set
+    if not hasattr(model, 'device'):
+        model.device = device
+        
+    # Use the shared in-memory voice instead of resolving the file again
+    voice_name = voice.replace('.pt', '')
+    voice_tensor = voice_registry.get(voice_name, model.device)
+    model.voices[voice_name] = voice_tensor
+        
+    # Generate speech with the new API
+    print(f"Generating speech with device: {model.device}")
+    generator = model(
+        text, 
+        voice=voice_tensor,
+        speed=speed,
+        split_pattern=split_pattern
+    )
+    
+    # Convert each segment's numpy array to a tensor if needed
+    for gs, ps, audio in generator:
+        if audio is not None:
+            if isinstance(audio, np.ndarray):
+                audio = torch.from_numpy(audio).float()
+            yield audio, ps
 
 def generate_speech(
     model: KPipeline,
@@ -326,7 +492,7 @@ def generate_speech(
     device: str = 'cpu',
     speed: float = 1.0
 ) -> Tuple[Optional[torch.Tensor], Optional[str]]:
-    """Generate speech using the Kokoro pipeline
+    """Generate speech for the whole text using the Kokoro pipeline
     
     Args:
         model: KPipeline instance
@@ -340,48 +506,13 @@ def generate_speech(
         Tuple of (audio tensor, phonemes string) or (None, None) on error
     """
     try:
-        if model is None:
-            raise ValueError("Model is None - pipeline not properly initialized")
-            
-        # Initialize voices dictionary if it doesn't exist
-        if not hasattr(model, 'voices'):
-            model.voices = {}
-            
-        # Ensure device is set
-        if not hasattr(model, 'device'):
-            model.device = device
-            
-        # Format voice path and ensure voice is loaded
-        voice_name = voice.replace('.pt', '')
-        voice_path = f"voices/{voice_name}.pt"
-        if not os.path.exists(voice_path):
-            raise ValueError(f"Voice file not found: {voice_path}")
-            
-        # Ensure voice is loaded before generating
-        if voice_name not in model.voices:
-            print(f"Loading voice {voice_name}...")
-            model.load_voice(voice_path)
-            
-        if voice_name not in model.voices:
-            raise ValueError(f"Failed to load voice {voice_name}")
-            
-        # Generate speech with the new API
-        print(f"Generating speech with device: {model.device}")
-        generator = model(
-            text, 
-            voice=voice_path,
-            speed=speed,
-            split_pattern=r'\n+'
-        )
-        
-        # Get first generated segment and convert numpy array to tensor if needed
-        for gs, ps, audio in generator:
-            if audio is not None:
-                if isinstance(audio, np.ndarray):
-                    audio = torch.from_numpy(audio).float()
-                return audio, ps
-            
-        return None, None
+        # Join all segments so long text is not cut off after the first one
+        segments = list(iter_speech(model, text, voice, lang, device, speed))
+        if not segments:
+            return None, None
+        audio = torch.cat([audio for audio, _ in segments])
+        phonemes = " ".join(ps for _, ps in segments if ps)
+        return audio, phonemes
     except Exception as e:
         print(f"Error generating speech: {e}")
-        return None, None
\ No newline at end of file
+        return None, None
@@ -0,0 +1,104 @@
+"""Pushes video job updates to subscribers, so clients need not poll /video/status"""
+import asyncio
+import json
+import logging
+import os
+from typing import Dict, List, Optional, Set
+
+from database.db import get_render_jobs, get_videos
+
+logger = logging.getLogger(__name__)
+
+# How often the job table is checked for changes while anyone is subscribed
+VIDEO_EVENTS_POLL_SECONDS = float(os.getenv("VIDEO_EVENTS_POLL_SECONDS", "0.25"))
+# Comment lines sent on idle streams so proxies do not close them
+VIDEO_EVENTS_KEEPALIVE_SECONDS = 15
+
+
+def job_event(content_hash: str, job: Optional[Dict], video: Optional[Dict]) -> Optional[Dict]:
+    """The event describing where a video is, or None if nothing is known about it yet"""
+    if video is not None:
+        return {"event": "done", "content_hash": content_hash,
+                "video_path": f"/assets/generated/{video['filename']}"}
+    if job is None:
+        return None
+    if job["status"] == "running":
+        return {"event": "progress", "content_hash": content_hash, "progress": job["progress"] or 0.0}
+    if job["status"] == "failed":
+        return {"event": "failed", "content_hash": content_hash, "error": job["error"]}
+    if job["status"] == "completed":
+        # Rendered, but removed from the catalog since
+        return {"event": "failed", "content_hash": content_hash,
+                "error": "Video is no longer available; request it again"}
+    return {"event": "queued", "content_hash": content_hash, "status": job["status"]}
+
+
+class JobEventHub:
+    """Fans job changes out to every subscriber from one poller per process.
+
+    However many clients are listening, each tick costs two indexed queries for
+    the union of their content hashes. The poller runs only while there are
+    subscribers, and only changed states are delivered.
+    """
+
+    def __init__(self, poll_seconds: float = VIDEO_EVENTS_POLL_SECONDS):
+        self.poll_seconds = poll_seconds
+        self._subscribers: Dict[asyncio.Queue, Set[str]] = {}
+        self._last: Dict[str, Dict] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    def subscribe(self, content_hashes: List[str]) -> asyncio.Queue:
+        queue: asyncio.Queue = asyncio.Queue()
+        self._subscribers[queue] = set(content_hashes)
+        # New subscribers first get the current state of every hash
+        for content_hash in content_hashes:
+            if content_hash in self._last:
+                queue.put_nowait(self._last[content_hash])
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._poll())
+        return queue
+
+    def unsubscribe(self, queue: asyncio.Queue) -> None:
+        self._subscribers.pop(queue, None)
+        watched = set().union(*self._subscribers.values()) if self._subscribers else set()
+        for content_hash in [content_hash for content_hash in self._last if content_hash not in watched]:
+            del self._last[content_hash]
+
+    async def _poll(self) -> None:
+        while self._subscribers:
+            try:
+                content_hashes = list(set().union(*self._subscribers.values()))
+                jobs, videos = await asyncio.to_thread(
+                    lambda: (get_render_jobs(content_hashes), get_videos(content_hashes))
+                )
+                for content_hash in content_hashes:
+                    event = job_event(content_hash, jobs.get(content_hash), videos.get(content_hash))
+                    if event is None or event == self._last.get(content_hash):
+                        continue
+                    self._last[content_hash] = event
+                    for queue, watched in list(self._subscribers.items()):
+                        if content_hash in watched:
+                            queue.put_nowait(event)
+            except Exception as e:
+                logger.error(f"Error polling video jobs for events: {e}")
+            await asyncio.sleep(self.poll_seconds)
+
+    async def stream(self, content_hashes: List[str]):
+        """Server-sent events for the hashes, ending once every one is done or failed"""
+        queue = self.subscribe(content_hashes)
+        pending = set(content_hashes)
+        try:
+            while pending:
+                try:
+                    event = await asyncio.wait_for(queue.get(), VIDEO_EVENTS_KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+                    continue
+                if event["event"] in ("done", "failed"):
+                    pending.discard(event["content_hash"])
+                yield f"event: {event['event']}\ndata: {json.dumps(event)}\n\n"
+        finally:
+            self.unsubscribe(queue)
+
+
+job_events = JobEventHub()
@@ -0,0 +1,150 @@
+"""Background eviction of generated videos by age and by a disk budget, least recently served first"""
+import asyncio
+import logging
+import os
+import socket
+import threading
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Dict, Optional
+
+from database.db import (
+    get_videos_created_before, get_least_recently_used_videos, get_videos_without_size, set_video_size,
+    touch_videos, get_video_storage, delete_video, acquire_lease
+)
+
+logger = logging.getLogger(__name__)
+
+# Videos older than this are removed no matter how often they are watched
+VIDEO_MAX_AGE_DAYS = float(os.getenv("VIDEO_MAX_AGE_DAYS", "7"))
+# Total size of generated videos; beyond it the least recently served ones are removed
+VIDEO_DISK_BUDGET_BYTES = int(os.getenv("VIDEO_DISK_BUDGET_BYTES", str(2 * 1024 ** 3)))
+VIDEO_EVICTION_INTERVAL_SECONDS = float(os.getenv("VIDEO_EVICTION_INTERVAL_SECONDS", "300"))
+# Videos looked at per database query, so one pass never holds the database or disk for long
+VIDEO_EVICTION_BATCH_SIZE = int(os.getenv("VIDEO_EVICTION_BATCH_SIZE", "100"))
+
+
+class VideoEvictor:
+    """Removes generated videos past ``VIDEO_MAX_AGE_DAYS`` or beyond ``VIDEO_DISK_BUDGET_BYTES``.
+
+    Served files are recorded in memory by ``touch`` and written to the catalog
+    at the start of each pass, so serving a video never waits for the database.
+    A pass handles at most one batch per rule; while a batch comes back full the
+    next pass starts right away instead of after the interval. Every API process
+    runs an evictor, but only the one holding the ``video_eviction`` lease in the
+    database removes videos; the others only write their accesses.
+    """
+
+    def __init__(self, directory: Path, max_age_days: float = VIDEO_MAX_AGE_DAYS,
+                 budget_bytes: int = VIDEO_DISK_BUDGET_BYTES,
+                 interval_seconds: float = VIDEO_EVICTION_INTERVAL_SECONDS,
+                 batch_size: int = VIDEO_EVICTION_BATCH_SIZE):
+        self.directory = Path(directory)
+        self.holder = f"{socket.gethostname()}:{os.getpid()}"
+        self.leader = False
+        self.max_age_days = max_age_days
+        self.budget_bytes = budget_bytes
+        self.interval_seconds = interval_seconds
+        self.batch_size = batch_size
+        self._accesses: Dict[str, str] = {}
+        self._lock = threading.Lock()
+        self.counters = {
+            "passes": 0, "evicted_by_age": 0, "evicted_by_size": 0, "bytes_freed": 0,
+            "files_tracked": 0, "bytes_tracked": 0, "last_pass_at": None, "last_pass_ms": None,
+        }
+
+    def touch(self, filename: str) -> None:
+        """Note that a video file was just served"""
+        with self._lock:
+            self._accesses[filename] = datetime.now().isoformat()
+
+    def _evict(self, video: Dict, reason: str) -> Optional[int]:
+        """Remove one video; returns the bytes freed, or None if the file could not be removed"""
+        path = self.directory / video["filename"]
+        size = video["size_bytes"] or 0
+        try:
+            if path.exists():
+                size = path.stat().st_size
+                os.remove(path)
+        except OSError as e:
+            logger.error(f"Failed to evict {path}: {e}")
+            return None
+        delete_video(video["content_hash"])
+        self.counters[f"evicted_by_{reason}"] += 1
+        self.counters["bytes_freed"] += size
+        return size
+
+    def run_once(self) -> bool:
+        """One bounded eviction pass; returns True if more work is left"""
+        started = time.perf_counter()
+        more = False
+
+        with self._lock:
+            accesses, self._accesses = self._accesses, {}
+        if accesses:
+            touch_videos(accesses)
+
+        # Outlives a few intervals, so another process takes over only once this one has stopped
+        self.leader = acquire_lease("video_eviction", self.holder, self.interval_seconds * 3 + 60)
+        if not self.leader:
+            return False
+
+        # Videos catalogued before sizes were recorded
+        unsized = get_videos_without_size(self.batch_size)
+        for video in unsized:
+            path = self.directory / video["filename"]
+            if path.exists():
+                set_video_size(video["content_hash"], path.stat().st_size)
+            else:
+                delete_video(video["content_hash"])
+        more |= len(unsized) == self.batch_size
+
+        cutoff = (datetime.now() - timedelta(days=self.max_age_days)).isoformat()
+        expired = get_videos_created_before(cutoff, self.batch_size)
+        evicted = [self._evict(video, "age") for video in expired]
+        more |= len(expired) == self.batch_size and any(freed is not None for freed in evicted)
+
+        count, size_bytes = get_video_storage()
+        if size_bytes > self.budget_bytes:
+            freed_any = False
+            for video in get_least_recently_used_videos(self.batch_size):
+                if size_bytes <= self.budget_bytes:
+                    break
+                freed = self._evict(video, "size")
+                if freed is None:
+                    continue
+                size_bytes -= freed
+                count -= 1
+                freed_any = True
+            # Files that cannot be removed must not turn this into a busy loop
+            more |= freed_any and size_bytes > self.budget_bytes
+
+        self.counters["passes"] += 1
+        self.counters["files_tracked"] = count
+        self.counters["bytes_tracked"] = size_bytes
+        self.counters["last_pass_at"] = datetime.now().isoformat()
+        self.counters["last_pass_ms"] = round((time.perf_counter() - started) * 1000, 2)
+        return more
+
+    async def run(self) -> None:
+        """Evict on a schedule until cancelled"""
+        while True:
+            try:
+                more = await asyncio.to_thread(self.run_once)
+            except Exception as e:
+                logger.error(f"Error evicting generated videos: {e}")
+                more = False
+            await asyncio.sleep(0 if more else self.interval_seconds)
+
+    def stats(self) -> Dict:
+        return {
+            **self.counters,
+            "max_age_days": self.max_age_days,
+            "budget_bytes": self.budget_bytes,
+            "interval_seconds": self.interval_seconds,
+            "batch_size": self.batch_size,
+            "leader": self.leader,
+            "pending_accesses": len(self._accesses),
+        }
+
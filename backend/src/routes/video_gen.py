@@ -1,15 +1,28 @@
+import asyncio
 import os
 import logging
 import hashlib
-from fastapi import APIRouter, HTTPException, BackgroundTasks
+from fastapi import APIRouter, HTTPException, Query
+from fastapi.responses import StreamingResponse
 from pathlib import Path
-from typing import Dict, List, Optional
+from typing import Callable, List, Optional
 import shutil
-from datetime import datetime, timedelta
+import time
+from datetime import datetime
 from moviepy import VideoFileClip, concatenate_videoclips
-import ollama
 import json
 
+from database.db import (
+    begin_render_job, queue_render_job, finish_render_job, get_render_job, count_render_jobs, save_video, import_videos, get_video,
+    list_videos as list_video_records, delete_video as delete_video_record
+)
+from .llm import llm, LLM_TIMEOUT_SECONDS, LLM_RETRIES
+from .gloss import GlossEngine, GLOSS_MIN_COVERAGE
+from .clip_index import ClipIndex
+from .video_render import concat_clips, ensure_faststart, segment_cache
+from .video_eviction import VideoEvictor
+from .video_events import job_events
+
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -28,62 +41,71 @@ METADATA_FILE = OUTPUT_DIR / "metadata.json"
 CLIP_DIR.mkdir(parents=True, exist_ok=True)
 OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
 
-# Cache to store previously generated videos
-video_cache: Dict[str, str] = {}
+# A request preparing a video (asking the LLM) for longer than this is assumed dead and another takes over
+PREPARE_TIMEOUT_SECONDS = LLM_TIMEOUT_SECONDS * (LLM_RETRIES + 1) + 30
 
-def load_metadata() -> Dict:
-    """Load metadata of generated videos from file."""
-    if METADATA_FILE.exists():
-        try:
-            with open(METADATA_FILE, 'r') as f:
-                return json.load(f)
-        except json.JSONDecodeError:
-            logger.error("Error parsing metadata file, creating new one")
-            return {"videos": []}
-    return {"videos": []}
-
-def save_metadata(metadata: Dict) -> None:
-    """Save metadata of generated videos to file."""
-    with open(METADATA_FILE, 'w') as f:
-        json.dump(metadata, f, indent=2)
-
-def cleanup_old_videos(max_age_days: int = 7) -> None:
-    """Remove videos older than the specified number of days."""
-    metadata = load_metadata()
-    current_time = datetime.now()
-    updated_videos = []
-    
-    for video in metadata["videos"]:
-        created_at = datetime.fromisoformat(video["created_at"])
-        age = current_time - created_at
-        
-        if age > timedelta(days=max_age_days):
-            video_path = OUTPUT_DIR / video["filename"]
-            if video_path.exists():
-                try:
-                    os.remove(video_path)
-                    logger.info(f"Removed old video: {video_path}")
-                except Exception as e:
-                    logger.error(f"Failed to remove {video_path}: {e}")
-        else:
-            updated_videos.append(video)
+# Clip vocabulary and metadata, rescanned in the background instead of on every request
+clip_index = ClipIndex(CLIP_DIR)
+
+# Removes videos by age and disk budget; run by the lifespan hook in main.py
+video_evictor = VideoEvictor(OUTPUT_DIR)
+
+def migrate_metadata() -> None:
+    """Import metadata.json, where the video catalog was kept before it moved into the database."""
+    if not METADATA_FILE.exists():
+        return
+    try:
+        with open(METADATA_FILE, 'r') as f:
+            videos = json.load(f).get("videos", [])
+    except FileNotFoundError:
+        # Another API worker has just migrated it
+        return
+    except (OSError, json.JSONDecodeError, AttributeError) as e:
+        logger.error(f"Error reading {METADATA_FILE}, not migrating it: {e}")
+        return
     
-    metadata["videos"] = updated_videos
-    save_metadata(metadata)
+    videos = [
+        {"original_text": "", "processed_text": "", "created_at": datetime.now().isoformat(), **video}
+        for video in videos if video.get("content_hash") and video.get("filename")
+    ]
+    added = import_videos(videos)
+    # Keep the old file around, but never import it twice
+    try:
+        METADATA_FILE.rename(METADATA_FILE.with_suffix(".json.migrated"))
+    except FileNotFoundError:
+        # Another API worker migrated it at the same time; INSERT OR IGNORE made that harmless
+        return
+    logger.info(f"Imported {added} of {len(videos)} videos from {METADATA_FILE}")
 
 def get_available_words() -> List[str]:
     """Get a list of all available words that have video clips."""
-    available_words = []
-    for clip_path in CLIP_DIR.glob("*.mp4"):
-        word = clip_path.stem  # Get filename without extension
-        available_words.append(word)
-    return available_words
+    return clip_index.words()
+
+# Rebuilt only when the clip vocabulary changes; keyed by the word list object, which the index replaces on change
+_gloss_engine: Optional[GlossEngine] = None
+_gloss_words: Optional[List[str]] = None
 
-def process_text(text: str) -> str:
+def get_gloss_engine(available_words: List[str]) -> GlossEngine:
+    """Return the gloss engine for the current clip vocabulary."""
+    global _gloss_engine, _gloss_words
+    if available_words is not _gloss_words:
+        _gloss_engine = GlossEngine(available_words)
+        _gloss_words = available_words
+    return _gloss_engine
+
+async def process_text(text: str) -> str:
     """Process text to map to available sign language clips while preserving meaning."""
     # Get list of available words
     available_words = get_available_words()
     
+    # Most everyday sentences map directly onto the vocabulary without asking the LLM
+    gloss = get_gloss_engine(available_words).translate(text)
+    if gloss.words and gloss.coverage >= GLOSS_MIN_COVERAGE:
+        final_text = " ".join(gloss.words)
+        logger.info(f"Processed text locally ({gloss.coverage:.0%} coverage): '{text}' -> '{final_text}'")
+        return final_text
+    logger.info(f"Local gloss coverage {gloss.coverage:.0%} below {GLOSS_MIN_COVERAGE:.0%}, asking the LLM (unmatched: {', '.join(gloss.unmatched)})")
+    
     try:
         # Create a more focused prompt for sign language conversion
         prompt = f"""You are a sign language translation expert. Your task is to convert natural language text into a sequence of words that can be represented in sign language videos.
@@ -106,9 +128,7 @@ IMPORTANT: Do not completely change the meaning of the text. If you can't find s
 Original text: {text}
 Sign language word sequence:"""
 
-        response = ollama.chat(model="llama3.2", messages=[{"role": "user", "content": prompt}])
-        
-        processed_text = response["message"]["content"].strip()
+        processed_text = (await llm.chat(prompt)).strip()
         # Remove any quotes or extra formatting that might be in the response
         processed_text = processed_text.replace('"', '').replace("'", "").strip()
         
@@ -122,7 +142,7 @@ Sign language word sequence:"""
         final_words = []
         
         for word in processed_words:
-            if word in available_words:
+            if word in clip_index:
                 final_words.append(word)
             else:
                 logger.warning(f"Word '{word}' from Llama output not in available words list, skipping")
@@ -138,28 +158,12 @@ Sign language word sequence:"""
         return final_text
     except Exception as e:
         logger.error(f"Error processing text with Llama: {e}")
-        return ""
+        # Use whatever the local mapping found rather than nothing
+        return " ".join(gloss.words)
 
 def basic_text_processing(text: str, available_words: List[str]) -> str:
     """Basic text processing as fallback when Llama processing fails."""
-    words = text.lower().split()
-    result = []
-    
-    for word in words:
-        # Remove punctuation
-        clean_word = ''.join(c for c in word if c.isalnum())
-        
-        if clean_word in available_words:
-            result.append(clean_word)
-        elif len(clean_word) > 1:
-            # Try to find partial matches
-            for available in available_words:
-                if clean_word in available or available in clean_word:
-                    result.append(available)
-                    logger.info(f"Matched '{clean_word}' to available word '{available}'")
-                    break
-    
-    return " ".join(result)
+    return " ".join(get_gloss_engine(available_words).translate(text).words)
 
 def map_text_to_clips(processed_text: str) -> List[VideoFileClip]:
     """Map each word in the processed text to a corresponding video clip."""
@@ -168,10 +172,10 @@ def map_text_to_clips(processed_text: str) -> List[VideoFileClip]:
     missing_words = []
 
     for word in words:
-        clip_path = CLIP_DIR / f"{word}.mp4"
-        if clip_path.exists():
+        clip = clip_index.get(word)
+        if clip is not None:
             try:
-                video_clips.append(VideoFileClip(str(clip_path)))
+                video_clips.append(VideoFileClip(clip.path))
             except Exception as e:
                 logger.error(f"Error loading clip for '{word}': {e}")
         else:
@@ -187,127 +191,206 @@ def generate_content_hash(text: str) -> str:
     """Generate a hash of the input text to use as a cache key."""
     return hashlib.md5(text.encode()).hexdigest()
 
-def background_video_generation(text: str, content_hash: str) -> None:
-    """Generate video in the background and update cache when done."""
-    try:
-        processed_text = process_text(text)
-        video_clips = map_text_to_clips(processed_text)
+def moviepy_progress_logger(on_progress: Callable[[float], None]):
+    """A proglog logger that reports the share of frames moviepy has written"""
+    from proglog import ProgressBarLogger
 
-        if not video_clips:
-            logger.error(f"No matching clips found for text: {text}")
-            return
+    class FrameProgressLogger(ProgressBarLogger):
+        def bars_callback(self, bar, attr, value, old_value=None):
+            total = self.bars[bar].get("total")
+            if bar == "frame_index" and attr == "index" and total:
+                on_progress(value / total)
 
-        final_video = concatenate_videoclips(video_clips)
-        
-        # Save video with content hash in filename
-        filename = f"video_{content_hash}.mp4"
-        video_output = OUTPUT_DIR / filename
-        final_video.write_videofile(str(video_output), fps=24)
-        
-        # Close video clips to free resources
-        for clip in video_clips:
-            clip.close()
-        final_video.close()
-        
-        # Update metadata
-        metadata = load_metadata()
-        metadata["videos"].append({
-            "filename": filename,
-            "original_text": text,
-            "processed_text": processed_text,
-            "created_at": datetime.now().isoformat(),
-            "content_hash": content_hash
-        })
-        save_metadata(metadata)
-        
-        # Update cache
-        video_cache[content_hash] = f"/assets/generated/{filename}"
-        
-        logger.info(f"Successfully generated video: {filename}")
-        
-        # Clean up old videos
-        cleanup_old_videos()
-        
-    except Exception as e:
-        logger.error(f"Error in background video generation: {e}")
+    return FrameProgressLogger()
+
+def render_video(processed_text: str, video_output: Path,
+                 on_progress: Optional[Callable[[float], None]] = None) -> Optional[str]:
+    """Write the video for the processed text and return the renderer used, or None if no clips matched.
+    
+    on_progress, if given, is called with the share of the render done so far.
+    """
+    report = on_progress or (lambda progress: None)
+    words = processed_text.split()
+    clips = [clip_index.get(word) for word in words]
+    found = [clip for clip in clips if clip is not None]
+
+    # Fast path: join cached, normalized segments without re-encoding; missing segments are encoded once
+    if found:
+        try:
+            # Encoding missing segments is the slow part; the concat itself takes a fraction of a second
+            segments = segment_cache.assemble(found, lambda done, total: report(0.9 * done / total))
+            concat_clips(segments, video_output)
+            report(1.0)
+            return "concat"
+        except Exception as e:
+            logger.error(f"Stream-copy concatenation failed, re-encoding with moviepy: {e}")
+
+    video_clips = map_text_to_clips(processed_text)
+    if not video_clips:
+        return None
+
+    final_video = concatenate_videoclips(video_clips)
+    final_video.write_videofile(str(video_output), fps=24, ffmpeg_params=["-movflags", "+faststart"],
+                                logger=moviepy_progress_logger(report) if on_progress else "bar")
+    
+    # Close video clips to free resources
+    for clip in video_clips:
+        clip.close()
+    final_video.close()
+    return "moviepy"
+
+def background_video_generation(text: str, content_hash: str, processed_text: str,
+                                on_progress: Optional[Callable[[float], None]] = None) -> None:
+    """Render the video and record it; raises if it cannot be made so the render worker marks the job failed."""
+    # Save video with content hash in filename
+    filename = f"video_{content_hash}.mp4"
+    video_output = OUTPUT_DIR / filename
+    started = time.perf_counter()
+    renderer = render_video(processed_text, video_output, on_progress)
+
+    if renderer is None:
+        logger.error(f"No matching clips found for text: {text}")
+        raise RuntimeError("No matching clips found")
+    # Browsers can only start playing before the download finishes if the MP4 index comes first
+    if ensure_faststart(video_output):
+        logger.warning(f"Moved the index of {filename} to the front")
+    render_seconds = round(time.perf_counter() - started, 3)
+    
+    # Add to the video catalog
+    save_video({
+        "filename": filename,
+        "original_text": text,
+        "processed_text": processed_text,
+        "created_at": datetime.now().isoformat(),
+        "content_hash": content_hash,
+        "renderer": renderer,
+        "render_seconds": render_seconds,
+        "size_bytes": video_output.stat().st_size
+    })
+    
+    logger.info(f"Successfully generated video: {filename} ({renderer}, {render_seconds}s)")
 
 @router.post("")
-async def generate_video(text: str, background_tasks: BackgroundTasks):
-    """Generate an ISL video based on input text."""
+async def generate_video(text: str, priority: int = 0):
+    """Generate an ISL video based on input text; higher priority jobs are rendered first."""
     try:
         # Generate a hash of the input text
         content_hash = generate_content_hash(text)
         
-        # Check if we already have this video
-        if content_hash in video_cache:
-            logger.info(f"Returning cached video for: {text}")
-            return {"video_path": video_cache[content_hash], "cached": True}
+        # Check the catalog for an existing video; another API process may have deleted its file
+        # The database calls run on worker threads; under write contention they wait for locks
+        video = await asyncio.to_thread(get_video, content_hash)
+        if video and (OUTPUT_DIR / video["filename"]).exists():
+            filename = video["filename"]
+            logger.info(f"Found existing video in catalog: {filename}")
+            return {"video_path": f"/assets/generated/{filename}", "cached": True}
         
-        # Check metadata for existing video
-        metadata = load_metadata()
-        for video in metadata["videos"]:
-            if video.get("content_hash") == content_hash:
-                filename = video["filename"]
-                video_path = OUTPUT_DIR / filename
-                if video_path.exists():
-                    video_cache[content_hash] = f"/assets/generated/{filename}"
-                    logger.info(f"Found existing video in metadata: {filename}")
-                    return {"video_path": f"/assets/generated/{filename}", "cached": True}
+        # Only one request per text, across all API processes, asks the LLM and queues the render;
+        # the others share its job and poll the status endpoint for the result
+        job, leader = await asyncio.to_thread(begin_render_job, content_hash, text, priority, PREPARE_TIMEOUT_SECONDS)
+        if not leader:
+            logger.info(f"Joining in-progress video generation ({job['status']}) for: {text}")
+            return {
+                "status": "processing",
+                "message": "Video generation already in progress. Check status endpoint for updates.",
+                "content_hash": content_hash,
+                "job_status": job["status"]
+            }
         
         # Process the text first to check if we have suitable words
-        processed_text = process_text(text)
+        try:
+            processed_text = await process_text(text)
+        except Exception as e:
+            await asyncio.to_thread(finish_render_job, content_hash, "failed", str(e))
+            raise
         
         # If no suitable words are available, return an error
         if not processed_text:
+            message = "No suitable sign language words available for this text. Try different wording."
+            # Requests that joined this one learn the outcome from the status endpoint
+            await asyncio.to_thread(finish_render_job, content_hash, "failed", message)
             return {
                 "status": "error",
-                "message": "No suitable sign language words available for this text. Try different wording.",
+                "message": message,
                 "content_hash": content_hash
             }
         
-        # Start background task for video generation
-        background_tasks.add_task(background_video_generation, text, content_hash)
+        # Queue the render for the worker processes
+        job = await asyncio.to_thread(queue_render_job, content_hash, processed_text)
         
         return {
             "status": "processing",
             "message": "Video generation started. Check status endpoint for updates.",
-            "content_hash": content_hash
+            "content_hash": content_hash,
+            "job_status": job["status"]
         }
 
     except Exception as e:
         logger.error(f"Error in generate_video endpoint: {e}")
         raise HTTPException(status_code=500, detail=f"Error generating video: {str(e)}")
 
+@router.get("/clips")
+async def list_clips():
+    """List the indexed sign clips with their duration, frame rate and resolution."""
+    return clip_index.snapshot()
+
+@router.get("/segments")
+async def segment_stats():
+    """Hit rates and encode time saved by the clip segment cache."""
+    return await asyncio.to_thread(segment_cache.stats)
+
+@router.get("/jobs")
+async def render_job_stats():
+    """Number of render jobs in each state."""
+    return await asyncio.to_thread(count_render_jobs)
+
+@router.get("/eviction")
+async def eviction_stats():
+    """Files and bytes tracked, and videos and bytes removed by the eviction service."""
+    return video_evictor.stats()
+
+@router.get("/events")
+async def video_events(content_hashes: List[str] = Query(..., alias="hash", description="Content hashes to follow")):
+    """Server-sent events (queued, progress, done, failed) for one or more videos; ends when all are done or failed."""
+    content_hashes = list(dict.fromkeys(content_hashes))
+    if len(content_hashes) > 50:
+        raise HTTPException(status_code=400, detail="At most 50 content hashes per stream")
+    return StreamingResponse(
+        job_events.stream(content_hashes),
+        media_type="text/event-stream",
+        # Keep proxies from buffering events
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 @router.get("/status/{content_hash}")
 async def check_video_status(content_hash: str):
     """Check the status of a video generation task."""
-    if content_hash in video_cache:
-        return {"status": "completed", "video_path": video_cache[content_hash]}
-    
-    # Check if the video exists in the output directory
-    metadata = load_metadata()
-    for video in metadata["videos"]:
-        if video.get("content_hash") == content_hash:
-            filename = video["filename"]
-            return {"status": "completed", "video_path": f"/assets/generated/{filename}"}
+    # Check if the video is in the catalog
+    video = await asyncio.to_thread(get_video, content_hash)
+    if video:
+        return {"status": "completed", "video_path": f"/assets/generated/{video['filename']}"}
     
-    return {"status": "processing"}
+    # Not rendered yet: report where the job is (preparing, queued, running or failed)
+    job = await asyncio.to_thread(get_render_job, content_hash)
+    if job is None:
+        return {"status": "processing"}
+    if job["status"] == "completed":
+        # Rendered, but removed from the catalog since
+        return {"status": "failed", "error": "Video is no longer available; request it again"}
+    response = {"status": job["status"], "priority": job["priority"], "attempts": job["attempts"]}
+    if job["status"] == "failed":
+        response["error"] = job["error"]
+    return response
 
 @router.get("/list")
 async def list_videos(limit: int = 10, offset: int = 0):
     """List generated videos with pagination."""
-    metadata = load_metadata()
-    videos = metadata["videos"]
-    
-    # Sort by creation date (newest first)
-    videos.sort(key=lambda x: x.get("created_at", ""), reverse=True)
-    
-    # Apply pagination
-    paginated = videos[offset:offset+limit]
+    # Newest first
+    videos, total = await asyncio.to_thread(list_video_records, limit, offset)
     
     return {
-        "videos": paginated,
-        "total": len(videos),
+        "videos": videos,
+        "total": total,
         "limit": limit,
         "offset": offset
     }
@@ -315,34 +398,21 @@ async def list_videos(limit: int = 10, offset: int = 0):
 @router.delete("/{content_hash}")
 async def delete_video(content_hash: str):
     """Delete a generated video by its content hash."""
-    metadata = load_metadata()
-    found = False
+    video = await asyncio.to_thread(get_video, content_hash)
+    if video is None:
+        raise HTTPException(status_code=404, detail="Video not found")
     
-    for i, video in enumerate(metadata["videos"]):
-        if video.get("content_hash") == content_hash:
-            filename = video["filename"]
-            video_path = OUTPUT_DIR / filename
-            
-            if video_path.exists():
-                try:
-                    os.remove(video_path)
-                    logger.info(f"Deleted video: {filename}")
-                except Exception as e:
-                    logger.error(f"Failed to delete {video_path}: {e}")
-                    raise HTTPException(status_code=500, detail=f"Failed to delete video file: {str(e)}")
-            
-            # Remove from metadata
-            metadata["videos"].pop(i)
-            save_metadata(metadata)
-            
-            # Remove from cache
-            if content_hash in video_cache:
-                del video_cache[content_hash]
-            
-            found = True
-            break
+    filename = video["filename"]
+    video_path = OUTPUT_DIR / filename
+    if video_path.exists():
+        try:
+            os.remove(video_path)
+            logger.info(f"Deleted video: {filename}")
+        except Exception as e:
+            logger.error(f"Failed to delete {video_path}: {e}")
+            raise HTTPException(status_code=500, detail=f"Failed to delete video file: {str(e)}")
     
-    if not found:
-        raise HTTPException(status_code=404, detail="Video not found")
+    # Remove from the catalog
+    await asyncio.to_thread(delete_video_record, content_hash)
     
     return {"status": "success", "message": "Video deleted successfully"}
\ No newline at end of file
@@ -0,0 +1,332 @@
+"""Fast video assembly: cached, normalized clip segments are joined with ffmpeg's concat demuxer without re-encoding"""
+import hashlib
+import json
+import os
+import subprocess
+import tempfile
+import threading
+import time
+import uuid
+from collections import Counter
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+from database.db import add_segment_counters, count_segment_ngrams, get_segment_counters, get_top_segment_ngrams
+
+try:
+    import fcntl
+except ImportError:  # Windows: render workers there only get the in-process locks
+    fcntl = None
+
+PROJECT_ROOT = Path(os.path.abspath(os.path.dirname(__file__))).parent.parent
+ASSETS_DIR = PROJECT_ROOT / "assets"
+NORMALIZED_CLIP_DIR = Path(os.getenv("NORMALIZED_CLIP_DIR", str(ASSETS_DIR / "clips_normalized")))
+MANIFEST_FILE = NORMALIZED_CLIP_DIR / "manifest.json"
+
+# Phrase lengths cached as single segments, and how often a phrase must be rendered before it is
+SEGMENT_NGRAM_SIZES = (3, 2)
+SEGMENT_NGRAM_MIN_COUNT = int(os.getenv("SEGMENT_NGRAM_MIN_COUNT", "3"))
+SEGMENT_MAX_NGRAMS = int(os.getenv("SEGMENT_MAX_NGRAMS", "500"))
+
+# Every normalized clip shares these settings, which is what makes stream copy possible
+NORMALIZE_FPS = 24
+NORMALIZE_CRF = int(os.getenv("CLIP_NORMALIZE_CRF", "20"))
+NORMALIZE_TIMESCALE = 12288  # ffmpeg's default MP4 timescale for 24 fps; must match across clips
+
+
+def temp_path(target: Path) -> Path:
+    """A temporary file next to target that no other process or thread will pick"""
+    return target.with_name(f"{target.stem}.{os.getpid()}-{uuid.uuid4().hex[:8]}.tmp{target.suffix}")
+
+
+@contextmanager
+def file_lock(path: Path):
+    """Hold an exclusive lock on path across processes (render workers, src/normalize_clips.py)"""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "a") as lock_file:
+        if fcntl is not None:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def manifest_lock(directory: Path = NORMALIZED_CLIP_DIR):
+    """Lock held while the segment manifest is read, changed and written back"""
+    return file_lock(Path(directory) / "locks" / "manifest.lock")
+
+
+def ffmpeg_binary() -> str:
+    """The ffmpeg moviepy uses, so no second installation is needed"""
+    try:
+        from moviepy.config import FFMPEG_BINARY
+        return FFMPEG_BINARY
+    except ImportError:
+        return "ffmpeg"
+
+
+def normalize_clip(source: Path, target: Path, width: int, height: int, fps: int = NORMALIZE_FPS) -> None:
+    """Re-encode one clip to the shared codec, resolution and frame rate (letterboxed, no audio)"""
+    target.parent.mkdir(parents=True, exist_ok=True)
+    tmp_target = temp_path(target)
+    video_filter = (
+        f"scale={width}:{height}:force_original_aspect_ratio=decrease,"
+        f"pad={width}:{height}:(ow-iw)/2:(oh-ih)/2,setsar=1,fps={fps},format=yuv420p"
+    )
+    subprocess.run([
+        ffmpeg_binary(), "-v", "error", "-y", "-i", str(source),
+        "-vf", video_filter, "-an",
+        "-c:v", "libx264", "-preset", "medium", "-crf", str(NORMALIZE_CRF),
+        "-profile:v", "high", "-level", "4.0",
+        "-video_track_timescale", str(NORMALIZE_TIMESCALE),
+        "-movflags", "+faststart", str(tmp_target),
+    ], check=True, capture_output=True)
+    os.replace(tmp_target, target)
+
+
+def concat_clips(paths: List[str], output: Path) -> None:
+    """Join normalized clips into one MP4 by copying their streams; nothing is decoded"""
+    with tempfile.NamedTemporaryFile("w", suffix=".txt", delete=False, encoding="utf-8") as list_file:
+        for path in paths:
+            escaped = str(Path(path).resolve()).replace("'", "'\\''")
+            list_file.write(f"file '{escaped}'\n")
+    tmp_output = temp_path(output)
+    try:
+        subprocess.run([
+            ffmpeg_binary(), "-v", "error", "-y", "-f", "concat", "-safe", "0", "-i", list_file.name,
+            "-c", "copy", "-movflags", "+faststart", str(tmp_output),
+        ], check=True, capture_output=True)
+        os.replace(tmp_output, output)
+    finally:
+        os.remove(list_file.name)
+        if tmp_output.exists():
+            tmp_output.unlink()
+
+
+def is_faststart(path: Path) -> bool:
+    """True if the MP4's index (moov box) comes before its media data, so playback can start while downloading"""
+    with open(path, "rb") as f:
+        while True:
+            header = f.read(8)
+            if len(header) < 8:
+                return False
+            size = int.from_bytes(header[:4], "big")
+            box_type = header[4:8]
+            if box_type == b"moov":
+                return True
+            if box_type == b"mdat":
+                return False
+            if size == 1:
+                # 64-bit box size follows the type
+                size = int.from_bytes(f.read(8), "big") - 8
+            elif size == 0:
+                return False
+            f.seek(size - 8, os.SEEK_CUR)
+
+
+def ensure_faststart(path: Path) -> bool:
+    """Move the index of an MP4 to the front without re-encoding; returns True if it had to be moved"""
+    if is_faststart(path):
+        return False
+    tmp_path = path.with_suffix(".faststart.mp4")
+    try:
+        subprocess.run([
+            ffmpeg_binary(), "-v", "error", "-y", "-i", str(path), "-c", "copy", "-map", "0",
+            "-movflags", "+faststart", str(tmp_path),
+        ], check=True, capture_output=True)
+        os.replace(tmp_path, path)
+    finally:
+        if tmp_path.exists():
+            tmp_path.unlink()
+    return True
+
+
+class SegmentCache:
+    """Concat-ready segments for single words and frequent phrases, shared by all sentences.
+
+    Word segments are clips normalized by ``src/normalize_clips.py`` or, on a
+    miss, encoded on first use. Once a two- or three-word sequence has been
+    rendered ``SEGMENT_NGRAM_MIN_COUNT`` times its segments are also joined
+    into one n-gram segment, so later sentences need fewer concat inputs.
+    The manifest records the size and mtime of each source clip, so a replaced
+    clip is encoded again. Hit counters and phrase counts are kept in the
+    database, so every render worker adds to the same ones.
+    """
+
+    COUNTERS = ("word_hits", "word_misses", "ngram_hits", "ngrams_built", "encode_seconds", "encode_seconds_saved")
+
+    def __init__(self, directory: Path = NORMALIZED_CLIP_DIR):
+        self.directory = Path(directory)
+        self.manifest_file = self.directory / "manifest.json"
+        self._manifest: Dict = {"settings": {}, "clips": {}, "ngrams": {}}
+        self._mtime: Optional[tuple] = None
+        self._lock = threading.RLock()
+        self._key_locks: Dict[str, threading.Lock] = {}
+
+    def manifest(self, reload: bool = False) -> Dict:
+        """Current manifest, re-read only when the file changed (or always with reload)"""
+        try:
+            stat = self.manifest_file.stat()
+        except OSError:
+            return self._manifest
+        # Size as well as mtime, since another process can rewrite it within the mtime resolution
+        mtime = (stat.st_mtime_ns, stat.st_size)
+        if reload or mtime != self._mtime:
+            with self._lock:
+                if reload or mtime != self._mtime:
+                    try:
+                        manifest = json.loads(self.manifest_file.read_text(encoding="utf-8"))
+                        manifest.setdefault("clips", {})
+                        manifest.setdefault("ngrams", {})
+                        self._manifest = manifest
+                    except (OSError, json.JSONDecodeError) as e:
+                        print(f"Error reading segment manifest: {e}")
+                    self._mtime = mtime
+        return self._manifest
+
+    def assemble(self, clips: List, on_progress: Optional[Callable[[int, int], None]] = None) -> List[str]:
+        """Segment paths covering the ClipInfo sequence, longest cached phrases first.
+
+        ``on_progress(done, total)`` is called as clips are covered, which matters
+        when segments have to be encoded first.
+        """
+        words = [clip.word for clip in clips]
+        ngrams = Counter("+".join(words[i:i + n]) for n in SEGMENT_NGRAM_SIZES for i in range(len(words) - n + 1))
+        ngram_counts = count_segment_ngrams(ngrams) if ngrams else {}
+
+        counters: Counter = Counter()
+        paths = []
+        i = 0
+        try:
+            while i < len(clips):
+                for n in SEGMENT_NGRAM_SIZES:
+                    if i + n <= len(clips):
+                        path = self._ngram_segment(clips[i:i + n], ngram_counts, counters)
+                        if path is not None:
+                            paths.append(path)
+                            i += n
+                            break
+                else:
+                    paths.append(self._word_segment(clips[i], counters))
+                    i += 1
+                if on_progress is not None:
+                    on_progress(i, len(clips))
+        finally:
+            if counters:
+                add_segment_counters(counters)
+        return paths
+
+    def stats(self) -> Dict:
+        manifest = self.manifest()
+        stored = get_segment_counters()
+        counters = {
+            name: round(float(stored.get(name, 0)), 2) if name.endswith("_seconds") else int(stored.get(name, 0))
+            for name in self.COUNTERS
+        }
+        lookups = counters["word_hits"] + counters["word_misses"]
+        return {
+            **counters,
+            "word_hit_rate": round(counters["word_hits"] / lookups, 3) if lookups else 0.0,
+            "word_segments": len(manifest["clips"]),
+            "ngram_segments": len(manifest["ngrams"]),
+            "settings": manifest.get("settings", {}),
+            "top_ngrams": [
+                {"words": ngram.split("+"), "count": count} for ngram, count in get_top_segment_ngrams(10)
+            ],
+        }
+
+    @contextmanager
+    def _key_lock(self, key: str):
+        """Only one thread in any render worker encodes a given segment"""
+        with self._lock:
+            thread_lock = self._key_locks.setdefault(key, threading.Lock())
+        with thread_lock:
+            lock_name = hashlib.sha1(key.encode("utf-8")).hexdigest()[:16]
+            with file_lock(self.directory / "locks" / f"{lock_name}.lock"):
+                yield
+
+    def _settings(self, clip) -> Dict:
+        settings = self.manifest().get("settings")
+        if not settings:
+            # Nothing normalized yet; use the first clip's resolution for the whole library
+            width, height = (clip.width or 1280), (clip.height or 720)
+            proposed = {"width": width - width % 2, "height": height - height % 2, "fps": NORMALIZE_FPS,
+                        "codec": "h264", "crf": NORMALIZE_CRF}
+            self._update(lambda manifest: manifest.update(settings=manifest.get("settings") or proposed))
+            settings = self.manifest()["settings"]
+        return settings
+
+    def _valid_word(self, entry: Optional[Dict], clip) -> bool:
+        return (entry is not None and entry["source_size"] == clip.size and entry["source_mtime"] == clip.mtime
+                and (self.directory / entry["file"]).exists())
+
+    def _word_segment(self, clip, counters: Counter) -> str:
+        entry = self.manifest()["clips"].get(clip.word)
+        if not self._valid_word(entry, clip):
+            with self._key_lock(f"word:{clip.word}"):
+                # Another worker may have encoded it while we waited for the lock
+                entry = self.manifest(reload=True)["clips"].get(clip.word)
+                if not self._valid_word(entry, clip):
+                    settings = self._settings(clip)
+                    started = time.perf_counter()
+                    normalize_clip(Path(clip.path), self.directory / f"{clip.word}.mp4",
+                                   settings["width"], settings["height"], settings["fps"])
+                    encode_seconds = round(time.perf_counter() - started, 3)
+                    entry = {"file": f"{clip.word}.mp4", "source_size": clip.size,
+                             "source_mtime": clip.mtime, "encode_seconds": encode_seconds}
+                    self._update(lambda manifest: manifest["clips"].__setitem__(clip.word, entry))
+                    counters["word_misses"] += 1
+                    counters["encode_seconds"] += encode_seconds
+                    return str(self.directory / entry["file"])
+        counters["word_hits"] += 1
+        counters["encode_seconds_saved"] += entry.get("encode_seconds", 0.0)
+        return str(self.directory / entry["file"])
+
+    def _ngram_segment(self, clips: List, ngram_counts: Dict[str, int], counters: Counter) -> Optional[str]:
+        words = [clip.word for clip in clips]
+        key = "+".join(words)
+        manifest = self.manifest()
+        entry = manifest["ngrams"].get(key)
+        sources = [[clip.size, clip.mtime] for clip in clips]
+        if entry is None or entry["sources"] != sources or not (self.directory / entry["file"]).exists():
+            if (ngram_counts.get(key, 0) < SEGMENT_NGRAM_MIN_COUNT
+                    or len(manifest["ngrams"]) >= SEGMENT_MAX_NGRAMS):
+                return None
+            with self._key_lock(f"ngram:{key}"):
+                entry = self.manifest(reload=True)["ngrams"].get(key)
+                if entry is None or entry["sources"] != sources or not (self.directory / entry["file"]).exists():
+                    parts = [self._word_segment(clip, counters) for clip in clips]
+                    filename = f"ngrams/{hashlib.sha1(key.encode('utf-8')).hexdigest()[:16]}.mp4"
+                    (self.directory / "ngrams").mkdir(parents=True, exist_ok=True)
+                    concat_clips(parts, self.directory / filename)
+                    entry = {"file": filename, "words": words, "sources": sources}
+                    self._update(lambda manifest: manifest["ngrams"].__setitem__(key, entry))
+                    counters["ngrams_built"] += 1
+                    return str(self.directory / filename)
+
+        clip_entries = self.manifest()["clips"]
+        counters["ngram_hits"] += 1
+        counters["word_hits"] += len(words)
+        counters["encode_seconds_saved"] += sum(
+            clip_entries.get(word, {}).get("encode_seconds", 0.0) for word in words
+        )
+        return str(self.directory / entry["file"])
+
+    def _update(self, change) -> None:
+        """Apply a change to the latest manifest on disk and write it back atomically"""
+        with self._lock, manifest_lock(self.directory):
+            manifest = self.manifest(reload=True)
+            change(manifest)
+            self.directory.mkdir(parents=True, exist_ok=True)
+            tmp_file = temp_path(self.manifest_file)
+            tmp_file.write_text(json.dumps(manifest, indent=2), encoding="utf-8")
+            os.replace(tmp_file, self.manifest_file)
+            self._manifest = manifest
+            stat = self.manifest_file.stat()
+            self._mtime = (stat.st_mtime_ns, stat.st_size)
+
+
+segment_cache = SegmentCache()
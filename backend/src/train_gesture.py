@@ -8,6 +8,8 @@ from sklearn.model_selection import train_test_split
 from sklearn.preprocessing import LabelEncoder
 import os
 
+from routes.gesture_model import export_tflite, export_npz
+
 # Initialize MediaPipe Hands
 mp_hands = mp.solutions.hands
 mp_drawing = mp.solutions.drawing_utils
@@ -145,4 +147,10 @@ model.fit(
 
 # Save model
 model.save(MODEL_FILE)
-print(f"Model trained and saved successfully to {MODEL_FILE}!")
\ No newline at end of file
+print(f"Model trained and saved successfully to {MODEL_FILE}!")
+
+# Export the artifacts the server loads, so it never has to convert at startup
+tflite_file = export_tflite(model, MODEL_FILE)
+print(f"TFLite model exported to {tflite_file}")
+npz_file = export_npz(model, MODEL_FILE)
+print(f"NumPy weights exported to {npz_file}")
\ No newline at end of file
@@ -0,0 +1,97 @@
+"""Check parity between the TFLite and NumPy gesture backends and compare their cost.
+
+Run from the backend directory after training the model:
+
+    python test/bench_gesture_backends.py
+
+The script fails if the two backends agree on the predicted gesture for fewer
+than --min-agreement of the samples or if their probabilities differ by more
+than --atol (the TFLite model is weight-quantized, so small differences are
+expected). It then reports latency per batch size and the import time and peak
+RSS of a fresh process that loads only one backend.
+"""
+import argparse
+import os
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src")
+sys.path.insert(0, SRC_DIR)
+
+# Runs in a fresh interpreter so each backend's footprint is measured in isolation
+LOAD_SNIPPET = """
+import resource, sys, time
+sys.path.insert(0, {src!r})
+started = time.perf_counter()
+from routes.gesture_model import create_backend
+backend = create_backend({name!r})
+elapsed = time.perf_counter() - started
+print(elapsed, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)
+"""
+
+
+def load_samples(count: int) -> np.ndarray:
+    """Use recorded training samples when available, random landmarks otherwise"""
+    from routes.gesture_model import MODEL_DIR
+    data_path = os.path.join(MODEL_DIR, "gesture_data.npy")
+    if os.path.exists(data_path):
+        data = np.load(data_path, allow_pickle=True).astype(np.float32)
+        return data[np.random.default_rng(0).integers(0, len(data), count)]
+    return np.random.default_rng(0).random((count, 42), dtype=np.float32)
+
+
+def predict_all(backend, samples: np.ndarray, batch_size: int) -> np.ndarray:
+    return np.concatenate([backend.predict(samples[i:i + batch_size]) for i in range(0, len(samples), batch_size)])
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--samples", type=int, default=2048)
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--atol", type=float, default=0.05)
+    parser.add_argument("--min-agreement", type=float, default=0.99)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    from routes.gesture_model import create_backend
+    backends = {name: create_backend(name) for name in ("tflite", "numpy")}
+    samples = load_samples(args.samples)
+
+    # Parity
+    batch_size = backends["tflite"].max_batch_size
+    tflite_out = predict_all(backends["tflite"], samples, batch_size)
+    numpy_out = predict_all(backends["numpy"], samples, batch_size)
+    max_diff = float(np.abs(tflite_out - numpy_out).max())
+    agreement = float((tflite_out.argmax(axis=1) == numpy_out.argmax(axis=1)).mean())
+    print(f"parity: max |p_tflite - p_numpy| = {max_diff:.5f}, argmax agreement = {agreement:.2%}")
+    if max_diff > args.atol or agreement < args.min_agreement:
+        raise SystemExit("Backends disagree")
+
+    # Latency
+    print(f"\n{'batch':>6} {'tflite us/sample':>18} {'numpy us/sample':>18}")
+    for batch_size in args.batch_sizes:
+        row = []
+        for name in ("tflite", "numpy"):
+            backend = backends[name]
+            size = min(batch_size, getattr(backend, "max_batch_size", batch_size))
+            best = float("inf")
+            for _ in range(args.repeat):
+                started = time.perf_counter()
+                predict_all(backend, samples, size)
+                best = min(best, time.perf_counter() - started)
+            row.append(best / len(samples) * 1e6)
+        print(f"{batch_size:>6} {row[0]:>18.2f} {row[1]:>18.2f}")
+
+    # Load time and memory
+    print(f"\n{'backend':>8} {'load s':>8} {'peak RSS MB':>12}")
+    for name in ("tflite", "numpy"):
+        output = subprocess.check_output([sys.executable, "-c", LOAD_SNIPPET.format(src=SRC_DIR, name=name)], text=True)
+        elapsed, max_rss_kb = output.strip().splitlines()[-1].split()
+        print(f"{name:>8} {float(elapsed):>8.2f} {int(max_rss_kb) / 1024:>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""Measure gesture WebSocket throughput (frames per second) against concurrent sockets.
+
+Start the backend first, then run from the backend directory:
+
+    python test/bench_gesture_ws.py --image hand.jpg --sockets 1 2 4 8 16
+
+Each socket sends the same JPEG frame and waits for the server's reply before
+sending the next one, so the reported rate is what the server can sustain.
+"""
+import argparse
+import asyncio
+import time
+
+import cv2
+import numpy as np
+import websockets
+
+
+def load_frame(path: str) -> bytes:
+    """Return JPEG bytes for the benchmark frame (a blank frame if no image is given)"""
+    if path:
+        frame = cv2.imread(path)
+        if frame is None:
+            raise SystemExit(f"Cannot read image: {path}")
+    else:
+        frame = np.zeros((480, 640, 3), dtype=np.uint8)
+    ok, encoded = cv2.imencode(".jpg", frame)
+    return encoded.tobytes()
+
+
+async def run_socket(url: str, frame: bytes, deadline: float) -> int:
+    frames = 0
+    async with websockets.connect(url, max_size=None) as ws:
+        while time.perf_counter() < deadline:
+            await ws.send(frame)
+            await ws.recv()
+            frames += 1
+    return frames
+
+
+async def run_level(url: str, frame: bytes, sockets: int, duration: float) -> float:
+    deadline = time.perf_counter() + duration
+    started = time.perf_counter()
+    counts = await asyncio.gather(*(run_socket(url, frame, deadline) for _ in range(sockets)))
+    return sum(counts) / (time.perf_counter() - started)
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="ws://127.0.0.1:8000/gesture/ws")
+    parser.add_argument("--image", default="", help="JPEG/PNG frame containing a hand")
+    parser.add_argument("--sockets", type=int, nargs="+", default=[1, 2, 4, 8, 16])
+    parser.add_argument("--duration", type=float, default=10.0, help="Seconds per concurrency level")
+    args = parser.parse_args()
+
+    frame = load_frame(args.image)
+    print(f"{'sockets':>8} {'fps':>10} {'fps/socket':>12}")
+    for sockets in args.sockets:
+        fps = await run_level(args.url, frame, sockets, args.duration)
+        print(f"{sockets:>8} {fps:>10.1f} {fps / sockets:>12.1f}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
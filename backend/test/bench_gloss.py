@@ -0,0 +1,97 @@
+"""Measure coverage and latency of the local text-to-gloss mapper.
+
+Run from the backend directory:
+
+    python test/bench_gloss.py
+    python test/bench_gloss.py --corpus sentences.txt --threshold 0.6
+
+The vocabulary is read from assets/clips when it has clips and otherwise falls
+back to a small built-in one. The corpus is one sentence per line, or a built-in
+sample of everyday sentences. For every sentence the script reports the words
+found and the coverage, then the share of sentences that would skip the LLM at
+the threshold and the median and p99 time to translate one sentence.
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
+
+from routes.gloss import GlossEngine, GLOSS_MIN_COVERAGE  # noqa: E402
+
+CLIP_DIR = Path(__file__).resolve().parents[1] / "assets" / "clips"
+
+SAMPLE_VOCABULARY = [
+    "hello", "goodbye", "thank_you", "please", "sorry", "yes", "no", "i", "you", "he", "she", "we", "they",
+    "want", "need", "like", "love", "help", "go", "come", "eat", "drink", "sleep", "work", "study", "play",
+    "water", "food", "home", "school", "doctor", "hospital", "friend", "family", "mother", "father",
+    "good", "bad", "happy", "sad", "tired", "hungry", "sick", "morning", "night", "today", "tomorrow",
+    "good_morning", "good_night", "how", "what", "where", "when", "who", "why", "name", "not", "understand",
+    "again", "slow", "time", "book", "car", "bus", "money", "buy", "toilet", "nice_to_meet_you",
+]
+
+SAMPLE_CORPUS = [
+    "Hello, how are you?",
+    "Good morning!",
+    "Thank you very much.",
+    "I want some water please.",
+    "Where is the toilet?",
+    "I don't understand, can you say it again slowly?",
+    "My mother is a doctor at the hospital.",
+    "We are going home tomorrow.",
+    "I am hungry, let's eat some food.",
+    "What is your name?",
+    "Nice to meet you!",
+    "She is tired and wants to sleep.",
+    "Can you help me buy a bus ticket?",
+    "My friends play at school every day.",
+    "I love my family.",
+    "Sorry, I am sick today.",
+    "They went to work by car.",
+    "Good night, see you tomorrow.",
+    "The quarterly financial report shows a deficit.",
+    "Photosynthesis converts light into chemical energy.",
+]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--corpus", help="Text file with one sentence per line")
+    parser.add_argument("--threshold", type=float, default=GLOSS_MIN_COVERAGE)
+    parser.add_argument("--repeat", type=int, default=1000)
+    args = parser.parse_args()
+
+    vocabulary = [path.stem for path in CLIP_DIR.glob("*.mp4")] or SAMPLE_VOCABULARY
+    corpus = SAMPLE_CORPUS
+    if args.corpus:
+        corpus = [line.strip() for line in Path(args.corpus).read_text(encoding="utf-8").splitlines() if line.strip()]
+
+    started = time.perf_counter()
+    engine = GlossEngine(vocabulary)
+    print(f"Indexed {len(vocabulary)} clip words in {(time.perf_counter() - started) * 1000:.2f} ms\n")
+
+    local = 0
+    coverages, timings = [], []
+    for sentence in corpus:
+        result = engine.translate(sentence)
+        coverages.append(result.coverage)
+        local += bool(result.words) and result.coverage >= args.threshold
+        for _ in range(args.repeat):
+            started = time.perf_counter()
+            engine.translate(sentence)
+            timings.append(time.perf_counter() - started)
+        print(f"{result.coverage:>5.0%}  {sentence}\n       -> {' '.join(result.words) or '-'}"
+              + (f"  (unmatched: {', '.join(result.unmatched)})" if result.unmatched else ""))
+
+    timings.sort()
+    print(f"\nSentences: {len(corpus)}, mean coverage {statistics.mean(coverages):.0%}")
+    print(f"Answered locally at threshold {args.threshold:.0%}: {local}/{len(corpus)} ({local / len(corpus):.0%})")
+    print(f"Latency per sentence: median {statistics.median(timings) * 1e6:.1f} us, "
+          f"p99 {timings[int(len(timings) * 0.99)] * 1e6:.1f} us")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+"""Measure the shared LLM client's latency, concurrency and cache hit rate.
+
+Start test/stub_ollama.py (or point --host at a real Ollama server), then run
+from the backend directory:
+
+    python test/bench_llm.py --requests 200 --distinct 20 --concurrency 1 4 8
+
+Requests cycle through --distinct different prompts, so all but the first of each
+are answered from the cache or joined to the identical request in flight. Each
+concurrency level uses a fresh client, so its cache starts empty.
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
+
+
+async def run(client, prompts):
+    started = time.perf_counter()
+    await asyncio.gather(*(client.chat(prompt) for prompt in prompts))
+    return time.perf_counter() - started
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="http://127.0.0.1:11435")
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--distinct", type=int, default=20)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 8])
+    args = parser.parse_args()
+
+    from routes.llm import LLMClient
+
+    prompts = [f"Sign language word sequence: hello number {i % args.distinct}" for i in range(args.requests)]
+    print(f"{'limit':>6} {'req/s':>8} {'model calls':>12} {'hit rate':>9} {'coalesced':>10} {'p50 ms':>8} {'p95 ms':>8}")
+    for concurrency in args.concurrency:
+        client = LLMClient(host=args.host, max_concurrency=concurrency)
+        elapsed = asyncio.run(run(client, prompts))
+        m = client.metrics()
+        print(f"{concurrency:>6} {args.requests / elapsed:>8.1f} {m['requests']:>12} {m['cache_hit_rate']:>9.2f} "
+              f"{m['coalesced']:>10} {m['latency_p50_ms']:>8} {m['latency_p95_ms']:>8}")
+
+
+if __name__ == "__main__":
+    main()
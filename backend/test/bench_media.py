@@ -0,0 +1,112 @@
+"""Measure time to first frame and cache validation of served videos.
+
+Start the API with at least one generated video, then run from the backend directory:
+
+    python test/bench_media.py
+    python test/bench_media.py --url http://127.0.0.1:8000/assets/generated/video_<hash>.mp4 --repeat 10
+
+Without --url the newest video from /video/list is used. The video is measured
+as served and as a copy with its index (moov box) at the end, written next to it
+and removed afterwards. For both, the script reports the median time to first
+frame, taken as the time ffmpeg needs to decode one frame over HTTP, and the time
+to download the whole file. It also checks that a range request is answered with
+206 and a request carrying the ETag with 304.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+from pathlib import Path
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
+
+from routes.video_render import ffmpeg_binary, is_faststart  # noqa: E402
+
+GENERATED_DIR = Path(__file__).resolve().parents[1] / "assets" / "generated"
+
+
+def newest_video_url(base: str) -> str:
+    with urllib.request.urlopen(f"{base}/video/list?limit=1") as response:
+        videos = json.load(response)["videos"]
+    if not videos:
+        raise SystemExit("No generated videos; create one with POST /video first")
+    return f"{base}/assets/generated/{videos[0]['filename']}"
+
+
+def time_to_first_frame(url: str) -> float:
+    started = time.perf_counter()
+    subprocess.run([ffmpeg_binary(), "-v", "error", "-i", url, "-frames:v", "1", "-f", "null", "-"],
+                   check=True, capture_output=True)
+    return time.perf_counter() - started
+
+
+def download(url: str) -> float:
+    started = time.perf_counter()
+    with urllib.request.urlopen(url) as response:
+        while response.read(1 << 16):
+            pass
+    return time.perf_counter() - started
+
+
+def status_of(request: urllib.request.Request) -> tuple:
+    try:
+        with urllib.request.urlopen(request) as response:
+            return response.status, response.headers, len(response.read())
+    except urllib.error.HTTPError as e:
+        return e.code, e.headers, 0
+
+
+def check_headers(url: str) -> None:
+    status, headers, size = status_of(urllib.request.Request(url, headers={"Range": "bytes=0-1023"}))
+    print(f"Range bytes=0-1023: {status}, {size} bytes, Content-Range {headers.get('content-range')}")
+    status, headers, _ = status_of(urllib.request.Request(url))
+    etag = headers.get("etag")
+    print(f"ETag {etag}, Cache-Control {headers.get('cache-control')}")
+    status, _, size = status_of(urllib.request.Request(url, headers={"If-None-Match": etag or ""}))
+    print(f"If-None-Match: {status}, {size} bytes")
+
+
+def measure(label: str, url: str, repeat: int) -> None:
+    ttff = statistics.median(time_to_first_frame(url) for _ in range(repeat))
+    full = statistics.median(download(url) for _ in range(repeat))
+    print(f"{label:<14} {ttff * 1000:>14.1f} {full * 1000:>14.1f}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base", default="http://127.0.0.1:8000")
+    parser.add_argument("--url", help="URL of a generated video; defaults to the newest one")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    url = args.url or newest_video_url(args.base)
+    check_headers(url)
+
+    filename = url.rsplit("/", 1)[-1]
+    source = GENERATED_DIR / filename
+    print(f"\n{'':<14} {'first frame ms':>14} {'download ms':>14}")
+    measure("as served" + ("" if not source.exists() or is_faststart(source) else "*"), url, args.repeat)
+
+    if not source.exists():
+        print(f"{source} is not on this machine; skipping the index-at-end comparison")
+        return
+    # The mp4 muxer writes the index after the media data unless asked for faststart
+    slow = GENERATED_DIR / f"slowstart_{filename}"
+    try:
+        subprocess.run([ffmpeg_binary(), "-v", "error", "-y", "-i", str(source), "-c", "copy", str(slow)],
+                       check=True, capture_output=True)
+        measure("index at end", url.rsplit("/", 1)[0] + f"/{slow.name}", args.repeat)
+    finally:
+        if slow.exists():
+            slow.unlink()
+    if not is_faststart(source):
+        print("* the served video has its index at the end")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""Compare sequential and pipelined sign-to-speech latency.
+
+Start test/stub_ollama.py and the backend with OLLAMA_HOST pointing at it (or a
+real Ollama server), then run from the backend directory:
+
+    python test/bench_sign_to_speech.py --repeat 5
+
+Every run signs a new word so the TTS cache never answers. For /tts/sign-to-speech
+the script reports the total latency, which is also when the first audio arrives.
+For /tts/sign-to-speech/stream it reports the time to the first audio event and
+the median of the per-stage timings the server sends in its done event.
+"""
+import argparse
+import json
+import statistics
+import time
+import urllib.parse
+import urllib.request
+
+WORDS = ["hello", "I", "want", "water"]
+
+
+def url_for(base_url: str, path: str, words) -> str:
+    return f"{base_url}{path}?{urllib.parse.urlencode([('words', word) for word in words])}"
+
+
+def sequential(base_url: str, words) -> float:
+    started = time.perf_counter()
+    with urllib.request.urlopen(urllib.request.Request(url_for(base_url, "/tts/sign-to-speech", words), method="POST")) as response:
+        response.read()
+    return time.perf_counter() - started
+
+
+def pipelined(base_url: str, words):
+    """Return (seconds to first audio, total seconds, server timings)"""
+    started = time.perf_counter()
+    first_audio = None
+    timings = {}
+    request = urllib.request.Request(url_for(base_url, "/tts/sign-to-speech/stream", words), method="POST")
+    with urllib.request.urlopen(request) as response:
+        for line in response:
+            event = json.loads(line)
+            if event["type"] == "audio" and first_audio is None:
+                first_audio = time.perf_counter() - started
+            elif event["type"] == "done":
+                timings = event["timings"]
+    return first_audio, time.perf_counter() - started, timings
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://127.0.0.1:8000")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    run = int(time.time())
+    sequential_total, first, total, stages = [], [], [], {}
+    for i in range(args.repeat):
+        sequential_total.append(sequential(args.url, WORDS + [f"sequential{run}x{i}"]))
+        first_audio, elapsed, timings = pipelined(args.url, WORDS + [f"pipelined{run}x{i}"])
+        first.append(first_audio or elapsed)
+        total.append(elapsed)
+        for stage, value in timings.items():
+            if value is not None:
+                stages.setdefault(stage, []).append(value)
+
+    print(f"{'mode':>10} {'first audio ms':>15} {'total ms':>10}")
+    sequential_ms = statistics.median(sequential_total) * 1000
+    print(f"{'sequential':>10} {sequential_ms:>15.1f} {sequential_ms:>10.1f}")
+    print(f"{'pipelined':>10} {statistics.median(first) * 1000:>15.1f} {statistics.median(total) * 1000:>10.1f}")
+
+    print("\nPipelined stage timings (median ms)")
+    for stage, values in stages.items():
+        print(f"{stage:>24} {statistics.median(values):>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+"""Measure batched Whisper throughput (clips per second) against batch size.
+
+Run from the backend directory with a folder of short audio clips:
+
+    python test/bench_transcription.py path/to/clips --batch-sizes 1 2 4 8 16
+
+Clips are transcribed in-process with the same batching code as the
+/transcribe/jobs queue, so no server is needed.
+"""
+import argparse
+import os
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
+
+AUDIO_SUFFIXES = {".wav", ".mp3", ".m4a", ".ogg", ".webm", ".flac"}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("clips", help="Directory of audio clips")
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 2, 4, 8, 16])
+    parser.add_argument("--model", default="tiny")
+    args = parser.parse_args()
+
+    import whisper
+    from routes.transcription_jobs import transcribe_batch
+
+    paths = sorted(str(p) for p in Path(args.clips).iterdir() if p.suffix.lower() in AUDIO_SUFFIXES)
+    if not paths:
+        raise SystemExit(f"No audio clips found in {args.clips}")
+    model = whisper.load_model(args.model)
+    print(f"{len(paths)} clips, model {args.model} on {model.device}")
+
+    # Warm up so the first measured batch does not pay for lazy initialisation
+    transcribe_batch(model, paths[:1])
+
+    print(f"{'batch':>6} {'clips/s':>10} {'s/clip':>10}")
+    for batch_size in args.batch_sizes:
+        started = time.perf_counter()
+        for i in range(0, len(paths), batch_size):
+            transcribe_batch(model, paths[i:i + batch_size])
+        elapsed = time.perf_counter() - started
+        print(f"{batch_size:>6} {len(paths) / elapsed:>10.2f} {elapsed / len(paths):>10.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""Compare latency and bytes on the wire of the TTS response formats.
+
+Start the backend first, then run from the backend directory:
+
+    python test/bench_tts.py --repeat 10
+
+For each text the script calls /tts/convert with format=wav (binary) and
+format=json (Base64 data URI) and reports the latency of the first request,
+which is synthesized unless the server has cached it earlier, the median of the
+repeats, which are served from the TTS cache, and the response size.
+It then calls the streaming /tts/stream endpoint with a fresh text each time and
+reports the median time to the first audio chunk next to the total synthesis time.
+"""
+import argparse
+import statistics
+import time
+import urllib.parse
+import urllib.request
+
+TEXTS = {
+    "sentence": "Hello, how are you today?",
+    "paragraph": (
+        "Sign language is a visual way of communicating using hand gestures, facial expressions "
+        "and body language. It is used by millions of people around the world, and every country "
+        "has its own variety with its own grammar and vocabulary."
+    ),
+    "paragraphs": "\n".join([
+        "Sign language is a visual way of communicating using hand gestures, facial expressions "
+        "and body language. It is used by millions of people around the world.",
+        "Every country has its own sign language with its own grammar and vocabulary. Signs can "
+        "stand for whole words, and fingerspelling is used for names and rare words.",
+        "Interpreters translate between spoken and signed languages in real time. Tools that "
+        "recognise signs and generate speech can help when no interpreter is available. They "
+        "work best with short, clear sentences.",
+    ]),
+}
+
+
+def request(base_url: str, path: str, params: dict):
+    """POST to the endpoint and return (seconds, body bytes)"""
+    url = f"{base_url}{path}?{urllib.parse.urlencode(params)}"
+    started = time.perf_counter()
+    with urllib.request.urlopen(urllib.request.Request(url, method="POST")) as response:
+        body = response.read()
+    return time.perf_counter() - started, body
+
+
+def stream(base_url: str, path: str, params: dict):
+    """POST to a streaming endpoint and return (seconds to first audio chunk, total seconds, body bytes)"""
+    url = f"{base_url}{path}?{urllib.parse.urlencode(params)}"
+    started = time.perf_counter()
+    first_audio = None
+    size = 0
+    with urllib.request.urlopen(urllib.request.Request(url, method="POST")) as response:
+        while True:
+            chunk = response.read1(65536)
+            if not chunk:
+                break
+            size += len(chunk)
+            # The first 44 bytes are the WAV header, sent before any audio exists
+            if first_audio is None and size > 44:
+                first_audio = time.perf_counter() - started
+    return first_audio, time.perf_counter() - started, size
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://127.0.0.1:8000")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'text':>10} {'format':>7} {'first ms':>10} {'cached ms':>10} {'bytes':>10}")
+    for name, text in TEXTS.items():
+        for response_format in ("wav", "json"):
+            params = {"text": text, "format": response_format}
+            first, body = request(args.url, "/tts/convert", params)
+            timings = [request(args.url, "/tts/convert", params)[0] for _ in range(args.repeat)]
+            print(f"{name:>10} {response_format:>7} {first * 1000:>10.1f} "
+                  f"{statistics.median(timings) * 1000:>10.1f} {len(body):>10}")
+
+    print(f"\n{'text':>10} {'first audio ms':>15} {'total ms':>10}")
+    for name, text in TEXTS.items():
+        first, total = [], []
+        for i in range(args.repeat):
+            # A unique prefix keeps every run out of the TTS cache
+            params = {"text": f"Take {int(time.time())}-{i}. {text}"}
+            first_audio, elapsed, _ = stream(args.url, "/tts/stream", params)
+            first.append(first_audio or elapsed)
+            total.append(elapsed)
+        print(f"{name:>10} {statistics.median(first) * 1000:>15.1f} {statistics.median(total) * 1000:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
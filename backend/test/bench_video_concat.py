@@ -0,0 +1,76 @@
+"""Compare moviepy re-encoding with stream-copy concatenation of normalized clips.
+
+Normalize the clips first, then run from the backend directory:
+
+    python src/normalize_clips.py
+    python test/bench_video_concat.py --words 3 5 8 --repeat 3
+
+For sentences of each length, built from the first normalized clips, the script
+renders the video both ways and reports median wall time and CPU seconds,
+including the ffmpeg processes both paths start (child CPU time is only
+reported on Unix).
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
+
+from routes.video_render import ASSETS_DIR, NORMALIZED_CLIP_DIR, concat_clips, segment_cache  # noqa: E402
+
+
+def measure(render) -> tuple:
+    """Return (wall seconds, CPU seconds of this process and its children)"""
+    before = os.times()
+    started = time.perf_counter()
+    render()
+    wall = time.perf_counter() - started
+    after = os.times()
+    cpu = sum(after[i] - before[i] for i in range(4))
+    return wall, cpu
+
+
+def render_moviepy(paths, output: Path) -> None:
+    from moviepy import VideoFileClip, concatenate_videoclips
+    clips = [VideoFileClip(path) for path in paths]
+    final = concatenate_videoclips(clips)
+    final.write_videofile(str(output), fps=24, logger=None)
+    for clip in clips:
+        clip.close()
+    final.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--words", type=int, nargs="+", default=[3, 5, 8])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    entries = segment_cache.manifest()["clips"]
+    words = sorted(word for word in entries if (ASSETS_DIR / "clips" / f"{word}.mp4").exists())
+    if not words:
+        raise SystemExit("No normalized clips found; run python src/normalize_clips.py first")
+
+    print(f"{'words':>6} {'moviepy s':>10} {'cpu s':>8} {'concat s':>10} {'cpu s':>8} {'speedup':>8}")
+    with tempfile.TemporaryDirectory() as tmp:
+        output = Path(tmp) / "out.mp4"
+        for count in args.words:
+            sentence = [words[i % len(words)] for i in range(count)]
+            sources = [str(ASSETS_DIR / "clips" / f"{word}.mp4") for word in sentence]
+            normalized = [str(NORMALIZED_CLIP_DIR / entries[word]["file"]) for word in sentence]
+
+            moviepy_runs = [measure(lambda: render_moviepy(sources, output)) for _ in range(args.repeat)]
+            concat_runs = [measure(lambda: concat_clips(normalized, output)) for _ in range(args.repeat)]
+            moviepy_wall = statistics.median(run[0] for run in moviepy_runs)
+            concat_wall = statistics.median(run[0] for run in concat_runs)
+            print(f"{count:>6} {moviepy_wall:>10.2f} {statistics.median(run[1] for run in moviepy_runs):>8.2f} "
+                  f"{concat_wall:>10.2f} {statistics.median(run[1] for run in concat_runs):>8.2f} "
+                  f"{moviepy_wall / concat_wall:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
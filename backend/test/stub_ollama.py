@@ -0,0 +1,104 @@
+"""Minimal stand-in for the Ollama chat API with a fixed token rate.
+
+Run it, then start the backend pointed at it:
+
+    python test/stub_ollama.py --port 11435 --token-ms 40
+    OLLAMA_HOST=http://127.0.0.1:11435 python src/main.py
+
+POST /api/chat answers with a few sentences built around the signed words found
+in the prompt, streamed one word per --token-ms as NDJSON when the request asks
+for streaming, or as one JSON reply after the same total delay otherwise. This
+makes LLM latency predictable so the other pipeline stages can be measured.
+"""
+import argparse
+import json
+import re
+import threading
+import time
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+REPLY = "I would like to say {words}. Thank you for listening to me today. Have a good day."
+
+
+def chunk(model: str, content: str, done: bool) -> dict:
+    return {
+        "model": model,
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "message": {"role": "assistant", "content": content},
+        "done": done,
+        **({"done_reason": "stop"} if done else {}),
+    }
+
+
+class Handler(BaseHTTPRequestHandler):
+    token_delay = 0.04
+    # Chat requests answered with 503 before the stub starts replying, to exercise client retries
+    fail_first = 0
+    # Chat requests received so far
+    requests = 0
+    protocol_version = "HTTP/1.1"
+    lock = threading.Lock()
+
+    def do_POST(self):
+        if self.path != "/api/chat":
+            self.send_error(404)
+            return
+        request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        with self.lock:
+            type(self).requests += 1
+            failing = type(self).requests <= self.fail_first
+        if failing:
+            self.send_error(503)
+            return
+        prompt = request["messages"][-1]["content"]
+        match = re.search(r"word sequence:\s*(.+)", prompt)
+        reply = REPLY.format(words=match.group(1).strip() if match else "hello")
+        tokens = re.findall(r"\S+\s*", reply)
+        model = request.get("model", "stub")
+
+        if not request.get("stream", True):
+            time.sleep(self.token_delay * len(tokens))
+            body = json.dumps(chunk(model, reply, True)).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        for token in tokens:
+            time.sleep(self.token_delay)
+            self._write_chunk(json.dumps(chunk(model, token, False)).encode() + b"\n")
+        self._write_chunk(json.dumps(chunk(model, "", True)).encode() + b"\n")
+        self.wfile.write(b"0\r\n\r\n")
+
+    def _write_chunk(self, data: bytes) -> None:
+        self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+        self.wfile.flush()
+
+    def log_message(self, format, *args):
+        pass
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=11435)
+    parser.add_argument("--token-ms", type=float, default=40, help="Delay before every streamed word")
+    parser.add_argument("--fail-first", type=int, default=0, help="Answer this many requests with 503 first")
+    args = parser.parse_args()
+
+    Handler.token_delay = args.token_ms / 1000.0
+    Handler.fail_first = args.fail_first
+    server = ThreadingHTTPServer((args.host, args.port), Handler)
+    print(f"Stub Ollama listening on http://{args.host}:{args.port} ({args.token_ms} ms per token)")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
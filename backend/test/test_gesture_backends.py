@@ -0,0 +1,110 @@
+"""Parity of the NumPy gesture backend with a reference forward pass and with Keras and TFLite"""
+import numpy as np
+import pytest
+
+from routes.gesture_inference import NumpyBackend, TFLiteBackend
+from routes.gesture_model import create_interpreter, export_npz, export_tflite, load_npz_weights
+
+# A full batch, a partial one, a single sample, and more samples than one TFLite call takes
+BATCH_SIZES = [32, 5, 1, 45]
+
+
+class Layer:
+    """The part of a Keras layer export_npz reads"""
+
+    def __init__(self, weights, activation=None):
+        self.weights = weights
+        self.activation = activation
+
+    def get_weights(self):
+        return self.weights
+
+    def get_config(self):
+        return {"activation": self.activation} if self.activation else {}
+
+
+class Model:
+    def __init__(self, layers):
+        self.layers = layers
+
+
+def reference_predict(layers, activations, batch):
+    """Straightforward float64 forward pass, one sample at a time"""
+    outputs = []
+    for x in batch.astype(np.float64):
+        for (kernel, bias), activation in zip(layers, activations):
+            x = x @ kernel.astype(np.float64) + bias
+            if activation == "relu":
+                x = np.maximum(x, 0.0)
+            elif activation == "softmax":
+                x = np.exp(x - x.max())
+                x /= x.sum()
+        outputs.append(x)
+    return np.array(outputs)
+
+
+def predict_in_batches(backend, samples, batch_size):
+    return np.concatenate([backend.predict(samples[i:i + batch_size]) for i in range(0, len(samples), batch_size)])
+
+
+@pytest.fixture
+def keras_path(tmp_path):
+    # Cached artifacts are keyed by the hash of the Keras file, so any content will do
+    path = tmp_path / "gesture_model.h5"
+    path.write_bytes(b"gesture model")
+    return str(path)
+
+
+def test_numpy_backend_matches_reference(keras_path):
+    rng = np.random.default_rng(0)
+    model = Model([
+        Layer([rng.normal(size=(42, 64)).astype(np.float32), rng.normal(size=64).astype(np.float32)], "relu"),
+        Layer([]),  # Dropout
+        Layer([rng.normal(size=(64, 32)).astype(np.float32), rng.normal(size=32).astype(np.float32)], "relu"),
+        Layer([rng.normal(size=(32, 7)).astype(np.float32), rng.normal(size=7).astype(np.float32)], "softmax"),
+    ])
+    export_npz(model, keras_path)
+    layers, activations = load_npz_weights(keras_path)
+    assert activations == ["relu", "relu", "softmax"]
+    backend = NumpyBackend(layers, activations)
+
+    for batch_size in BATCH_SIZES:
+        batch = rng.random((batch_size, 42), dtype=np.float32)
+        expected = reference_predict(layers, activations, batch)
+        probabilities = backend.predict(batch)
+        assert probabilities.shape == (batch_size, 7)
+        assert np.allclose(probabilities, expected, atol=1e-5)
+        assert np.allclose(probabilities.sum(axis=1), 1.0, atol=1e-5)
+
+
+def test_numpy_backend_rejects_unknown_activation():
+    with pytest.raises(ValueError):
+        NumpyBackend([(np.zeros((42, 7)), np.zeros(7))], ["tanh"])
+
+
+def test_numpy_and_tflite_backends_match_keras(keras_path):
+    tf = pytest.importorskip("tensorflow")
+    tf.keras.utils.set_random_seed(0)
+    model = tf.keras.Sequential([
+        tf.keras.layers.Input(shape=(42,)),
+        tf.keras.layers.Dense(64, activation="relu"),
+        tf.keras.layers.Dropout(0.2),
+        tf.keras.layers.Dense(32, activation="relu"),
+        tf.keras.layers.Dense(7, activation="softmax"),
+    ])
+    export_npz(model, keras_path)
+    numpy_backend = NumpyBackend(*load_npz_weights(keras_path))
+    with open(export_tflite(model, keras_path), "rb") as f:
+        tflite_backend = TFLiteBackend(create_interpreter(f.read()), max_batch_size=32)
+
+    samples = np.random.default_rng(1).random((sum(BATCH_SIZES), 42), dtype=np.float32)
+    expected = model.predict(samples, verbose=0)
+    start = 0
+    for batch_size in BATCH_SIZES:
+        batch = samples[start:start + batch_size]
+        start += batch_size
+        assert np.allclose(numpy_backend.predict(batch), expected[start - batch_size:start], atol=1e-5)
+        # TFLite pads partial batches to its fixed size; its weights are quantized, so only nearly equal
+        tflite = predict_in_batches(tflite_backend, batch, tflite_backend.max_batch_size)
+        assert tflite.shape == (batch_size, 7)
+        assert np.allclose(tflite, expected[start - batch_size:start], atol=0.05)
@@ -0,0 +1,99 @@
+"""LLMClient retries, cache and coalescing against the stub Ollama server"""
+import asyncio
+import threading
+from http.server import ThreadingHTTPServer
+
+import pytest
+
+ollama = pytest.importorskip("ollama")
+
+import stub_ollama  # noqa: E402
+from routes.llm import LLMClient  # noqa: E402
+
+REPLY = stub_ollama.REPLY.format(words="hello")
+
+
+@pytest.fixture
+def stub():
+    """A stub server of its own, so request counts and failures do not leak between tests"""
+    handler = type("Handler", (stub_ollama.Handler,), {"token_delay": 0.01, "requests": 0})
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    handler.url = f"http://127.0.0.1:{server.server_address[1]}"
+    yield handler
+    server.shutdown()
+    server.server_close()
+
+
+def test_repeated_prompt_is_answered_from_cache(stub):
+    client = LLMClient(host=stub.url)
+
+    async def run():
+        return [await client.chat("Say hello"), await client.chat("Say hello")]
+
+    assert asyncio.run(run()) == [REPLY, REPLY]
+    assert stub.requests == 1
+    assert client.counters["cache_hits"] == 1
+
+
+def test_identical_prompts_in_flight_share_one_request(stub):
+    client = LLMClient(host=stub.url)
+
+    async def run():
+        return await asyncio.gather(*(client.chat("Say hello") for _ in range(5)))
+
+    assert asyncio.run(run()) == [REPLY] * 5
+    assert stub.requests == 1
+    assert client.counters["coalesced"] == 4
+
+
+def test_server_errors_are_retried(stub):
+    stub.fail_first = 2
+    client = LLMClient(host=stub.url, retries=2)
+
+    assert asyncio.run(client.chat("Say hello")) == REPLY
+    assert stub.requests == 3
+    assert client.counters["retries"] == 2
+
+
+def test_gives_up_after_the_last_retry(stub):
+    stub.fail_first = 10
+    client = LLMClient(host=stub.url, retries=1)
+
+    with pytest.raises(ollama.ResponseError):
+        asyncio.run(client.chat("Say hello"))
+    assert stub.requests == 2
+    # A failed reply is not cached
+    assert client.metrics()["cache_entries"] == 0
+
+
+def test_cancelled_request_does_not_cancel_the_requests_that_joined_it(stub):
+    client = LLMClient(host=stub.url)
+
+    async def run():
+        leader = asyncio.create_task(client.chat("Say hello"))
+        await asyncio.sleep(0.02)
+        follower = asyncio.create_task(client.chat("Say hello"))
+        await asyncio.sleep(0.02)
+        leader.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        return await follower
+
+    assert asyncio.run(run()) == REPLY
+    # The request that joined asked again itself
+    assert stub.requests == 2
+
+
+def test_streamed_reply_is_cached_whole(stub):
+    client = LLMClient(host=stub.url)
+
+    async def run():
+        parts = [part async for part in client.stream_chat("Say hello")]
+        return parts, [part async for part in client.stream_chat("Say hello")]
+
+    parts, cached = asyncio.run(run())
+    assert len(parts) > 1 and "".join(parts) == REPLY
+    assert cached == [REPLY]
+    assert stub.requests == 1
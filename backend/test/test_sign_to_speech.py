@@ -0,0 +1,127 @@
+"""Sentence splitting and the NDJSON events of /tts/sign-to-speech/stream, against the stub Ollama server"""
+import base64
+import json
+import threading
+from http.server import ThreadingHTTPServer
+
+import pytest
+
+pytest.importorskip("torch")
+pytest.importorskip("kokoro")
+pytest.importorskip("httpx")
+
+from fastapi import FastAPI  # noqa: E402
+from fastapi.testclient import TestClient  # noqa: E402
+
+import stub_ollama  # noqa: E402
+from routes import tts  # noqa: E402
+from routes.llm import LLMClient  # noqa: E402
+from routes.utils import SentenceSplitter  # noqa: E402
+
+
+def split_stream(tokens):
+    splitter = SentenceSplitter()
+    sentences = [sentence for token in tokens for sentence in splitter.feed(token)]
+    return sentences, splitter.flush()
+
+
+def test_sentences_are_handed_out_once_whitespace_follows():
+    splitter = SentenceSplitter()
+    assert splitter.feed("Hello there.") == []
+    assert splitter.feed(" How are") == ["Hello there."]
+    assert splitter.feed(" you? I am fine!\n") == ["How are you?", "I am fine!"]
+    assert splitter.flush() is None
+
+
+def test_numbers_and_abbreviations_do_not_end_sentences():
+    sentences, rest = split_stream(["It costs 3", ".5 dollars", ". Dr. Smith and Mrs. Jones", " agree, e.g. ",
+                                    "on price. Done"])
+    assert sentences == ["It costs 3.5 dollars.", "Dr. Smith and Mrs. Jones agree, e.g. on price."]
+    assert rest == "Done"
+
+
+def test_trailing_text_without_a_terminator_is_flushed():
+    sentences, rest = split_stream(["I would like", " to say hello"])
+    assert sentences == []
+    assert rest == "I would like to say hello"
+
+    splitter = SentenceSplitter()
+    splitter.feed("   \n  ")
+    assert splitter.flush() is None
+
+
+def test_line_breaks_end_sentences_even_after_a_title():
+    assert split_stream(["Ask the Dr.\nThen rest"]) == (["Ask the Dr."], "Then rest")
+
+
+@pytest.fixture
+def stub():
+    handler = type("Handler", (stub_ollama.Handler,), {"token_delay": 0.005, "requests": 0})
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    handler.url = f"http://127.0.0.1:{server.server_address[1]}"
+    yield handler
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def client(stub, monkeypatch):
+    """The TTS routes with the LLM pointed at the stub and speech synthesis replaced by a marker WAV"""
+    synthesized = []
+
+    async def synthesize_wav(text, voice, lang, speed):
+        synthesized.append(text)
+        return None if "fail" in text else f"RIFF {text}".encode()
+
+    monkeypatch.setattr(tts, "llm", LLMClient(host=stub.url, retries=0))
+    monkeypatch.setattr(tts, "synthesize_wav", synthesize_wav)
+    monkeypatch.setattr(tts.voice_registry, "exists", lambda voice: True)
+    app = FastAPI()
+    app.include_router(tts.router, prefix="/tts")
+    test_client = TestClient(app)
+    test_client.synthesized = synthesized
+    return test_client
+
+
+def stream_events(client, words):
+    response = client.post("/tts/sign-to-speech/stream", params={"words": words})
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    return [json.loads(line) for line in response.text.splitlines()]
+
+
+def test_every_sentence_is_sent_as_text_then_audio_and_the_stream_ends_with_done(client):
+    events = stream_events(client, ["hello", "friend"])
+    sentences = ["I would like to say hello friend.", "Thank you for listening to me today.", "Have a good day."]
+
+    assert [event["type"] for event in events] == ["text", "audio"] * 3 + ["done"]
+    for index, sentence in enumerate(sentences):
+        text, audio = events[2 * index], events[2 * index + 1]
+        assert text == {"type": "text", "index": index, "text": sentence}
+        assert audio["index"] == index
+        assert base64.b64decode(audio["audio"].split(",", 1)[1]) == f"RIFF {sentence}".encode()
+    done = events[-1]
+    assert done["text"] == " ".join(sentences)
+    assert done["sentences"] == 3
+    assert done["timings"]["llm_first_token_ms"] <= done["timings"]["time_to_first_audio_ms"] <= done["timings"]["total_ms"]
+    assert client.synthesized == sentences
+
+
+def test_failed_synthesis_is_reported_in_place_of_the_audio(client):
+    events = stream_events(client, ["fail"])
+    assert [event["type"] for event in events] == ["text", "error", "text", "audio", "text", "audio", "done"]
+    assert events[1] == {"type": "error", "index": 0, "error": "Failed to generate speech"}
+
+
+def test_the_signed_words_are_spoken_when_the_llm_fails(client, stub):
+    stub.fail_first = 1
+    events = stream_events(client, ["hello", "friend"])
+    assert [event["type"] for event in events] == ["text", "audio", "done"]
+    assert events[0]["text"] == "hello friend"
+    assert events[-1]["text"] == "hello friend"
+
+
+def test_requests_without_words_are_rejected(client):
+    assert client.post("/tts/sign-to-speech/stream", params={"words": []}).status_code in (400, 422)
@@ -181,11 +181,12 @@ const SignToSpeech = () => {
         throw new Error(errorData.error || 'Failed to convert to speech');
       }
       
-      const data = await response.json();
+      // The audio arrives as binary WAV, with the natural text in a response header
+      const audioBlob = await response.blob();
       
       // Set the audio URL and natural text
-      setAudioUrl(data.audio);
-      setNaturalText(data.text);
+      setAudioUrl(URL.createObjectURL(audioBlob));
+      setNaturalText(decodeURIComponent(response.headers.get('X-Natural-Text') || ''));
       
     } catch (err) {
       console.error('Error converting to speech:', err);
@@ -195,6 +196,15 @@ const SignToSpeech = () => {
     }
   };
 
+  // Release the audio blob when it is replaced and when the component unmounts
+  useEffect(() => {
+    return () => {
+      if (audioUrl) {
+        URL.revokeObjectURL(audioUrl);
+      }
+    };
+  }, [audioUrl]);
+
   // Clean up when the component unmounts
   useEffect(() => {
     return () => {
@@ -11,31 +11,34 @@ const TextToSign = () => {
   const [error, setError] = useState('');
   const [contentHash, setContentHash] = useState('');
   const [processingStatus, setProcessingStatus] = useState('');
+  const [progress, setProgress] = useState(0);
 
-  // Poll for video status if we're processing
+  // Follow the render over server-sent events instead of polling the status endpoint
   useEffect(() => {
-    let intervalId;
-    
-    if (contentHash && processingStatus === 'processing') {
-      intervalId = setInterval(async () => {
-        try {
-          const response = await fetch(`${API_URL}/video/status/${contentHash}`);
-          const data = await response.json();
-          
-          if (data.status === 'completed') {
-            setProcessingStatus('completed');
-            setVideoUrl(`${API_URL}${data.video_path}`);
-            clearInterval(intervalId);
-          }
-        } catch (err) {
-          console.error('Error checking video status:', err);
-        }
-      }, 2000); // Check every 2 seconds
-    }
-    
-    return () => {
-      if (intervalId) clearInterval(intervalId);
+    if (!contentHash || processingStatus !== 'processing') return undefined;
+
+    const events = new EventSource(`${API_URL}/video/events?hash=${contentHash}`);
+    events.addEventListener('progress', (event) => {
+      setProgress(JSON.parse(event.data).progress);
+    });
+    events.addEventListener('done', (event) => {
+      const data = JSON.parse(event.data);
+      setProcessingStatus('completed');
+      setVideoUrl(`${API_URL}${data.video_path}`);
+      events.close();
+    });
+    events.addEventListener('failed', (event) => {
+      const data = JSON.parse(event.data);
+      setProcessingStatus('failed');
+      setError(data.error || 'Video generation failed. Please try again.');
+      events.close();
+    });
+    events.onerror = (err) => {
+      // The browser reconnects by itself after network errors
+      console.error('Error in video events stream:', err);
     };
+
+    return () => events.close();
   }, [contentHash, processingStatus]);
 
   const handleSubmit = async (e) => {
@@ -74,6 +77,7 @@ const TextToSign = () => {
       } else if (data.status === 'processing') {
         // Video is being generated in the background
         setContentHash(data.content_hash);
+        setProgress(0);
         setProcessingStatus('processing');
       } else if (data.video_path) {
         // Video was already cached
@@ -152,7 +156,9 @@ const TextToSign = () => {
               <path className="opacity-75" fill="currentColor" d="M4 12a8 8 0 018-8V0C5.373 0 0 5.373 0 12h4zm2 5.291A7.962 7.962 0 014 12H0c0 3.042 1.135 5.824 3 7.938l3-2.647z"></path>
             </svg>
             <p className="text-lg font-medium">Generating sign language video...</p>
-            <p className="text-sm mt-2">This may take a few moments.</p>
+            <p className="text-sm mt-2">
+              {progress > 0 ? `Rendering: ${Math.round(progress * 100)}%` : 'This may take a few moments.'}
+            </p>
           </div>
         </div>
       )}